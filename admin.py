@@ -2,27 +2,32 @@ import pytz
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from telegram.constants import ChatAction
 from telegram.error import BadRequest
 from database import (
     is_admin, 
-    listar_usuarios, 
-    alterar_nivel_usuario, 
+    listar_usuarios_async,
+    alterar_nivel_usuario_async,
     get_db_connection,
     adicionar_usuario,
-    obter_relatorio_atividades,
-    listar_usuarios_pendentes,
-    listar_usuarios_ativos,
-    aprovar_usuario,
-    recusar_usuario,
-    desativar_usuario,
-    get_user_display_info
+    obter_relatorio_atividades_async,
+    listar_usuarios_pendentes_async,
+    listar_usuarios_ativos_async,
+    aprovar_usuario_async,
+    recusar_usuario_async,
+    desativar_usuario_async,
+    get_user_display_info_async
 )
-from decorators import admin_required
+from decorators import admin_required, ADMIN
+from roteador import rota, callback
+from despachante import despachante
+import exportacao
 
 # Configuração global do timezone
 TIMEZONE = pytz.timezone('America/Sao_Paulo')
 
-@admin_required  # Adicione este decorador
+@rota('menu_admin', acesso=ADMIN)
+@admin_required
 async def menu_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu principal de administração"""
     keyboard = [
@@ -44,9 +49,10 @@ async def menu_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=reply_markup
         )
 
+@rota('admin_usuarios', acesso=ADMIN)
 async def menu_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu de gerenciamento de usuários"""
-    usuarios_pendentes = listar_usuarios_pendentes()
+    usuarios_pendentes = await listar_usuarios_pendentes_async()
     total_pendentes = len(usuarios_pendentes)
     
     keyboard = [
@@ -63,11 +69,12 @@ async def menu_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
     
+@rota('gerenciar_usuario', acesso=ADMIN, legado=True)
 async def menu_gerenciar_usuario_individual(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu de gerenciamento de um usuário específico"""
     query = update.callback_query
-    user_id = int(query.data.split('_')[-1])
-    user_info = get_user_display_info(user_id)
+    user_id, = context.args
+    user_info = await get_user_display_info_async(user_id)
     
     if not user_info:
         await query.answer("❌ Usuário não encontrado")
@@ -82,16 +89,16 @@ async def menu_gerenciar_usuario_individual(update: Update, context: ContextType
     
     keyboard = [
         # Botões de nível
-        [InlineKeyboardButton("👑 Admin", callback_data=f'set_nivel_admin_{user_id}'),
-         InlineKeyboardButton("🔰 DPC", callback_data=f'set_nivel_dpc_{user_id}')],
-        [InlineKeyboardButton("👤 Usuário", callback_data=f'set_nivel_user_{user_id}')],
+        [InlineKeyboardButton("👑 Admin", callback_data=callback('set_nivel', 'admin', user_id)),
+         InlineKeyboardButton("🔰 DPC", callback_data=callback('set_nivel', 'dpc', user_id))],
+        [InlineKeyboardButton("👤 Usuário", callback_data=callback('set_nivel', 'user', user_id))],
         
         # Botões de status
-        [InlineKeyboardButton("✅ Ativar", callback_data=f'set_status_ativo_{user_id}'),
-         InlineKeyboardButton("❌ Desativar", callback_data=f'set_status_inativo_{user_id}')],
+        [InlineKeyboardButton("✅ Ativar", callback_data=callback('set_status', True, user_id)),
+         InlineKeyboardButton("❌ Desativar", callback_data=callback('set_status', False, user_id))],
         
         # Outras opções
-        [InlineKeyboardButton("📨 Enviar Mensagem", callback_data=f'enviar_msg_{user_id}')],
+        [InlineKeyboardButton("📨 Enviar Mensagem", callback_data=callback('msg', 'user', user_id))],
         [InlineKeyboardButton("🔙 Voltar", callback_data='admin_gerenciar_usuarios')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -104,23 +111,24 @@ async def menu_gerenciar_usuario_individual(update: Update, context: ContextType
 
 
 # Sistema de mensagens
+@rota('admin_enviar_mensagem', acesso=ADMIN)
 async def iniciar_envio_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Inicia o processo de envio de mensagem para usuários"""
-    usuarios = listar_usuarios_ativos()
+    usuarios = await listar_usuarios_ativos_async()
     texto = "📨 *Enviar Mensagem*\n\n"
     texto += "Selecione para quem deseja enviar a mensagem:\n\n"
     
     keyboard = []
-    keyboard.append([InlineKeyboardButton("📢 Todos os Usuários", callback_data='msg_todos')])
-    keyboard.append([InlineKeyboardButton("👥 Todos os Usuários Comuns", callback_data='msg_nivel_user')])
-    keyboard.append([InlineKeyboardButton("🔰 Apenas DPC", callback_data='msg_nivel_dpc')])
+    keyboard.append([InlineKeyboardButton("📢 Todos os Usuários", callback_data=callback('msg', 'todos', None))])
+    keyboard.append([InlineKeyboardButton("👥 Todos os Usuários Comuns", callback_data=callback('msg', 'nivel', 'user'))])
+    keyboard.append([InlineKeyboardButton("🔰 Apenas DPC", callback_data=callback('msg', 'nivel', 'dpc'))])
     
     for usuario in usuarios:
         if usuario['user_id'] != update.effective_user.id:  # Não mostrar o próprio usuário
             keyboard.append([
                 InlineKeyboardButton(
                     f"👤 {usuario['nome']}", 
-                    callback_data=f'msg_user_{usuario["user_id"]}'
+                    callback_data=callback('msg', 'user', usuario['user_id'])
                 )
             ])
     
@@ -133,13 +141,15 @@ async def iniciar_envio_mensagem(update: Update, context: ContextTypes.DEFAULT_T
         parse_mode='Markdown'
     )
 
+@rota('msg', acesso=ADMIN, legado={'msg_user': ('user',), 'enviar_msg': ('user',)})
 async def solicitar_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Solicita o texto da mensagem a ser enviada"""
     query = update.callback_query
-    destino = query.data.split('_', 1)[1]  # msg_todos, msg_nivel_xxx, msg_user_xxx
+    destino, valor = context.args  # ('todos', None), ('nivel', <nivel>) ou ('user', <id>)
     
     context.user_data['envio_mensagem'] = {
         'destino': destino,
+        'valor': valor,
         'aguardando_texto': True
     }
     
@@ -170,69 +180,78 @@ async def processar_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     mensagem = update.message.text
     destino = context.user_data['envio_mensagem']['destino']
+    valor = context.user_data['envio_mensagem'].get('valor')
     
     try:
-        enviados = 0
-        falhas = 0
         usuarios = []
         
         print(f"Processando mensagem para destino: {destino}")
         
         if destino == 'todos':
-            usuarios = listar_usuarios_ativos()
-        elif destino.startswith('nivel_'):
-            nivel = destino.split('_')[1]
-            usuarios = [u for u in listar_usuarios_ativos() if u['nivel'] == nivel]
-        elif destino.startswith('user_'):
-            user_id = int(destino.split('_')[1])
-            user_info = get_user_display_info(user_id=user_id)
+            usuarios = await listar_usuarios_ativos_async()
+        elif destino == 'nivel':
+            usuarios = [u for u in await listar_usuarios_ativos_async() if u['nivel'] == valor]
+        elif destino == 'user':
+            user_info = await get_user_display_info_async(user_id=valor)
             if user_info:
                 usuarios = [user_info]
             print(f"Usuário específico: {user_info}")
         
         print(f"Total de destinatários: {len(usuarios)}")
         
-        for usuario in usuarios:
+        status = await update.message.reply_text(
+            f"📤 Enviando mensagem para {len(usuarios)} destinatário(s)..."
+        )
+        
+        async def progresso(tarefa):
+            if tarefa.enviados + tarefa.falhas == tarefa.total:
+                return  # O relatório final substitui o progresso
             try:
-                user_id = usuario['user_id']
-                print(f"Tentando enviar para usuário ID: {user_id}")
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"{mensagem}",
-                    parse_mode='Markdown'
+                await status.edit_text(
+                    f"📤 Enviando mensagem... {tarefa.enviados + tarefa.falhas}/{tarefa.total}"
                 )
-                enviados += 1
-                print(f"Mensagem enviada com sucesso para {user_id}")
-            except Exception as e:
-                print(f"Erro ao enviar mensagem para {usuario.get('nome', 'Unknown')}: {e}")
-                falhas += 1
-        
-        # Relatório de envio
-        keyboard = [
-            [InlineKeyboardButton("📨 Nova Mensagem", callback_data='admin_enviar_mensagem')],
-            [InlineKeyboardButton("🔙 Menu Principal", callback_data='menu_principal')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+            except BadRequest:
+                pass
         
-        await update.message.reply_text(
-            f"✅ *Relatório de Envio*\n\n"
-            f"📊 Total de destinatários: {len(usuarios)}\n"
-            f"✓ Mensagens enviadas: {enviados}\n"
-            f"❌ Falhas no envio: {falhas}",
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
+        tarefa = despachante.enviar(
+            context.bot,
+            [{'chat_id': u['user_id'], 'text': mensagem, 'parse_mode': 'Markdown'} for u in usuarios],
+            ao_progresso=progresso
         )
         
+        async def relatorio():
+            await tarefa.aguardar()
+            print(f"Envio concluído: {tarefa.enviados} enviada(s), {tarefa.falhas} falha(s)")
+            
+            # Relatório de envio
+            keyboard = [
+                [InlineKeyboardButton("📨 Nova Mensagem", callback_data='admin_enviar_mensagem')],
+                [InlineKeyboardButton("🔙 Menu Principal", callback_data='menu_principal')]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            await status.edit_text(
+                f"✅ *Relatório de Envio*\n\n"
+                f"📊 Total de destinatários: {tarefa.total}\n"
+                f"✓ Mensagens enviadas: {tarefa.enviados}\n"
+                f"❌ Falhas no envio: {tarefa.falhas}",
+                reply_markup=reply_markup,
+                parse_mode='Markdown'
+            )
+        
+        # O relatório é enviado ao fim do despacho, sem bloquear o handler
+        context.application.create_task(relatorio(), update=update)
+        
     except Exception as e:
         print(f"Erro ao processar mensagem: {str(e)}")
         await update.message.reply_text(f"❌ Erro ao enviar mensagens: {str(e)}")
     finally:
         context.user_data.pop('envio_mensagem', None)
 
+@rota('admin_aprovar_usuarios', acesso=ADMIN)
 async def menu_aprovar_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu para aprovação de usuários pendentes"""
-    usuarios_pendentes = listar_usuarios_pendentes()
+    usuarios_pendentes = await listar_usuarios_pendentes_async()
     
     if not usuarios_pendentes:
         keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='menu_admin')]]
@@ -254,13 +273,13 @@ async def menu_aprovar_usuarios(update: Update, context: ContextTypes.DEFAULT_TY
         keyboard.append([
             InlineKeyboardButton(
                 f"✅ Aprovar {usuario['nome']}", 
-                callback_data=f'admin_aprovar_{usuario["user_id"]}'
+                callback_data=callback('admin_aprovar', usuario['user_id'])
             )
         ])
         keyboard.append([
             InlineKeyboardButton(
                 f"❌ Recusar {usuario['nome']}", 
-                callback_data=f'admin_recusar_{usuario["user_id"]}'
+                callback_data=callback('admin_recusar', usuario['user_id'])
             )
         ])
     
@@ -272,6 +291,7 @@ async def menu_aprovar_usuarios(update: Update, context: ContextTypes.DEFAULT_TY
         reply_markup=reply_markup
     )
 
+@rota('admin_relatorios', 'menu_relatorios', acesso=ADMIN)
 async def menu_relatorios(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu de relatórios"""
     keyboard = [
@@ -288,6 +308,7 @@ async def menu_relatorios(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='Markdown'
     )
 
+@rota('admin_config', acesso=ADMIN)
 async def menu_configuracoes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu de configurações"""
     keyboard = [
@@ -301,6 +322,7 @@ async def menu_configuracoes(update: Update, context: ContextTypes.DEFAULT_TYPE)
         parse_mode='Markdown'
     )
 
+@rota('definir_dpc', acesso=ADMIN)
 async def solicitar_id_dpc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Solicita o ID do novo DPC"""
     texto = ("🔰 *Definir novo DPC*\n\n"
@@ -325,7 +347,7 @@ async def processar_id_dpc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         novo_dpc_id = int(update.message.text)
-        if alterar_nivel_usuario(novo_dpc_id, 'dpc'):
+        if await alterar_nivel_usuario_async(novo_dpc_id, 'dpc'):
             keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='admin_usuarios')]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text(
@@ -343,213 +365,202 @@ async def processar_id_dpc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     finally:
         context.user_data['esperando_id_dpc'] = False
 
-@admin_required
-async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler principal para callbacks administrativos"""
+@rota('admin_gerenciar_usuarios', acesso=ADMIN)
+async def listar_usuarios_gerenciaveis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Lista os usuários (exceto administradores) para gerenciamento"""
     query = update.callback_query
-    print(f"handle_admin_callback recebeu: {query.data}")
-    
-    await query.answer()
+    usuarios = await listar_usuarios_async()
+    texto = "👥 *Lista de Usuários*\n\n"
+    keyboard = []
     
-    try:
-        if query.data == 'admin_usuarios':
-            await menu_usuarios(update, context)
-        
-        elif query.data == 'admin_aprovar_usuarios':
-            await menu_aprovar_usuarios(update, context)
-        
-        elif query.data == 'admin_gerenciar_usuarios':
-            usuarios = listar_usuarios()
-            texto = "👥 *Lista de Usuários*\n\n"
-            keyboard = []
-            
-            for user in usuarios:
-                user_id, nome, username, nivel, data_cadastro = user
-                if nivel != 'admin':  # Não permite gerenciar administradores
-                    nivel_emoji = {
-                        'dpc': '🔰',
-                        'user': '👤',
-                        'pendente': '⏳'
-                    }.get(nivel, '❓')
-                    
-                    texto += f"{nivel_emoji} *{nome}*\n"
-                    texto += f"├ ID: `{user_id}`\n"
-                    texto += f"├ Username: @{username if username else 'Não informado'}\n"
-                    texto += f"├ Nível: {nivel}\n\n"
-                    
-                    keyboard.append([
-                        InlineKeyboardButton(
-                            f"⚙️ Gerenciar {nome}", 
-                            callback_data=f'gerenciar_usuario_{user_id}'
-                        )
-                    ])
+    for user in usuarios:
+        user_id, nome, username, nivel, data_cadastro = user
+        if nivel != 'admin':  # Não permite gerenciar administradores
+            nivel_emoji = {
+                'dpc': '🔰',
+                'user': '👤',
+                'pendente': '⏳'
+            }.get(nivel, '❓')
             
-            keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='admin_usuarios')])
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            texto += f"{nivel_emoji} *{nome}*\n"
+            texto += f"├ ID: `{user_id}`\n"
+            texto += f"├ Username: @{username if username else 'Não informado'}\n"
+            texto += f"├ Nível: {nivel}\n\n"
             
-            await query.edit_message_text(
-                text=texto,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
+            keyboard.append([
+                InlineKeyboardButton(
+                    f"⚙️ Gerenciar {nome}", 
+                    callback_data=callback('gerenciar_usuario', user_id)
+                )
+            ])
+    
+    keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='admin_usuarios')])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        text=texto,
+        reply_markup=reply_markup,
+        parse_mode='Markdown'
+    )
+
+@rota('admin_aprovar', acesso=ADMIN, legado=True)
+async def aprovar_usuario(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id, = context.args
+    if await aprovar_usuario_async(user_id):
+        try:
+            await context.bot.send_message(
+                chat_id=user_id,
+                text="✅ Seu acesso foi aprovado! Você já pode utilizar todas as funcionalidades do bot."
             )
+        except Exception as e:
+            print(f"Erro ao notificar usuário aprovado: {e}")
+        await menu_aprovar_usuarios(update, context)
+    else:
+        await update.callback_query.answer("❌ Erro ao aprovar usuário")
+
+@rota('admin_recusar', acesso=ADMIN, legado=True)
+async def recusar_usuario(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id, = context.args
+    if await recusar_usuario_async(user_id):
+        try:
+            await context.bot.send_message(
+                chat_id=user_id,
+                text="❌ Seu acesso não foi aprovado. Entre em contato com o administrador para mais informações."
+            )
+        except Exception as e:
+            print(f"Erro ao notificar usuário recusado: {e}")
+        await menu_aprovar_usuarios(update, context)
+    else:
+        await update.callback_query.answer("❌ Erro ao recusar usuário")
+
+@rota('cancelar_envio', acesso=ADMIN)
+async def cancelar_envio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.pop('envio_mensagem', None)
+    await menu_usuarios(update, context)
+
+@rota('set_nivel', acesso=ADMIN, legado={
+    'set_nivel_admin': ('admin',), 'set_nivel_dpc': ('dpc',), 'set_nivel_user': ('user',)
+})
+async def definir_nivel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        if len(context.args) == 2:
+            nivel, user_id = context.args
             
-        elif query.data.startswith('admin_aprovar_'):
-            user_id = int(query.data.replace('admin_aprovar_', ''))
-            if aprovar_usuario(user_id):
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text="✅ Seu acesso foi aprovado! Você já pode utilizar todas as funcionalidades do bot."
-                    )
-                except Exception as e:
-                    print(f"Erro ao notificar usuário aprovado: {e}")
-                await menu_aprovar_usuarios(update, context)
+            if await alterar_nivel_usuario_async(user_id, nivel):
+                await query.answer(f"✅ Nível alterado para {nivel}")
+                await query.edit_message_text(
+                    "✅ Nível alterado com sucesso!\nVoltando para a lista de usuários...",
+                    reply_markup=InlineKeyboardMarkup([[
+                        InlineKeyboardButton("🔄 Atualizar Lista", callback_data='admin_gerenciar_usuarios')
+                    ]])
+                )
             else:
-                await query.answer("❌ Erro ao aprovar usuário")
-        
-        elif query.data.startswith('admin_recusar_'):
-            user_id = int(query.data.replace('admin_recusar_', ''))
-            if recusar_usuario(user_id):
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text="❌ Seu acesso não foi aprovado. Entre em contato com o administrador para mais informações."
-                    )
-                except Exception as e:
-                    print(f"Erro ao notificar usuário recusado: {e}")
-                await menu_aprovar_usuarios(update, context)
+                await query.answer("❌ Erro ao alterar nível")
+        else:
+            await query.answer("❌ Formato de callback inválido")
+    except Exception as e:
+        print(f"Erro ao processar alteração de nível: {e}")
+        await query.answer("❌ Erro ao processar alteração de nível")
+
+@rota('set_status', acesso=ADMIN, legado={'set_status_ativo': (True,), 'set_status_inativo': (False,)})
+async def definir_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        if len(context.args) == 2:
+            ativo, user_id = context.args
+            
+            if ativo:
+                sucesso = await aprovar_usuario_async(user_id)
             else:
-                await query.answer("❌ Erro ao recusar usuário")
-        
-        elif query.data == 'admin_relatorios':
-            await menu_relatorios(update, context)
-        
-        elif query.data == 'admin_config':
-            await menu_configuracoes(update, context)
-        
-        elif query.data == 'definir_dpc':
-            await solicitar_id_dpc(update, context)
-        
-        elif query.data == 'menu_admin':
-            await menu_admin(update, context)
-        
-        elif query.data == 'menu_relatorios':
-            await menu_relatorios(update, context)
-        
-        elif query.data == 'admin_enviar_mensagem':
-            await iniciar_envio_mensagem(update, context)
-        
-        elif query.data.startswith('gerenciar_usuario_'):
-            await menu_gerenciar_usuario_individual(update, context)
+                sucesso = await desativar_usuario_async(user_id)
             
-        elif query.data.startswith('msg_'):
-            await solicitar_mensagem(update, context)
-        
-        elif query.data == 'cancelar_envio':
-            context.user_data.pop('envio_mensagem', None)
-            await menu_usuarios(update, context)
-        
-        elif query.data.startswith('set_nivel_'):
-            try:
-                partes = query.data.split('_')
-                if len(partes) >= 4:
-                    nivel = partes[2]
-                    user_id = partes[3]
-                    
-                    if alterar_nivel_usuario(int(user_id), nivel):
-                        await query.answer(f"✅ Nível alterado para {nivel}")
-                        await query.edit_message_text(
-                            "✅ Nível alterado com sucesso!\nVoltando para a lista de usuários...",
-                            reply_markup=InlineKeyboardMarkup([[
-                                InlineKeyboardButton("🔄 Atualizar Lista", callback_data='admin_gerenciar_usuarios')
-                            ]])
-                        )
-                    else:
-                        await query.answer("❌ Erro ao alterar nível")
-                else:
-                    await query.answer("❌ Formato de callback inválido")
-            except Exception as e:
-                print(f"Erro ao processar alteração de nível: {e}")
-                await query.answer("❌ Erro ao processar alteração de nível")
-        
-        elif query.data.startswith('set_status_'):
-            try:
-                partes = query.data.split('_')
-                if len(partes) >= 4:
-                    status = partes[2]  # ativo ou inativo
-                    user_id = partes[3]  # ID do usuário
-                    user_id = int(user_id)
-                    
-                    if status == 'ativo':
-                        sucesso = aprovar_usuario(user_id)
-                    else:
-                        sucesso = desativar_usuario(user_id)
-                    
-                    if sucesso:
-                        try:
-                            if status != 'ativo':
-                                await context.bot.send_message(
-                                    chat_id=user_id,
-                                    text="❌ Seu acesso foi revogado. Você precisará solicitar nova aprovação para usar o bot."
-                                )
-                        except Exception as e:
-                            print(f"Erro ao notificar usuário: {e}")
-                        
-                        await query.answer(f"✅ Status alterado com sucesso")
-                        await query.edit_message_text(
-                            "✅ Operação realizada com sucesso!\nVoltando para a lista de usuários...",
-                            reply_markup=InlineKeyboardMarkup([[
-                                InlineKeyboardButton("🔄 Atualizar Lista", callback_data='admin_gerenciar_usuarios')
-                            ]])
+            if sucesso:
+                try:
+                    if not ativo:
+                        await context.bot.send_message(
+                            chat_id=user_id,
+                            text="❌ Seu acesso foi revogado. Você precisará solicitar nova aprovação para usar o bot."
                         )
-                    else:
-                        await query.answer("❌ Erro ao alterar status")
-                else:
-                    await query.answer("❌ Formato de callback inválido")
-            except Exception as e:
-                print(f"Erro ao alterar status do usuário: {e}")
-                await query.answer("❌ Erro ao processar alteração de status")
-        
-        elif query.data == 'relatorio_hoje':
-            hoje = datetime.now()
-            inicio = hoje.replace(hour=0, minute=0, second=0)
-            fim = hoje.replace(hour=23, minute=59, second=59)
-            await gerar_relatorio(update, context, inicio, fim, "Hoje")
-
-        elif query.data == 'relatorio_semana':
-            hoje = datetime.now()
-            inicio = hoje - timedelta(days=7)
-            fim = hoje
-            await gerar_relatorio(update, context, inicio, fim, "Últimos 7 dias")
-
-        elif query.data == 'relatorio_mes':
-            hoje = datetime.now()
-            inicio = hoje.replace(day=1)
-            fim = hoje
-            await gerar_relatorio(update, context, inicio, fim, "Este mês")
-
-        elif query.data == 'relatorio_mes_anterior':
-            hoje = datetime.now()
-            inicio = (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
-            fim = hoje.replace(day=1) - timedelta(days=1)
-            await gerar_relatorio(update, context, inicio, fim, "Mês anterior")
+                except Exception as e:
+                    print(f"Erro ao notificar usuário: {e}")
+                
+                await query.answer(f"✅ Status alterado com sucesso")
+                await query.edit_message_text(
+                    "✅ Operação realizada com sucesso!\nVoltando para a lista de usuários...",
+                    reply_markup=InlineKeyboardMarkup([[
+                        InlineKeyboardButton("🔄 Atualizar Lista", callback_data='admin_gerenciar_usuarios')
+                    ]])
+                )
+            else:
+                await query.answer("❌ Erro ao alterar status")
+        else:
+            await query.answer("❌ Formato de callback inválido")
+    except Exception as e:
+        print(f"Erro ao alterar status do usuário: {e}")
+        await query.answer("❌ Erro ao processar alteração de status")
+
+# Limite de caracteres de uma mensagem do Telegram
+LIMITE_MENSAGEM = 4096
+AVISO_EXPORTACAO = "…\n_Relatório resumido: exporte em PDF/CSV para o detalhe completo._\n"
 
+def _periodo_relatorio(chave: str):
+    """(início, fim, descrição) de cada botão do menu de relatórios"""
+    hoje = datetime.now(pytz.timezone('America/Sao_Paulo')).replace(tzinfo=None)
+    if chave == 'relatorio_hoje':
+        return hoje.replace(hour=0, minute=0, second=0), hoje.replace(hour=23, minute=59, second=59), "Hoje"
+    if chave == 'relatorio_semana':
+        # Dias inteiros: hoje e os 6 anteriores
+        return hoje - timedelta(days=6), hoje, "Últimos 7 dias"
+    if chave == 'relatorio_mes':
+        return hoje.replace(day=1), hoje, "Este mês"
+    inicio = (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
+    fim = hoje.replace(day=1) - timedelta(days=1)
+    return inicio, fim, "Mês anterior"
+
+@rota('relatorio_hoje', 'relatorio_semana', 'relatorio_mes', 'relatorio_mes_anterior', acesso=ADMIN)
+async def rota_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chave = update.callback_query.data
+    inicio, fim, periodo = _periodo_relatorio(chave)
+    await gerar_relatorio(update, context, inicio, fim, periodo, chave)
+
+@rota('relatorio_exportar', acesso=ADMIN)
+async def exportar_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Envia o relatório do período como arquivo (PDF ou CSV)"""
+    chave, formato = context.args
+    inicio, fim, periodo = _periodo_relatorio(chave)
+    chat_id = update.callback_query.message.chat_id
+    titulo = f"Relatório de Atividades - {periodo}"
+    await context.bot.send_chat_action(chat_id, ChatAction.UPLOAD_DOCUMENT)
+    try:
+        diretorio, caminho, linhas = await exportacao.exportar_relatorio(
+            formato, inicio.date(), fim.date(), titulo)
     except Exception as e:
-        print(f"Erro no callback administrativo: {e}")
-        await query.answer("❌ Erro ao processar comando")
+        print(f"Erro ao exportar relatório: {e}")
+        await context.bot.send_message(chat_id, "❌ Erro ao gerar o arquivo do relatório")
+        return
+    try:
+        nome = f"relatorio_{inicio:%Y%m%d}_{fim:%Y%m%d}.{formato}"
+        with open(caminho, 'rb') as arquivo:
+            await context.bot.send_document(
+                chat_id,
+                document=arquivo,
+                filename=nome,
+                caption=f"📊 {titulo} ({linhas} linha(s))"
+            )
+    finally:
+        exportacao.remover_exportacao(diretorio)
 
 
-async def gerar_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE, inicio, fim, periodo):
+async def gerar_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE, inicio, fim, periodo,
+                          chave=None):
     """Gera relatório detalhado de atividades"""
     try:
-        # Ajustar timezone das datas de início e fim
-        timezone = pytz.timezone('America/Sao_Paulo')
-        inicio = timezone.localize(inicio)
-        fim = timezone.localize(fim)
-
-        acessos, assinaturas = obter_relatorio_atividades(inicio, fim)
+        # Os agregados são por dia (horário de Brasília)
+        acessos, assinaturas = await obter_relatorio_atividades_async(inicio.date(), fim.date())
 
-        texto = f"📊 *Relatório de Atividades - {periodo}*\n\n"
+        titulo = f"📊 *Relatório de Atividades - {periodo}*\n\n"
+        texto = ""
 
         # Contadores
         total_acessos = 0
@@ -562,9 +573,6 @@ async def gerar_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE, in
                 total_acessos += total
                 usuarios_ativos.add(nome)
                 texto += f"• {nome} ({nivel})\n"
-                # Converter horários para timezone local
-                primeiro_acesso = primeiro_acesso.astimezone(timezone)
-                ultimo_acesso = ultimo_acesso.astimezone(timezone)
                 texto += f"  └ Primeiro acesso: {primeiro_acesso.strftime('%H:%M')}\n"
                 texto += f"  └ Último acesso: {ultimo_acesso.strftime('%H:%M')}\n"
                 texto += f"  └ Total de acessos: {total}\n\n"
@@ -576,15 +584,27 @@ async def gerar_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE, in
                 texto += f"• {nome}: {total} assinaturas\n"
 
         # Resumo
-        texto += "\n*📈 Resumo do Período*\n"
-        texto += f"• Total de acessos: {total_acessos}\n"
-        texto += f"• Usuários ativos: {len(usuarios_ativos)}\n"
-        texto += f"• Assinaturas processadas: {total_assinaturas}\n"
+        resumo = "\n*📈 Resumo do Período*\n"
+        resumo += f"• Total de acessos: {total_acessos}\n"
+        resumo += f"• Usuários ativos: {len(usuarios_ativos)}\n"
+        resumo += f"• Assinaturas processadas: {total_assinaturas}\n"
 
         if not acessos and not assinaturas:
-            texto += "\nNenhuma atividade registrada no período."
+            resumo += "\nNenhuma atividade registrada no período."
+
+        # Períodos longos não cabem em uma mensagem: o detalhe completo vai na exportação
+        espaco = LIMITE_MENSAGEM - len(titulo) - len(resumo) - len(AVISO_EXPORTACAO)
+        if len(texto) > espaco:
+            texto = texto[:texto.rfind('\n', 0, espaco) + 1] + AVISO_EXPORTACAO
+        texto = titulo + texto + resumo
 
-        keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='admin_relatorios')]]
+        keyboard = []
+        if chave:
+            keyboard.append([
+                InlineKeyboardButton("📄 Exportar PDF", callback_data=callback('relatorio_exportar', chave, 'pdf')),
+                InlineKeyboardButton("📑 Exportar CSV", callback_data=callback('relatorio_exportar', chave, 'csv'))
+            ])
+        keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='admin_relatorios')])
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         await update.callback_query.edit_message_text(
@@ -0,0 +1,266 @@
+# agendador_lembretes.py
+import asyncio
+import heapq
+from functools import partial
+import pytz
+from datetime import datetime, date, time as dtime, timedelta
+from database_manager import db, assincrono
+from entregador_lembretes import entregador, enfileirar_entregas_async
+from recorrencia import proxima_ocorrencia
+
+TIMEZONE = pytz.timezone('America/Sao_Paulo')
+# Limite de cada espera, para tolerar ajustes no relógio do sistema
+ESPERA_MAXIMA = 3600
+# Espera entre tentativas de enfileirar um lembrete vencido: base * 2^n, limitada ao teto
+RETENTATIVA_BASE = 30
+RETENTATIVA_TETO = 600
+# Canal LISTEN/NOTIFY das alterações de lembretes (criados/apagados em qualquer worker)
+CANAL_LEMBRETES = 'dcyber_lembretes'
+
+def inicio_lembrete(data, hora) -> datetime:
+    """Combina data/hora do lembrete (texto ou date/time) em datetime local sem fuso"""
+    if isinstance(data, str):
+        data = date.fromisoformat(data)
+    if isinstance(hora, str):
+        hora = dtime.fromisoformat(hora)
+    return datetime.combine(data, hora)
+
+def momento_lembrete(data, hora):
+    """Converte data/hora do lembrete (texto ou date/time) em datetime local"""
+    return TIMEZONE.localize(inicio_lembrete(data, hora))
+
+def proximo_vencimento(data, hora, recorrencia, ultima_ocorrencia):
+    """Próximo vencimento (datetime local) de um lembrete único ou de uma série.
+
+    Séries só guardam a última ocorrência enfileirada: a seguinte é calculada
+    aqui, sob demanda. Após uma parada, só a primeira ocorrência perdida é
+    entregue; uma série nova começa na próxima ocorrência a partir de agora.
+    """
+    if recorrencia is None:
+        return momento_lembrete(data, hora)
+    inicio = inicio_lembrete(data, hora)
+    agora = datetime.now(TIMEZONE).replace(tzinfo=None)
+    depois = ultima_ocorrencia or max(inicio - timedelta(microseconds=1), agora)
+    ocorrencia = proxima_ocorrencia(recorrencia, inicio, depois)
+    return None if ocorrencia is None else TIMEZONE.localize(ocorrencia)
+
+def carregar_lembretes_pendentes():
+    """Lembretes únicos com destinatários pendentes e todas as séries ativas.
+
+    Lembretes únicos vencidos (bot parado ou queda antes da entrega) também são
+    carregados: vão ao heap com o vencimento no passado e são entregues de imediato.
+    """
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT l.id, l.data, l.hora, l.recorrencia, l.ultima_ocorrencia
+            FROM lembretes l
+            WHERE l.ativo = TRUE
+            AND l.recorrencia IS NULL
+            AND EXISTS (
+                SELECT 1 FROM lembrete_destinatarios ld
+                WHERE ld.lembrete_id = l.id AND ld.notificado = FALSE
+            )
+            UNION ALL
+            SELECT l.id, l.data, l.hora, l.recorrencia, l.ultima_ocorrencia
+            FROM lembretes l
+            WHERE l.ativo = TRUE
+            AND l.recorrencia IS NOT NULL
+        ''')
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+def carregar_lembrete_pendente(lembrete_id: int):
+    """(data, hora, recorrencia, ultima_ocorrencia) do lembrete ativo que ainda vence"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT l.data, l.hora, l.recorrencia, l.ultima_ocorrencia
+            FROM lembretes l
+            WHERE l.id = %s
+            AND l.ativo = TRUE
+            AND (l.recorrencia IS NOT NULL OR EXISTS (
+                SELECT 1 FROM lembrete_destinatarios ld
+                WHERE ld.lembrete_id = l.id AND ld.notificado = FALSE
+            ))
+        ''', (lembrete_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+def notificar_lembrete(cursor, lembrete_id: int):
+    """Avisa o líder que o lembrete mudou; entregue junto com o commit da transação"""
+    cursor.execute('SELECT pg_notify(%s, %s)', (CANAL_LEMBRETES, str(lembrete_id)))
+
+carregar_lembretes_pendentes_async = assincrono(carregar_lembretes_pendentes)
+carregar_lembrete_pendente_async = assincrono(carregar_lembrete_pendente)
+
+async def entregar_lembrete(lembrete_id: int, ocorrencia: datetime = None):
+    """Passa os destinatários do lembrete vencido (ou da ocorrência da série) para a caixa de saída"""
+    total = await enfileirar_entregas_async(lembrete_id, ocorrencia)
+    if total:
+        entregador.acordar()
+
+
+class AgendadorLembretes:
+    """Fila de prioridade (min-heap) de lembretes, acordada no próximo vencimento"""
+
+    def __init__(self):
+        self._heap = []
+        self._agendados = {}
+        # Séries ativas: lembrete_id -> (regra, início); só a próxima ocorrência vai ao heap
+        self._series = {}
+        self._loop = None
+        self._acordar = None
+        self._tarefa = None
+        self._bot = None
+        self._entregas = set()
+        # Última entrega de cada série: as ocorrências chegam ao banco em ordem
+        self._entregas_serie = {}
+
+    async def iniciar(self, bot):
+        """Reconstrói a fila a partir do banco e inicia o loop de entrega"""
+        self._heap = []
+        self._agendados = {}
+        self._series = {}
+        self._loop = asyncio.get_running_loop()
+        self._acordar = asyncio.Event()
+        self._bot = bot
+        for lembrete_id, *lembrete in await carregar_lembretes_pendentes_async():
+            self._agendar_lembrete(lembrete_id, *lembrete)
+        print(f"Agendador de lembretes iniciado com {len(self._agendados)} lembrete(s)")
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        self._loop = None
+        # Entregas ainda em retentativa param aqui; lembretes únicos pendentes
+        # voltam ao heap na próxima inicialização (carregar_lembretes_pendentes)
+        for entrega in self._entregas:
+            entrega.cancel()
+        if self._entregas:
+            await asyncio.gather(*self._entregas, return_exceptions=True)
+
+    def agendar(self, lembrete_id: int, quando: datetime, serie=None):
+        """Agenda (ou reagenda) um lembrete; pode ser chamado de qualquer thread.
+
+        serie=(regra, início) faz o lembrete se reagendar a cada vencimento.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._inserir, lembrete_id, quando, serie)
+
+    def cancelar(self, lembrete_id: int):
+        """Remove o lembrete da fila; pode ser chamado de qualquer thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._remover, lembrete_id)
+
+    async def sincronizar(self, lembrete_id: int):
+        """Reagenda ou remove o lembrete conforme o estado atual no banco"""
+        lembrete = await carregar_lembrete_pendente_async(lembrete_id)
+        if lembrete is None:
+            self.cancelar(lembrete_id)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._agendar_lembrete, lembrete_id, *lembrete)
+
+    def _agendar_lembrete(self, lembrete_id, data, hora, recorrencia, ultima_ocorrencia):
+        quando = proximo_vencimento(data, hora, recorrencia, ultima_ocorrencia)
+        if quando is None:
+            self._remover(lembrete_id)
+            return
+        serie = None
+        if recorrencia is not None:
+            serie = (recorrencia, inicio_lembrete(data, hora))
+        self._inserir(lembrete_id, quando, serie)
+
+    def _inserir(self, lembrete_id, quando, serie=None):
+        self._agendados[lembrete_id] = quando
+        if serie is None:
+            self._series.pop(lembrete_id, None)
+        else:
+            self._series[lembrete_id] = serie
+        heapq.heappush(self._heap, (quando, lembrete_id))
+        self._acordar.set()
+
+    def _remover(self, lembrete_id):
+        # Remoção preguiçosa: a entrada no heap é ignorada quando chegar a vez
+        self._agendados.pop(lembrete_id, None)
+        self._series.pop(lembrete_id, None)
+
+    def _proximo(self):
+        while self._heap:
+            quando, lembrete_id = self._heap[0]
+            if self._agendados.get(lembrete_id) == quando:
+                return quando, lembrete_id
+            heapq.heappop(self._heap)
+        return None
+
+    async def _executar(self):
+        while True:
+            proximo = self._proximo()
+            agora = datetime.now(TIMEZONE)
+            if proximo is None or proximo[0] > agora:
+                espera = ESPERA_MAXIMA
+                if proximo is not None:
+                    espera = min(espera, (proximo[0] - agora).total_seconds())
+                self._acordar.clear()
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), timeout=espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            quando, lembrete_id = heapq.heappop(self._heap)
+            self._agendados.pop(lembrete_id, None)
+            serie = self._series.pop(lembrete_id, None)
+            ocorrencia = None
+            anterior = None
+            if serie is not None:
+                # Série: só a próxima ocorrência entra no heap (a partir de agora)
+                regra, inicio = serie
+                ocorrencia = quando.replace(tzinfo=None)
+                proxima = proxima_ocorrencia(regra, inicio, max(ocorrencia, agora.replace(tzinfo=None)))
+                if proxima is not None:
+                    self._inserir(lembrete_id, TIMEZONE.localize(proxima), serie)
+                anterior = self._entregas_serie.get(lembrete_id)
+            # A entrega segue em paralelo para não atrasar o próximo vencimento
+            entrega = asyncio.create_task(self._entregar(lembrete_id, ocorrencia, anterior))
+            self._entregas.add(entrega)
+            entrega.add_done_callback(self._entregas.discard)
+            if ocorrencia is not None:
+                self._entregas_serie[lembrete_id] = entrega
+                entrega.add_done_callback(partial(self._fim_entrega_serie, lembrete_id))
+
+    def _fim_entrega_serie(self, lembrete_id, entrega):
+        if self._entregas_serie.get(lembrete_id) is entrega:
+            del self._entregas_serie[lembrete_id]
+
+    async def _entregar(self, lembrete_id, ocorrencia=None, anterior=None):
+        if anterior is not None:
+            # Uma ocorrência em retentativa vem antes da seguinte: enfileirar a seguinte
+            # primeiro avançaria ultima_ocorrencia e a anterior seria recusada
+            await asyncio.wait([anterior])
+        # O lembrete já saiu do heap: uma falha transitória do banco não pode perdê-lo
+        espera = RETENTATIVA_BASE
+        while True:
+            try:
+                await entregar_lembrete(lembrete_id, ocorrencia)
+                return
+            except Exception as e:
+                print(f"Erro ao entregar lembrete {lembrete_id}, nova tentativa em {espera}s: {e}")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, RETENTATIVA_TETO)
+
+
+# Instância global
+agendador = AgendadorLembretes()
@@ -3,6 +3,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from decorators import user_approved
+from roteador import rota
 import sqlite3
 
 # Textos de ajuda
@@ -106,6 +107,7 @@ AJUDA_LEMBRETES = """
 /meuslembretes - Lista lembretes
 """
 
+@rota('ajuda')
 @user_approved
 async def menu_ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu principal de ajuda"""
@@ -135,28 +137,23 @@ async def comando_ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /ajuda"""
     await menu_ajuda(update, context)
 
-@user_approved
-async def handle_ajuda_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Gerencia callbacks do menu de ajuda"""
+# Texto exibido por cada botão do menu de ajuda
+AJUDA_TEXTOS = {
+    'ajuda_assinaturas': AJUDA_ASSINATURAS,
+    'ajuda_casos': AJUDA_CASOS,
+    'ajuda_contatos': AJUDA_CONTATOS,
+    'ajuda_lembretes': AJUDA_LEMBRETES
+}
+
+@rota(*AJUDA_TEXTOS)
+async def mostrar_ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Exibe o texto de ajuda do tópico escolhido"""
     query = update.callback_query
-    await query.answer()
-    
-    ajuda_textos = {
-        'ajuda_assinaturas': AJUDA_ASSINATURAS,
-        'ajuda_casos': AJUDA_CASOS,
-        'ajuda_contatos': AJUDA_CONTATOS,
-        'ajuda_lembretes': AJUDA_LEMBRETES
-    }
-    
-    if query.data in ajuda_textos:
-        keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='ajuda')]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.message.edit_text(
-            ajuda_textos[query.data],
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+    keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='ajuda')]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
     
-    elif query.data == 'ajuda':
-        await menu_ajuda(update, context)
\ No newline at end of file
+    await query.message.edit_text(
+        AJUDA_TEXTOS[query.data],
+        reply_markup=reply_markup,
+        parse_mode=ParseMode.MARKDOWN
+    )
@@ -3,27 +3,101 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from database import (
-    consultar_assinaturas, 
-    apagar_assinatura_por_sequencia, 
-    gerar_sequencia, 
-    inserir_assinatura,
-    obter_id_dpc,
-    registrar_acesso,
-    get_user_display_info
+    consultar_assinaturas_pagina_async,
+    apagar_assinatura_por_sequencia_async,
+    assinar_todas_async,
+    inserir_assinaturas,
+    obter_id_dpc_async,
+    registrar_acesso_async,
+    get_user_display_info_async
 )
+from database_manager import assincrono
 from database_estatisticas import incrementar_contador, registrar_acao_usuario
-from decorators import user_approved, admin_required
+from roteador import rota, callback
+from despachante import despachante
 
-async def create_admin_notification_markup(sequencia):
-    """Cria markup para notificação do admin/DPC"""
-    keyboard = [
-        [InlineKeyboardButton("✍️ Assinar", callback_data=f'assinar_notificacao_{sequencia}')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+# Limites de cada notificação consolidada enviada ao DPC
+ITENS_POR_NOTIFICACAO = 20
+BOTOES_POR_LINHA = 4
+TAMANHO_MAXIMO_TEXTO = 3500
+
+def montar_notificacoes_lote(chat_id, username, documentos_adicionados):
+    """Agrupa os documentos em poucas mensagens, com um botão de assinatura por item"""
+    grupos = []
+    atual = []
+    tamanho = 0
+    for documento, seq in documentos_adicionados:
+        linha = f"📄 #{seq} - {documento}\n"
+        if atual and (len(atual) >= ITENS_POR_NOTIFICACAO or tamanho + len(linha) > TAMANHO_MAXIMO_TEXTO):
+            grupos.append(atual)
+            atual = []
+            tamanho = 0
+        atual.append((seq, linha))
+        tamanho += len(linha)
+    if atual:
+        grupos.append(atual)
+
+    envios = []
+    for indice, grupo in enumerate(grupos, start=1):
+        cabecalho = f"📑 Nova solicitação: {len(documentos_adicionados)} documento(s)\n"
+        if len(grupos) > 1:
+            cabecalho += f"Parte {indice}/{len(grupos)}\n"
+        cabecalho += f"👤 Solicitante: {username}\n\n"
+        botoes = [
+            InlineKeyboardButton(f"✍️ #{seq}", callback_data=callback('assinar_lote', seq))
+            for seq, _ in grupo
+        ]
+        envios.append({
+            'chat_id': chat_id,
+            'text': cabecalho + ''.join(linha for _, linha in grupo),
+            'reply_markup': InlineKeyboardMarkup([
+                botoes[i:i + BOTOES_POR_LINHA] for i in range(0, len(botoes), BOTOES_POR_LINHA)
+            ])
+        })
+    return envios
+
+def montar_avisos_assinadas(assinadas):
+    """Agrupa os documentos assinados por solicitante (uma mensagem por usuário)"""
+    por_usuario = {}
+    for user_id, _, documento, _ in assinadas:
+        por_usuario.setdefault(user_id, []).append(documento)
+
+    envios = []
+    for user_id, documentos in por_usuario.items():
+        if len(documentos) == 1:
+            titulo = "✅ *Documento Assinado!*\n\n"
+        else:
+            titulo = f"✅ *{len(documentos)} Documentos Assinados!*\n\n"
+        texto = titulo
+        for documento in documentos:
+            linha = f"📝 Documento: {documento}\n"
+            if len(texto) + len(linha) > TAMANHO_MAXIMO_TEXTO:
+                envios.append({'chat_id': user_id, 'text': texto, 'parse_mode': ParseMode.MARKDOWN})
+                texto = titulo
+            texto += linha
+        envios.append({'chat_id': user_id, 'text': texto, 'parse_mode': ParseMode.MARKDOWN})
+    return envios
+
+def remover_botao(reply_markup, callback_data):
+    """Retorna o teclado sem o botão indicado (None se não sobrar nenhum)"""
+    linhas = []
+    for linha in (reply_markup.inline_keyboard if reply_markup else []):
+        restantes = [botao for botao in linha if botao.callback_data != callback_data]
+        if restantes:
+            linhas.append(restantes)
+    return InlineKeyboardMarkup(linhas) if linhas else None
+
+ITENS_POR_PAGINA = 5
 
-async def atualizar_menu_assinaturas(query, context):
-    """Atualiza o menu de assinaturas com as pendentes"""
-    assinaturas = consultar_assinaturas()
+async def atualizar_menu_assinaturas(query, context, chave=None, direcao='proxima'):
+    """Atualiza o menu de assinaturas com uma página das pendentes"""
+    assinaturas, tem_anterior, tem_proxima = await consultar_assinaturas_pagina_async(
+        chave, direcao, ITENS_POR_PAGINA
+    )
+    if not assinaturas and chave is not None:
+        # A página ficou vazia (itens já assinados): volta ao início da fila
+        await atualizar_menu_assinaturas(query, context)
+        return
     if not assinaturas:
         await query.edit_message_text(
             text="📝 *Assinaturas Pendentes*\n\n"
@@ -35,23 +109,38 @@ async def atualizar_menu_assinaturas(query, context):
         )
         return
 
-    # Limitar a 5 assinaturas por vez
-    assinaturas = assinaturas[:5]
+    # Cursores (data_criacao, id) das bordas da página, levados nos botões
+    primeiro_id, _, _, _, _, primeira_data, _ = assinaturas[0]
+    ultimo_id, _, _, _, _, ultima_data, _ = assinaturas[-1]
+
     assinaturas_texto = "*📋 Assinaturas Pendentes:*\n\n"
-    
-    for _, _, username, documento, seq in assinaturas:
-        user_info = get_user_display_info(username=username)
-        display_name = user_info['display_name'] if user_info else username
+    for _, _, _, documento, seq, _, display_name in assinaturas:
         assinaturas_texto += f"📄 *#{seq}*\n"
         assinaturas_texto += f"👤 Solicitante: {display_name}\n"
         assinaturas_texto += f"📝 Documento: {documento}\n\n"
     
     keyboard = []
-    for _, _, _, _, seq in assinaturas:
+    for _, _, _, _, seq, _, _ in assinaturas:
         keyboard.append([
-            InlineKeyboardButton(f"✍️ Assinar #{seq}", callback_data=f'assinar_lista_{seq}')
+            # Depois de assinar, recarrega a mesma página a partir do seu primeiro item
+            InlineKeyboardButton(
+                f"✍️ Assinar #{seq}",
+                callback_data=callback('assinar_lista', seq, primeira_data, primeiro_id)
+            )
         ])
     
+    navegacao = []
+    if tem_anterior:
+        navegacao.append(InlineKeyboardButton(
+            "⬅️ Anteriores", callback_data=callback('pag_assinaturas', 'anterior', primeira_data, primeiro_id)
+        ))
+    if tem_proxima:
+        navegacao.append(InlineKeyboardButton(
+            "Próximas ➡️", callback_data=callback('pag_assinaturas', 'proxima', ultima_data, ultimo_id)
+        ))
+    if navegacao:
+        keyboard.append(navegacao)
+    
     keyboard.append([InlineKeyboardButton("✍️ Assinar Todas", callback_data='apagar_todas_assinaturas')])
     keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')])
     
@@ -62,155 +151,176 @@ async def atualizar_menu_assinaturas(query, context):
         parse_mode=ParseMode.MARKDOWN
     )
 
-@user_approved
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handler principal para botões de assinaturas"""
+@rota('assinaturas')
+async def menu_assinaturas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Menu de assinaturas"""
+    keyboard = [
+        [InlineKeyboardButton("✍️ Solicitar Assinatura", callback_data='solicitar_assinatura')],
+        [InlineKeyboardButton("🔍 Consultar Assinatura", callback_data='consultar_assinatura')],
+        [InlineKeyboardButton("🔙 Menu Principal", callback_data='menu_principal')]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await update.callback_query.message.edit_text("📑 Menu de Assinaturas", reply_markup=reply_markup)
+
+@rota('solicitar_assinatura')
+async def solicitar_assinatura(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Aguarda os documentos a cadastrar para assinatura"""
     query = update.callback_query
-    user_id = query.from_user.id
-    await query.answer()
-
-    if query.data == 'assinaturas':
-        keyboard = [
-            [InlineKeyboardButton("✍️ Solicitar Assinatura", callback_data='solicitar_assinatura')],
-            [InlineKeyboardButton("🔍 Consultar Assinatura", callback_data='consultar_assinatura')],
-            [InlineKeyboardButton("🔙 Voltar", callback_data='menu_principal')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    await registrar_acesso_async(query.from_user.id, 'solicitacao_assinatura')
+    dpc_id = await obter_id_dpc_async()
+    if not dpc_id:
         await query.edit_message_text(
-            text="📑 *Menu de Assinaturas*\n\n"
-                 "Escolha uma opção:",
-            reply_markup=reply_markup,
+            text="⚠️ *Atenção!*\n\n"
+                 "Não há DPC definido no sistema.\n"
+                 "Por favor, contate o administrador.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
+            ]]),
             parse_mode=ParseMode.MARKDOWN
         )
+        return
+        
+    await query.edit_message_text(
+        text="📝 *Nova Solicitação de Assinatura*\n\n"
+             "Envie os documentos que deseja cadastrar para assinatura.\n\n"
+             "*Dicas:*\n"
+             "• Separe cada documento em uma linha\n"
+             "• Seja claro e objetivo\n"
+             "• Evite caracteres especiais",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
+        ]]),
+        parse_mode=ParseMode.MARKDOWN
+    )
+    context.user_data['esperando_documento'] = True
 
-    elif query.data == 'solicitar_assinatura':
-        registrar_acesso(user_id, 'solicitacao_assinatura')
-        dpc_id = obter_id_dpc()
-        if not dpc_id:
-            await query.edit_message_text(
-                text="⚠️ *Atenção!*\n\n"
-                     "Não há DPC definido no sistema.\n"
-                     "Por favor, contate o administrador.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
-                ]]),
-                parse_mode=ParseMode.MARKDOWN
-            )
-            return
-            
+@rota('consultar_assinatura')
+async def consultar_assinaturas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await atualizar_menu_assinaturas(update.callback_query, context)
+
+@rota('assinar_notificacao', legado=True)
+async def assinar_notificacao(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    sequencia = int(context.args[0])
+    user_info = await apagar_assinatura_por_sequencia_async(sequencia)
+    if user_info:
+        user_id, username, documento = user_info
+        solicitante_info = await get_user_display_info_async(user_id=user_id)
+        display_name = solicitante_info['display_name'] if solicitante_info else username
+        
+        # Notifica o usuário que cadastrou a assinatura
+        await context.bot.send_message(
+            chat_id=user_id,
+            text=f"✅ *Documento Assinado!*\n\n"
+                 f"📝 Documento: {documento}\n"
+                 f"👤 Solicitante: {display_name}",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        # Atualiza a mensagem do admin/DPC
         await query.edit_message_text(
-            text="📝 *Nova Solicitação de Assinatura*\n\n"
-                 "Envie os documentos que deseja cadastrar para assinatura.\n\n"
-                 "*Dicas:*\n"
-                 "• Separe cada documento em uma linha\n"
-                 "• Seja claro e objetivo\n"
-                 "• Evite caracteres especiais",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
-            ]]),
+            text=f"✅ *Assinatura Confirmada!*\n\n"
+                 f"📝 Documento: {documento}\n"
+                 f"👤 Solicitante: {display_name}",
+            parse_mode=ParseMode.MARKDOWN
+        )
+    else:
+        await query.edit_message_text(
+            text="❌ *Erro*\n\n"
+                 "Assinatura não encontrada ou já processada.",
             parse_mode=ParseMode.MARKDOWN
         )
-        context.user_data['esperando_documento'] = True
 
-    elif query.data == 'consultar_assinatura':
-        await atualizar_menu_assinaturas(query, context)
+@rota('assinar_lote', legado=True)
+async def assinar_lote(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botão de um item da notificação consolidada"""
+    query = update.callback_query
+    sequencia, = context.args
+    user_info = await apagar_assinatura_por_sequencia_async(sequencia)
+    if user_info:
+        user_id, username, documento = user_info
+        despachante.enviar(context.bot, [{
+            'chat_id': user_id,
+            'text': f"✅ *Documento Assinado!*\n\n"
+                    f"📝 Documento: {documento}",
+            'parse_mode': ParseMode.MARKDOWN
+        }])
+    
+    # Remove o botão do item (assinado agora ou já processado antes)
+    teclado = remover_botao(query.message.reply_markup, query.data)
+    if teclado:
+        await query.edit_message_reply_markup(reply_markup=teclado)
+    else:
+        await query.edit_message_text(
+            text=f"{query.message.text}\n\n✅ Todos os documentos foram assinados."
+        )
 
-    elif query.data.startswith('assinar_notificacao_'):
-        sequencia = int(query.data.split('_')[-1])
-        user_info = apagar_assinatura_por_sequencia(sequencia)
-        if user_info:
-            user_id, username, documento = user_info
-            solicitante_info = get_user_display_info(user_id=user_id)
-            display_name = solicitante_info['display_name'] if solicitante_info else username
-            
-            # Notifica o usuário que cadastrou a assinatura
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=f"✅ *Documento Assinado!*\n\n"
-                     f"📝 Documento: {documento}\n"
-                     f"👤 Solicitante: {display_name}",
-                parse_mode=ParseMode.MARKDOWN
-            )
-            # Atualiza a mensagem do admin/DPC
-            await query.edit_message_text(
-                text=f"✅ *Assinatura Confirmada!*\n\n"
-                     f"📝 Documento: {documento}\n"
-                     f"👤 Solicitante: {display_name}",
-                parse_mode=ParseMode.MARKDOWN
-            )
-        else:
-            await query.edit_message_text(
-                text="❌ *Erro*\n\n"
-                     "Assinatura não encontrada ou já processada.",
-                parse_mode=ParseMode.MARKDOWN
-            )
+@rota('assinar_lista', legado=True)
+async def assinar_lista(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botão de um item da página de consulta"""
+    query = update.callback_query
+    # Botões antigos ('assinar_lista_<seq>') não trazem a página: volta ao início
+    sequencia, *pagina = context.args
+    user_info = await apagar_assinatura_por_sequencia_async(sequencia)
+    if user_info:
+        user_id, username, documento = user_info
+        despachante.enviar(context.bot, montar_avisos_assinadas([(user_id, username, documento, sequencia)]))
+    # Redesenha a página também quando outro usuário já assinou o item (botão obsoleto)
+    await atualizar_menu_assinaturas(
+        query, context, tuple(pagina) or None, 'inicio'
+    )
 
-    elif query.data.startswith('assinar_lista_'):
-        sequencia = int(query.data.split('_')[-1])
-        user_info = apagar_assinatura_por_sequencia(sequencia)
-        if user_info:
-            user_id, username, documento = user_info
-            solicitante_info = get_user_display_info(user_id=user_id)
-            display_name = solicitante_info['display_name'] if solicitante_info else username
-            
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=f"✅ *Documento Assinado!*\n\n"
-                     f"📝 Documento: {documento}",
-                parse_mode=ParseMode.MARKDOWN
-            )
-            await atualizar_menu_assinaturas(query, context)
-
-    elif query.data == 'apagar_todas_assinaturas':
-        assinaturas = consultar_assinaturas()
-        if not assinaturas:
-            await query.edit_message_text(
-                text="ℹ️ *Informação*\n\n"
-                     "Nenhuma assinatura pendente para processar.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
-                ]]),
-                parse_mode=ParseMode.MARKDOWN
-            )
-        else:
-            total_assinadas = 0
-            for _, user_id, username, documento, sequencia in assinaturas:
-                user_info = apagar_assinatura_por_sequencia(sequencia)
-                if user_info:
-                    total_assinadas += 1
-                    solicitante_info = get_user_display_info(user_id=user_id)
-                    display_name = solicitante_info['display_name'] if solicitante_info else username
-                    
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=f"✅ *Documento Assinado!*\n\n"
-                             f"📝 Documento: {documento}",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-            
-            await query.edit_message_text(
-                text=f"✅ *Processamento Concluído*\n\n"
-                     f"Total de documentos assinados: {total_assinadas}",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
-                ]]),
-                parse_mode=ParseMode.MARKDOWN
-            )
+@rota('pag_assinaturas')
+async def paginar_assinaturas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    direcao, data_criacao, assinatura_id = context.args
+    await atualizar_menu_assinaturas(update.callback_query, context, (data_criacao, assinatura_id), direcao)
 
-    elif query.data == 'menu_principal':
-        from dcyber_bot import start
-        await start(update, context)
+@rota('apagar_todas_assinaturas')
+async def assinar_todas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Assina toda a fila e avisa cada solicitante"""
+    query = update.callback_query
+    assinadas = await assinar_todas_async()
+    if not assinadas:
+        await query.edit_message_text(
+            text="ℹ️ *Informação*\n\n"
+                 "Nenhuma assinatura pendente para processar.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
+            ]]),
+            parse_mode=ParseMode.MARKDOWN
+        )
+    else:
+        # Um aviso por solicitante, com todos os seus documentos
+        despachante.enviar(context.bot, montar_avisos_assinadas(assinadas))
+        
+        await query.edit_message_text(
+            text=f"✅ *Processamento Concluído*\n\n"
+                 f"Total de documentos assinados: {len(assinadas)}",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='assinaturas')
+            ]]),
+            parse_mode=ParseMode.MARKDOWN
+        )
 
-def adicionar_assinatura(user_id, username, documento):
-    """Adiciona nova assinatura no sistema"""
+def adicionar_assinaturas(user_id, username, documentos):
+    """Adiciona vários documentos de uma vez; retorna [(documento, sequencia)]"""
+    documentos = [documento.strip() for documento in documentos if documento.strip()]
+    if not documentos:
+        return []
     try:
-        sequencia = gerar_sequencia()
-        if inserir_assinatura(user_id, username, documento, sequencia):
-            incrementar_contador('documentos')
-            registrar_acao_usuario(user_id, 'novo_documento')
-            print(f"Assinatura adicionada - Seq: {sequencia}, User: {username}")
-            return sequencia
-        return None
+        sequencias = inserir_assinaturas(user_id, username, documentos)
+        if sequencias:
+            incrementar_contador('documentos', len(sequencias))
+            registrar_acao_usuario(user_id, 'novo_documento', len(sequencias))
+            print(f"{len(sequencias)} assinatura(s) adicionada(s) - Seq: {sequencias[0]}-{sequencias[-1]}, User: {username}")
+        return list(zip(documentos, sequencias))
     except Exception as e:
-        print(f"Erro ao adicionar assinatura: {e}")
-        return None
\ No newline at end of file
+        print(f"Erro ao adicionar assinaturas: {e}")
+        return []
+
+def adicionar_assinatura(user_id, username, documento):
+    """Adiciona nova assinatura no sistema"""
+    adicionadas = adicionar_assinaturas(user_id, username, [documento])
+    return adicionadas[0][1] if adicionadas else None
+
+adicionar_assinatura_async = assincrono(adicionar_assinatura)
+adicionar_assinaturas_async = assincrono(adicionar_assinaturas)
@@ -1,49 +1,38 @@
-from database import get_db_connection
+from cache_usuarios import obter_usuario, obter_usuario_async
 
 def is_admin(user_id: int) -> bool:
     """Verifica se o usuário é admin"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] == 'admin' if result else False
-    finally:
-        cursor.close()
-        conn.close()
+    usuario = obter_usuario(user_id)
+    return usuario['nivel'] == 'admin' if usuario else False
 
 def is_dpc(user_id: int) -> bool:
     """Verifica se o usuário é DPC"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] == 'dpc' if result else False
-    finally:
-        cursor.close()
-        conn.close()
+    usuario = obter_usuario(user_id)
+    return usuario['nivel'] == 'dpc' if usuario else False
 
 def is_user_active(user_id: int) -> bool:
     """Verifica se o usuário está ativo"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT ativo FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else False
-    finally:
-        cursor.close()
-        conn.close()
+    usuario = obter_usuario(user_id)
+    return usuario['ativo'] if usuario else False
 
 def get_user_level(user_id: int) -> str:
     """Obtém o nível do usuário"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else None
-    finally:
-        cursor.close()
-        conn.close()
+    usuario = obter_usuario(user_id)
+    return usuario['nivel'] if usuario else None
+
+# Equivalentes assíncronos (sem ida ao banco quando o usuário está em cache)
+async def is_admin_async(user_id: int) -> bool:
+    usuario = await obter_usuario_async(user_id)
+    return usuario['nivel'] == 'admin' if usuario else False
+
+async def is_dpc_async(user_id: int) -> bool:
+    usuario = await obter_usuario_async(user_id)
+    return usuario['nivel'] == 'dpc' if usuario else False
+
+async def is_user_active_async(user_id: int) -> bool:
+    usuario = await obter_usuario_async(user_id)
+    return usuario['ativo'] if usuario else False
+
+async def get_user_level_async(user_id: int) -> str:
+    usuario = await obter_usuario_async(user_id)
+    return usuario['nivel'] if usuario else None
@@ -0,0 +1,170 @@
+# benchmark_indices.py
+"""Compara planos e latência das consultas frequentes antes e depois dos índices.
+
+Cria um schema temporário com dados sintéticos, roda EXPLAIN ANALYZE de cada
+consulta sem índices, aplica os índices das migrações e repete a medição.
+
+Uso: python benchmark_indices.py [--usuarios N] [--escala N] [--repeticoes N]
+"""
+import argparse
+import re
+import statistics
+from dotenv import load_dotenv
+from database_manager import db
+from migracoes import MIGRACOES, ESQUEMA_BASE
+
+SCHEMA = 'benchmark_indices'
+
+# Volumes por unidade de escala; a maior parte do histórico já foi processada
+SEMENTES = [
+    '''INSERT INTO usuarios (user_id, nome, username, nivel, ativo)
+       SELECT g, 'Usuário ' || g, 'user' || g,
+              (ARRAY['admin', 'dpc', 'user', 'user'])[1 + g %% 4], TRUE
+       FROM generate_series(1, %(usuarios)s) g''',
+    '''INSERT INTO assinaturas (user_id, username, documento, sequencia, ativo, data_criacao)
+       SELECT 1 + g %% %(usuarios)s, 'user' || g, 'Documento ' || g, g,
+              g > %(escala)s * 5000 - 50, now() - (g || ' minutes')::interval
+       FROM generate_series(1, %(escala)s * 5000) g''',
+    '''INSERT INTO lembretes (criador_id, titulo, data, hora, ativo)
+       SELECT 1 + g %% %(usuarios)s, 'Lembrete ' || g,
+              current_date - 365 + (g %% 400), make_time(g %% 24, g %% 60, 0), g %% 10 <> 0
+       FROM generate_series(1, %(escala)s * 2000) g''',
+    '''INSERT INTO lembrete_destinatarios (lembrete_id, user_id, notificado)
+       SELECT l.id, 1 + (l.id * 7 + k) %% %(usuarios)s, l.data < current_date
+       FROM lembretes l, generate_series(0, 2) k''',
+    '''INSERT INTO user_acessos (user_id, tipo_acesso, data_acesso)
+       SELECT 1 + g %% %(usuarios)s, 'login', now() - (g || ' seconds')::interval * 150
+       FROM generate_series(1, %(escala)s * 20000) g''',
+    '''INSERT INTO acoes_usuarios (user_id, tipo_acao, data_hora)
+       SELECT 1 + g %% %(usuarios)s,
+              (ARRAY['novo_documento', 'novo_lembrete', 'novo_contato', 'novo_caso'])[1 + g %% 4],
+              now() - (g || ' seconds')::interval * 150
+       FROM generate_series(1, %(escala)s * 20000) g''',
+    '''INSERT INTO contatos (user_id, nome, contato, ativo)
+       SELECT 1 + g %% %(usuarios)s, 'Contato ' || g, '+55 11 9' || g, g %% 20 <> 0
+       FROM generate_series(1, %(escala)s * 2000) g''',
+    '''INSERT INTO casos (user_id, titulo, ativo, criado_em)
+       SELECT 1 + g %% %(usuarios)s, 'Caso ' || g, g %% 5 = 0, now() - (g || ' hours')::interval
+       FROM generate_series(1, %(escala)s * 1000) g''',
+    '''INSERT INTO caso_responsaveis (caso_id, user_id)
+       SELECT c.id, 1 + (c.id + k) %% %(usuarios)s
+       FROM casos c, generate_series(0, 1) k''',
+]
+
+# Consultas das rotas quentes (mesmos filtros usados pelo bot)
+CONSULTAS = [
+    ('Destinatários pendentes de um lembrete', '''
+        SELECT ld.user_id, l.titulo, l.hora
+        FROM lembretes l
+        JOIN lembrete_destinatarios ld ON l.id = ld.lembrete_id
+        WHERE l.id = 1500 AND l.ativo = TRUE AND ld.notificado = FALSE'''),
+    ('Lembretes futuros (carga do agendador)', '''
+        SELECT DISTINCT l.id, l.data, l.hora
+        FROM lembretes l
+        JOIN lembrete_destinatarios ld ON l.id = ld.lembrete_id
+        WHERE l.ativo = TRUE AND ld.notificado = FALSE AND l.data >= current_date'''),
+    ('Lembretes do usuário', '''
+        SELECT l.id, l.titulo, l.data, l.hora
+        FROM lembretes l
+        JOIN lembrete_destinatarios ld ON l.id = ld.lembrete_id
+        WHERE l.ativo = TRUE AND (l.criador_id = 42 OR ld.user_id = 42)
+        GROUP BY l.id ORDER BY l.data, l.hora'''),
+    ('Ações do usuário por tipo', '''
+        SELECT COUNT(*) FROM acoes_usuarios
+        WHERE user_id = 42 AND tipo_acao = 'novo_documento' '''),
+    ('Último acesso do usuário', '''
+        SELECT MAX(data_acesso) FROM user_acessos WHERE user_id = 42'''),
+    ('Usuários ativos hoje', '''
+        SELECT COUNT(DISTINCT user_id) FROM user_acessos
+        WHERE data_acesso >= current_date AND data_acesso < current_date + 1'''),
+    ('Assinatura ativa por sequência', '''
+        SELECT user_id, username, documento FROM assinaturas
+        WHERE ativo = TRUE
+        AND sequencia = (SELECT MAX(sequencia) FROM assinaturas WHERE ativo = TRUE)'''),
+    ('Página da fila de assinaturas', '''
+        SELECT a.id, a.documento, a.sequencia, u.nome
+        FROM assinaturas a
+        LEFT JOIN usuarios u ON a.user_id = u.user_id
+        WHERE a.ativo = TRUE
+        AND (a.data_criacao, a.id) < (now(), 2147483647)
+        ORDER BY a.data_criacao DESC, a.id DESC
+        LIMIT 6'''),
+    ('Contatos do usuário', '''
+        SELECT id, nome, contato FROM contatos
+        WHERE ativo = TRUE AND user_id = 42 ORDER BY nome'''),
+    ('Casos ativos com responsáveis', '''
+        SELECT c.id, c.titulo, string_agg(u.nome, ', ')
+        FROM casos c
+        LEFT JOIN caso_responsaveis cr ON c.id = cr.caso_id
+        LEFT JOIN usuarios u ON cr.user_id = u.user_id
+        WHERE c.ativo = TRUE
+        GROUP BY c.id, c.titulo, c.criado_em
+        ORDER BY c.criado_em DESC'''),
+]
+
+def medir(cursor, sql, repeticoes):
+    """Retorna (primeiro nó de leitura do plano, mediana do tempo de execução em ms)"""
+    tempos = []
+    plano = ''
+    for _ in range(repeticoes):
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql)
+        linhas = [row[0] for row in cursor.fetchall()]
+        plano = next((linha.strip() for linha in linhas if 'Scan' in linha), linhas[0].strip())
+        tempo = next(linha for linha in linhas if linha.startswith('Execution Time'))
+        tempos.append(float(re.search(r'([\d.]+) ms', tempo).group(1)))
+    return re.sub(r'\s*\(cost=.*', '', plano.lstrip('-> ')), statistics.median(tempos)
+
+def executar(usuarios, escala, repeticoes):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+
+        print("Criando tabelas e dados sintéticos...")
+        for comando in ESQUEMA_BASE:
+            cursor.execute(comando, {'admin_id': 0})
+        for comando in SEMENTES:
+            cursor.execute(comando, {'usuarios': usuarios, 'escala': escala})
+        cursor.execute('ANALYZE')
+
+        antes = {nome: medir(cursor, sql, repeticoes) for nome, sql in CONSULTAS}
+
+        print("Aplicando os índices das migrações...")
+        for versao, _, comandos in MIGRACOES:
+            if versao >= 1:
+                for comando in comandos:
+                    cursor.execute(comando)
+        cursor.execute('ANALYZE')
+
+        depois = {nome: medir(cursor, sql, repeticoes) for nome, sql in CONSULTAS}
+
+        print()
+        for nome, _ in CONSULTAS:
+            plano_antes, tempo_antes = antes[nome]
+            plano_depois, tempo_depois = depois[nome]
+            ganho = tempo_antes / tempo_depois if tempo_depois else float('inf')
+            print(f"{nome}")
+            print(f"  antes:  {tempo_antes:9.3f} ms  {plano_antes}")
+            print(f"  depois: {tempo_depois:9.3f} ms  {plano_depois}  ({ganho:.1f}x)")
+    finally:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cursor.execute('RESET search_path')
+        cursor.close()
+        conn.close()
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=500)
+    parser.add_argument('--escala', type=int, default=10)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+    try:
+        executar(args.usuarios, args.escala, args.repeticoes)
+    finally:
+        db.fechar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# cache_estatisticas.py
+import os
+import threading
+from cachetools import TTLCache
+from database_manager import db
+
+# Cache TTL do perfil de estatísticas de cada usuário ("Minhas Estatísticas").
+# A telemetria invalida o perfil ao gravar novos acessos/ações; o TTL curto cobre
+# as gravações feitas por outros workers.
+CACHE_TTL = int(os.getenv('CACHE_ESTATISTICAS_TTL', '60'))
+CACHE_TAMANHO = int(os.getenv('CACHE_ESTATISTICAS_TAMANHO', '2048'))
+
+# Tipos de ação exibidos no perfil
+TIPOS_ACAO = ['novo_documento', 'novo_lembrete', 'novo_contato', 'novo_caso']
+
+_perfis = TTLCache(maxsize=CACHE_TAMANHO, ttl=CACHE_TTL)
+_lock = threading.RLock()
+
+def _carregar_perfil(user_id: int) -> dict:
+    """Perfil completo em uma única agregação (FILTER por tipo de ação)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT
+                COALESCE(e.total_acessos, 0),
+                e.ultimo_acesso,
+                COALESCE(SUM(a.quantidade) FILTER (WHERE a.tipo = 'novo_documento'), 0),
+                COALESCE(SUM(a.quantidade) FILTER (WHERE a.tipo = 'novo_lembrete'), 0),
+                COALESCE(SUM(a.quantidade) FILTER (WHERE a.tipo = 'novo_contato'), 0),
+                COALESCE(SUM(a.quantidade) FILTER (WHERE a.tipo = 'novo_caso'), 0)
+            FROM (SELECT %(user_id)s::bigint AS user_id) u
+            LEFT JOIN estatisticas_usuarios e ON e.user_id = u.user_id
+            LEFT JOIN atividade_diaria a
+                ON a.user_id = u.user_id AND a.tipo = ANY(%(tipos)s)
+            GROUP BY e.total_acessos, e.ultimo_acesso
+        ''', {'user_id': user_id, 'tipos': TIPOS_ACAO})
+        total_acessos, ultimo_acesso, *acoes = cursor.fetchone()
+        perfil = dict(zip(TIPOS_ACAO, acoes))
+        perfil['total_acessos'] = total_acessos
+        perfil['ultimo_acesso'] = ultimo_acesso
+        return perfil
+    finally:
+        cursor.close()
+        conn.close()
+
+def obter_perfil(user_id: int) -> dict:
+    """Perfil de estatísticas do usuário (cache ou banco)"""
+    with _lock:
+        perfil = _perfis.get(user_id)
+    if perfil is None:
+        perfil = _carregar_perfil(user_id)
+        with _lock:
+            _perfis[user_id] = perfil
+    return dict(perfil)
+
+async def obter_perfil_async(user_id: int) -> dict:
+    """Versão assíncrona: só usa o executor do banco quando não há cache"""
+    with _lock:
+        perfil = _perfis.get(user_id)
+    if perfil is not None:
+        return dict(perfil)
+    return await db.executar(obter_perfil, user_id)
+
+def invalidar_perfis(user_ids=None):
+    """Descarta o perfil dos usuários (ou de todos se user_ids for None)"""
+    with _lock:
+        if user_ids is None:
+            _perfis.clear()
+            return
+        for user_id in user_ids:
+            _perfis.pop(user_id, None)
@@ -0,0 +1,80 @@
+# cache_relatorios.py
+import os
+import threading
+import pytz
+from datetime import datetime, date, timedelta
+from cachetools import TTLCache
+from database_manager import db
+
+TIMEZONE = pytz.timezone('America/Sao_Paulo')
+# Dias fechados mantidos em memória (um ano e pouco de relatórios)
+CACHE_DIAS = int(os.getenv('CACHE_RELATORIOS_DIAS', '400'))
+# Validade de um dia fechado: cobre eventos atrasados gravados por outros workers
+# (os do próprio worker invalidam o dia ao serem gravados)
+CACHE_TTL = int(os.getenv('CACHE_RELATORIOS_TTL', '3600'))
+# Um dia só é considerado fechado depois desta folga após a meia-noite,
+# para a telemetria em buffer do dia anterior chegar ao banco
+FOLGA_FECHAMENTO = timedelta(minutes=10)
+
+# dia -> (acessos, assinaturas) de um dia fechado
+_dias = TTLCache(maxsize=CACHE_DIAS, ttl=CACHE_TTL)
+_lock = threading.Lock()
+
+def _carregar_dias(inicio: date, fim: date) -> dict:
+    """Agregados diários do intervalo: dia -> (acessos, assinaturas)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT a.dia, a.tipo, COALESCE(u.nome, u.username) AS nome_usuario, u.nivel,
+                   a.primeiro, a.ultimo, a.quantidade
+            FROM atividade_diaria a
+            JOIN usuarios u ON u.user_id = a.user_id
+            WHERE a.dia BETWEEN %s AND %s
+            AND a.tipo IN ('acesso', 'novo_documento')
+            ORDER BY a.dia, nome_usuario
+        ''', (inicio, fim))
+        dias = {}
+        for dia, tipo, nome, nivel, primeiro, ultimo, quantidade in cursor.fetchall():
+            acessos, assinaturas = dias.setdefault(dia, ([], []))
+            if tipo == 'acesso':
+                acessos.append((nome, nivel, dia, primeiro, ultimo, quantidade))
+            else:
+                assinaturas.append((nome, dia, quantidade))
+        return dias
+    finally:
+        cursor.close()
+        conn.close()
+
+def obter_relatorio(inicio: date, fim: date):
+    """(acessos, assinaturas) do período, do dia mais recente para o mais antigo.
+
+    Dias fechados vêm do cache; os ausentes e os ainda abertos (hoje) são lidos
+    em uma única consulta aos agregados diários.
+    """
+    abertos_desde = (datetime.now(TIMEZONE) - FOLGA_FECHAMENTO).date()
+    dias = [inicio + timedelta(days=n) for n in range((fim - inicio).days + 1)]
+    with _lock:
+        em_cache = {dia: _dias[dia] for dia in dias if dia in _dias}
+    carregar = [dia for dia in dias if dia not in em_cache]
+    if carregar:
+        carregados = _carregar_dias(carregar[0], carregar[-1])
+        for dia in carregar:
+            em_cache[dia] = tuple(map(tuple, carregados.get(dia, ([], []))))
+        with _lock:
+            for dia in carregar:
+                if dia < abertos_desde:
+                    _dias[dia] = em_cache[dia]
+
+    acessos, assinaturas = [], []
+    for dia in reversed(dias):
+        acessos_dia, assinaturas_dia = em_cache[dia]
+        acessos.extend(acessos_dia)
+        assinaturas.extend(assinaturas_dia)
+    return acessos, assinaturas
+
+def invalidar_dias(dias):
+    """Descarta os dias em cache que receberam eventos (telemetria atrasada)"""
+    with _lock:
+        for dia in dias:
+            _dias.pop(dia, None)
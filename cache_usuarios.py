@@ -0,0 +1,165 @@
+# cache_usuarios.py
+import os
+import threading
+from cachetools import TTLCache
+from database_manager import db
+
+# Cache TTL+LRU dos registros de usuários (nivel, ativo, nome, username)
+CACHE_TTL = int(os.getenv('CACHE_USUARIOS_TTL', '300'))
+CACHE_TAMANHO = int(os.getenv('CACHE_USUARIOS_TAMANHO', '2048'))
+
+# Canal LISTEN/NOTIFY que replica as invalidações entre os workers
+CANAL_USUARIOS = 'dcyber_usuarios'
+
+_NAO_ENCONTRADO = object()  # Registro inexistente também fica em cache
+_FALTA = object()
+
+_usuarios = TTLCache(maxsize=CACHE_TAMANHO, ttl=CACHE_TTL)
+_por_username = TTLCache(maxsize=CACHE_TAMANHO, ttl=CACHE_TTL)
+_dpc = TTLCache(maxsize=1, ttl=CACHE_TTL)
+_lock = threading.RLock()
+
+def _ler(cache, chave):
+    with _lock:
+        valor = cache.get(chave, _FALTA)
+    if valor is _NAO_ENCONTRADO:
+        return None
+    return valor
+
+def _gravar(cache, chave, valor):
+    with _lock:
+        cache[chave] = _NAO_ENCONTRADO if valor is None else valor
+
+def _carregar_usuario(coluna: str, valor):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            SELECT user_id, username, nome, nivel, ativo
+            FROM usuarios
+            WHERE {coluna} = %s
+        ''', (valor,))
+        result = cursor.fetchone()
+        if not result:
+            return None
+        user_id, username, nome, nivel, ativo = result
+        return {
+            'user_id': user_id,
+            'username': username,
+            'nome': nome,
+            'nivel': nivel,
+            'ativo': ativo
+        }
+    finally:
+        cursor.close()
+        conn.close()
+
+def _carregar_id_dpc():
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT user_id FROM usuarios WHERE nivel = %s', ('dpc',))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    finally:
+        cursor.close()
+        conn.close()
+
+def _guardar_usuario(usuario, user_id=None, username=None):
+    if usuario:
+        _gravar(_usuarios, usuario['user_id'], usuario)
+        if usuario['username']:
+            _gravar(_por_username, usuario['username'], usuario['user_id'])
+    else:
+        if user_id is not None:
+            _gravar(_usuarios, user_id, None)
+        if username is not None:
+            _gravar(_por_username, username, None)
+
+def obter_usuario(user_id: int):
+    """Retorna o registro do usuário (cache ou banco) ou None"""
+    usuario = _ler(_usuarios, user_id)
+    if usuario is not _FALTA:
+        return usuario
+    usuario = _carregar_usuario('user_id', user_id)
+    _guardar_usuario(usuario, user_id=user_id)
+    return usuario
+
+def obter_usuario_por_username(username: str):
+    """Retorna o registro do usuário pelo username (cache ou banco) ou None"""
+    user_id = _ler(_por_username, username)
+    if user_id is None:
+        return None
+    if user_id is not _FALTA:
+        usuario = _ler(_usuarios, user_id)
+        if usuario is not _FALTA:
+            return usuario
+    usuario = _carregar_usuario('username', username)
+    _guardar_usuario(usuario, username=username)
+    return usuario
+
+def obter_id_dpc():
+    """Retorna o ID do usuário DPC (cache ou banco) ou None"""
+    dpc_id = _ler(_dpc, 'dpc')
+    if dpc_id is not _FALTA:
+        return dpc_id
+    dpc_id = _carregar_id_dpc()
+    _gravar(_dpc, 'dpc', dpc_id)
+    return dpc_id
+
+async def obter_usuario_async(user_id: int):
+    """Versão assíncrona: só usa o executor do banco quando não há cache"""
+    usuario = _ler(_usuarios, user_id)
+    if usuario is not _FALTA:
+        return usuario
+    return await db.executar(obter_usuario, user_id)
+
+async def obter_usuario_por_username_async(username: str):
+    user_id = _ler(_por_username, username)
+    if user_id is None:
+        return None
+    if user_id is not _FALTA:
+        usuario = _ler(_usuarios, user_id)
+        if usuario is not _FALTA:
+            return usuario
+    return await db.executar(obter_usuario_por_username, username)
+
+async def obter_id_dpc_async():
+    dpc_id = _ler(_dpc, 'dpc')
+    if dpc_id is not _FALTA:
+        return dpc_id
+    return await db.executar(obter_id_dpc)
+
+def invalidar_usuario(user_id: int = None, propagar: bool = True):
+    """Remove o usuário do cache (ou limpa tudo se user_id for None).
+
+    Com propagar=True os demais workers recebem a invalidação via NOTIFY.
+    """
+    with _lock:
+        if user_id is None:
+            _usuarios.clear()
+            _por_username.clear()
+        else:
+            _usuarios.pop(user_id, None)
+            for username, cached_id in list(_por_username.items()):
+                if cached_id is _NAO_ENCONTRADO or cached_id == user_id:
+                    _por_username.pop(username, None)
+        # Mudanças de nível podem trocar o DPC
+        _dpc.clear()
+    if propagar:
+        _publicar_invalidacao(user_id)
+
+def _publicar_invalidacao(user_id):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT pg_notify(%s, %s)', (CANAL_USUARIOS, '*' if user_id is None else str(user_id)))
+    except Exception as e:
+        print(f"Erro ao propagar invalidação do usuário {user_id}: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+def aplicar_invalidacao(payload: str):
+    """Invalidação recebida de outro worker pelo canal CANAL_USUARIOS"""
+    invalidar_usuario(None if payload == '*' else int(payload), propagar=False)
@@ -2,17 +2,19 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from database_casos import (
-    adicionar_caso_db,
-    consultar_casos_db,
-    atualizar_caso_db,
-    encerrar_caso_db,
-    criar_tabela_casos
+    adicionar_caso_db_async,
+    consultar_casos_db_async,
+    atualizar_caso_db_async,
+    encerrar_caso_db_async,
+    apagar_caso_db_async
 )
-from database import get_user_display_info, get_usuarios_cadastrados
+from database import get_user_display_info_async, get_usuarios_cadastrados_async
 from decorators import user_approved, admin_required
+from roteador import rota, callback
 from telegram.constants import ParseMode
-from database_estatisticas import incrementar_contador, registrar_acao_usuario
+from database_estatisticas import incrementar_contador_async, registrar_acao_usuario_async
 
+@rota('casos')
 @user_approved
 async def menu_casos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
@@ -29,6 +31,7 @@ async def menu_casos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('caso_novo')
 @user_approved
 async def criar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['criando_caso'] = True
@@ -42,9 +45,10 @@ async def criar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('caso_listar')
 @user_approved
 async def listar_casos(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    casos = consultar_casos_db()
+    casos = await consultar_casos_db_async()
     
     if not casos:
         keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='casos')]]
@@ -75,9 +79,10 @@ async def listar_casos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('caso_ajustar')
 @user_approved
 async def listar_casos_ajuste(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    casos = consultar_casos_db()
+    casos = await consultar_casos_db_async()
     
     if not casos:
         keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='casos')]]
@@ -92,7 +97,7 @@ async def listar_casos_ajuste(update: Update, context: ContextTypes.DEFAULT_TYPE
     for caso in casos:
         id_caso, titulo, _, status, _, _ = caso
         keyboard.append([
-            InlineKeyboardButton(f"✏️ {titulo} ({status})", callback_data=f'caso_editar_{id_caso}')
+            InlineKeyboardButton(f"✏️ {titulo} ({status})", callback_data=callback('caso_editar', id_caso))
         ])
     
     keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='casos')])
@@ -133,7 +138,7 @@ async def handle_caso_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 
                 # Criar o caso
                 try:
-                    caso_id = adicionar_caso_db(
+                    caso_id = await adicionar_caso_db_async(
                         user_id=update.effective_user.id,
                         titulo=context.user_data['caso_titulo'],
                         descricao=context.user_data['caso_descricao'],
@@ -161,8 +166,8 @@ async def handle_caso_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                         )
                         
                         # Registrar estatísticas
-                        incrementar_contador('casos')
-                        registrar_acao_usuario(update.effective_user.id, 'novo_caso')
+                        await incrementar_contador_async('casos')
+                        await registrar_acao_usuario_async(update.effective_user.id, 'novo_caso')
                     else:
                         keyboard = [
                             [InlineKeyboardButton("🔄 Tentar Novamente", callback_data='caso_novo')],
@@ -210,45 +215,40 @@ async def handle_caso_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             context.user_data.clear()
 
-async def mostrar_selecao_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def mostrar_selecao_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE, caso_id: int):
+    """Seleção de responsáveis; a seleção fica no user_data (persistido) e os botões
+    levam só o usuário a marcar/desmarcar"""
     current_user_id = update.effective_user.id
-    current_user = get_user_display_info(user_id=current_user_id)
-    outros_usuarios = get_usuarios_cadastrados(excluir_user_id=current_user_id)
+    current_user = await get_user_display_info_async(user_id=current_user_id)
+    outros_usuarios = await get_usuarios_cadastrados_async(excluir_user_id=current_user_id)
     
     keyboard = []
     texto = "👥 Selecione os responsáveis:\n(Clique para marcar/desmarcar)"
-    responsaveis = context.user_data.get('responsaveis', [])
+    selecionados = set(context.user_data.get('selecao_responsaveis', []))
+    
+    def botao(user_id, nome):
+        emoji = "✅" if user_id in selecionados else "⭕"
+        return InlineKeyboardButton(
+            f"{emoji} {nome}",
+            callback_data=callback('caso_resp_select', caso_id, user_id)
+        )
     
     # Adiciona o usuário atual (se for ativo e não pendente)
     if current_user and current_user.get('nivel') != 'pendente':
-        selecionado = str(current_user_id) in responsaveis
-        emoji = "✅" if selecionado else "⭕"
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{emoji} {current_user['display_name']} (Você)",
-                callback_data=f'caso_resp_select_{current_user_id}'
-            )
-        ])
+        keyboard.append([botao(current_user_id, f"{current_user['display_name']} (Você)")])
     
     # Adiciona outros usuários
     for user_id, display_name in outros_usuarios:
-        selecionado = str(user_id) in responsaveis
-        emoji = "✅" if selecionado else "⭕"
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{emoji} {display_name}",
-                callback_data=f'caso_resp_select_{user_id}'
-            )
-        ])
+        keyboard.append([botao(user_id, display_name)])
     
-    if responsaveis:
+    if selecionados:
         texto += "\n\n📌 Selecionados:"
-        for resp_id in responsaveis:
-            user_info = get_user_display_info(user_id=int(resp_id))
+        for resp_id in sorted(selecionados):
+            user_info = await get_user_display_info_async(user_id=resp_id)
             if user_info:
                 texto += f"\n• {user_info['display_name']}"
     
-    keyboard.append([InlineKeyboardButton("✅ Confirmar", callback_data='caso_resp_confirmar')])
+    keyboard.append([InlineKeyboardButton("✅ Confirmar", callback_data=callback('caso_resp_confirmar', caso_id))])
     keyboard.append([InlineKeyboardButton("🔙 Cancelar", callback_data='casos')])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -270,35 +270,35 @@ async def handle_caso_edicao_message(update: Update, context: ContextTypes.DEFAU
 
     try:
         if editando == 'status':
-            if atualizar_caso_db(caso_id, 'status', texto):
+            if await atualizar_caso_db_async(caso_id, 'status', texto):
                 await update.message.reply_text(
                     "✅ Status atualizado com sucesso!",
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
+                        InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
                     ]])
                 )
             else:
                 await update.message.reply_text(
                     "❌ Erro ao atualizar status",
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
+                        InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
                     ]])
                 )
         
         elif editando == 'observacoes':
             observacoes = None if texto == '/pular' else texto
-            if atualizar_caso_db(caso_id, 'observacoes', observacoes):
+            if await atualizar_caso_db_async(caso_id, 'observacoes', observacoes):
                 await update.message.reply_text(
                     "✅ Observações atualizadas com sucesso!",
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
+                        InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
                     ]])
                 )
             else:
                 await update.message.reply_text(
                     "❌ Erro ao atualizar observações",
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
+                        InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
                     ]])
                 )
     
@@ -306,233 +306,76 @@ async def handle_caso_edicao_message(update: Update, context: ContextTypes.DEFAU
         await update.message.reply_text(
             f"❌ Erro ao atualizar caso: {str(e)}",
             reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
+                InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
             ]])
         )
     finally:
         if 'editando' in context.user_data:
             del context.user_data['editando']
 
-@user_approved
-async def handle_casos_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    
-    if query.data == 'casos':
-        await menu_casos(update, context)
-    
-    elif query.data == 'caso_novo':
-        await criar_caso(update, context)
-    
-    elif query.data == 'caso_listar':
-        await listar_casos(update, context)
-    
-    elif query.data == 'caso_ajustar':
-        await listar_casos_ajuste(update, context)
-    
-    elif query.data.startswith('caso_editar_'):
-        caso_id = int(query.data.split('_')[-1])
-        context.user_data['caso_selecionado'] = caso_id
-        await ajustar_caso(update, context)
-    
-    elif query.data.startswith('caso_alterar_'):
-        await handle_alteracao_callback(update, context)
-    
-    elif query.data.startswith('caso_resp_'):
-        await handle_responsaveis_callback(update, context)
-    
-    elif query.data == 'menu_principal':
-        from dcyber_bot import start
-        await start(update, context)
-    
-    elif query.data == 'pular_observacoes':
-        context.user_data['caso_observacoes'] = None
-        await finalizar_criacao_caso(update, context)
-   
-    elif query.data.startswith('caso_encerrar_'):
-        caso_id = int(query.data.split('_')[-1])
-        if encerrar_caso_db(caso_id):
-            await query.edit_message_text(
-                "✅ Caso encerrado com sucesso!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='casos')
-                ]])
-            )
-        else:
-            await query.edit_message_text(
-                "❌ Erro ao encerrar caso",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='casos')
-                ]])
-            )
-    
-    elif query.data.startswith('caso_apagar_'):
-        caso_id = int(query.data.split('_')[-1])
-        # Adicione esta função em database_casos.py
-        if apagar_caso_db(caso_id):
-            await query.edit_message_text(
-                "✅ Caso apagado com sucesso!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='casos')
-                ]])
-            )
-        else:
-            await query.edit_message_text(
-                "❌ Erro ao apagar caso",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='casos')
-                ]])
-            )
-
-@user_approved
-async def handle_responsaveis_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@rota('caso_apagar')
+async def apagar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    data = query.data
-    
-    if data.startswith('caso_resp_select_'):
-        user_id = data.replace('caso_resp_select_', '')
-        responsaveis = context.user_data.get('responsaveis', [])
-        
-        if user_id in responsaveis:
-            responsaveis.remove(user_id)
-        else:
-            responsaveis.append(user_id)
-        
-        context.user_data['responsaveis'] = responsaveis
-        await mostrar_selecao_usuarios(update, context)
-    
-    elif data == 'caso_resp_confirmar':
-        if not context.user_data.get('responsaveis'):
-            await query.message.edit_text(
-                "⚠️ Selecione pelo menos um responsável!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='caso_resp_selecionar')
-                ]])
-            )
-            return
-        
-        # Verifica se está editando ou criando caso
-        if context.user_data.get('editando'):
-            caso_id = context.user_data.get('caso_selecionado')
-            if atualizar_caso_db(caso_id, 'responsaveis', context.user_data['responsaveis']):
-                await query.message.edit_text(
-                    "✅ Responsáveis atualizados com sucesso!",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
-                    ]])
-                )
-            # Limpa o estado de edição
-            if 'editando' in context.user_data:
-                del context.user_data['editando']
-        else:
-            # Caso novo, continua para observações
-            context.user_data['etapa_caso'] = 'observacoes'
-            await query.message.edit_text(
-                "📝 Digite as observações do caso:\n"
-                "(ou envie /pular para deixar em branco)"
-            )
-    
-    elif data == 'caso_resp_voltar':
-        await mostrar_selecao_usuarios(update, context)
-            
-        keyboard = []
-        for _, nome in usuarios:
-            selecionado = nome in context.user_data.get('responsaveis', [])
-            emoji = "✅" if selecionado else "⭕"
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"{emoji} {nome}",
-                    callback_data=f'caso_resp_select_{nome}'
-                )
-            ])
-        
-        keyboard.append([InlineKeyboardButton("✅ Confirmar", callback_data='caso_resp_confirmar')])
-        keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='caso_resp_voltar')])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.message.edit_text(
-            "👥 Selecione os responsáveis:\n"
-            "(Clique para marcar/desmarcar)",
-            reply_markup=reply_markup
+    caso_id, = context.args
+    if await apagar_caso_db_async(caso_id):
+        await query.edit_message_text(
+            "✅ Caso apagado com sucesso!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='casos')
+            ]])
         )
-    
-    elif data.startswith('caso_resp_select_'):
-        username = data.replace('caso_resp_select_', '')
-        responsaveis = context.user_data.get('responsaveis', [])
-        
-        if username in responsaveis:
-            responsaveis.remove(username)
-        else:
-            responsaveis.append(username)
-        
-        context.user_data['responsaveis'] = responsaveis
-        
-        # Atualiza a lista de seleção
-        user_id = update.effective_user.id
-        usuarios = get_usuarios_cadastrados(excluir_user_id=user_id)
-        
-        keyboard = []
-        for _, nome in usuarios:
-            selecionado = nome in responsaveis
-            emoji = "✅" if selecionado else "⭕"
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"{emoji} {nome}",
-                    callback_data=f'caso_resp_select_{nome}'
-                )
-            ])
-        
-        keyboard.append([InlineKeyboardButton("✅ Confirmar", callback_data='caso_resp_confirmar')])
-        keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='caso_resp_voltar')])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.message.edit_text(
-            "👥 Selecione os responsáveis:\n"
-            "(Clique para marcar/desmarcar)",
-            reply_markup=reply_markup
+    else:
+        await query.edit_message_text(
+            "❌ Erro ao apagar caso",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='casos')
+            ]])
         )
-    
-    elif data == 'caso_resp_confirmar':
-        if not context.user_data.get('responsaveis'):
-            await query.message.edit_text(
-                "⚠️ Selecione pelo menos um responsável!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='caso_resp_selecionar')
-                ]])
-            )
-            return
-        
-        context.user_data['etapa_caso'] = 'observacoes'
+
+@rota('caso_resp_select')
+async def alternar_responsavel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Marca/desmarca o responsável trazido pelo botão"""
+    caso_id, user_id = context.args
+    selecao = set(context.user_data.get('selecao_responsaveis', []))
+    context.user_data['selecao_responsaveis'] = sorted(selecao ^ {user_id})
+    await mostrar_selecao_usuarios(update, context, caso_id)
+
+@rota('caso_resp_confirmar')
+async def confirmar_responsaveis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    caso_id, = context.args
+    responsaveis = context.user_data.get('selecao_responsaveis', [])
+    if not responsaveis:
         await query.message.edit_text(
-            "📝 Digite as observações do caso:\n"
-            "(ou envie /pular para deixar em branco)"
+            "⚠️ Selecione pelo menos um responsável!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_alterar_resp', caso_id))
+            ]])
         )
+        return
     
-    elif data == 'caso_resp_voltar':
-        keyboard = [
-            [InlineKeyboardButton("👤 Apenas eu", callback_data='caso_resp_eu')],
-            [InlineKeyboardButton("👥 Selecionar usuários", callback_data='caso_resp_selecionar')],
-            [InlineKeyboardButton("📢 Todos os usuários", callback_data='caso_resp_todos')],
-            [InlineKeyboardButton("🔙 Cancelar", callback_data='casos')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    if await atualizar_caso_db_async(caso_id, 'responsaveis', responsaveis):
         await query.message.edit_text(
-            "👥 Quem são os responsáveis por este caso?",
-            reply_markup=reply_markup
+            "✅ Responsáveis atualizados com sucesso!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
+            ]])
         )
+    # Limpa o estado de edição
+    if 'editando' in context.user_data:
+        del context.user_data['editando']
+    context.user_data.pop('selecao_responsaveis', None)
 
+@rota('caso_editar', legado=True)
 @user_approved
 async def ajustar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    caso_id = int(context.user_data.get('caso_selecionado', 0))
-    if not caso_id:
-        return
+    caso_id, = context.args
     
     keyboard = [
-        [InlineKeyboardButton("📊 Alterar Status", callback_data=f'caso_alterar_status_{caso_id}')],
-        [InlineKeyboardButton("👥 Alterar Responsáveis", callback_data=f'caso_alterar_resp_{caso_id}')],
-        [InlineKeyboardButton("📝 Alterar Observações", callback_data=f'caso_alterar_obs_{caso_id}')],
-        [InlineKeyboardButton("❌ Encerrar Caso", callback_data=f'caso_encerrar_{caso_id}')],
+        [InlineKeyboardButton("📊 Alterar Status", callback_data=callback('caso_alterar_status', caso_id))],
+        [InlineKeyboardButton("👥 Alterar Responsáveis", callback_data=callback('caso_alterar_resp', caso_id))],
+        [InlineKeyboardButton("📝 Alterar Observações", callback_data=callback('caso_alterar_obs', caso_id))],
+        [InlineKeyboardButton("❌ Encerrar Caso", callback_data=callback('caso_encerrar', caso_id))],
         [InlineKeyboardButton("🔙 Voltar", callback_data='caso_listar')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -542,75 +385,76 @@ async def ajustar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
-@user_approved
-async def handle_alteracao_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    data = query.data
-    caso_id = context.user_data.get('caso_selecionado')
+@rota('caso_alterar_status', legado=True)
+async def alterar_status_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    caso_id, = context.args
+    # O novo status chega como mensagem de texto (handle_caso_edicao_message)
+    context.user_data['caso_selecionado'] = caso_id
+    context.user_data['editando'] = 'status'
+    await update.callback_query.message.edit_text(
+        "📊 Digite o novo status do caso:\n\n"
+        "Dicas:\n"
+        "- Você pode usar emojis\n"
+        "- Exemplo: 🟢 Em andamento\n"
+        "- Exemplo: ⚠️ Aguardando resposta\n"
+        "- Exemplo: ✅ Concluído",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Cancelar", callback_data=callback('caso_editar', caso_id))
+        ]])
+    )
+
+@rota('caso_alterar_obs', legado=True)
+async def alterar_observacoes_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    caso_id, = context.args
+    context.user_data['caso_selecionado'] = caso_id
+    context.user_data['editando'] = 'observacoes'
+    await update.callback_query.message.edit_text(
+        "📝 Digite as novas observações do caso:\n"
+        "(ou envie /pular para deixar em branco)",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Cancelar", callback_data=callback('caso_editar', caso_id))
+        ]])
+    )
+
+@rota('caso_alterar_resp', legado=True)
+async def alterar_responsaveis_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    caso_id, = context.args
+    context.user_data['editando'] = 'responsaveis'
+    context.user_data['selecao_responsaveis'] = []
+    await mostrar_selecao_usuarios(update, context, caso_id)  # Vai direto para a seleção
+
+@rota('caso_encerrar', legado=True)
+async def encerrar_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pede confirmação antes de encerrar o caso"""
+    caso_id, = context.args
+    keyboard = [
+        [
+            InlineKeyboardButton("✅ Sim", callback_data=callback('caso_confirmar_encerrar', caso_id)),
+            InlineKeyboardButton("❌ Não", callback_data=callback('caso_editar', caso_id))
+        ]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
     
-    if not caso_id:
+    await update.callback_query.message.edit_text(
+        "⚠️ Tem certeza que deseja encerrar este caso?",
+        reply_markup=reply_markup
+    )
+
+@rota('caso_confirmar_encerrar', legado=True)
+async def confirmar_encerramento_caso(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    caso_id, = context.args
+    query = update.callback_query
+    if await encerrar_caso_db_async(caso_id):
         await query.message.edit_text(
-            "❌ Erro: Caso não selecionado",
+            "✅ Caso encerrado com sucesso!",
             reply_markup=InlineKeyboardMarkup([[
                 InlineKeyboardButton("🔙 Voltar", callback_data='casos')
             ]])
         )
-        return
-    
-    if data.startswith('caso_alterar_status_'):
-        context.user_data['editando'] = 'status'
+    else:
         await query.message.edit_text(
-            "📊 Digite o novo status do caso:\n\n"
-            "Dicas:\n"
-            "- Você pode usar emojis\n"
-            "- Exemplo: 🟢 Em andamento\n"
-            "- Exemplo: ⚠️ Aguardando resposta\n"
-            "- Exemplo: ✅ Concluído",
+            "❌ Erro ao encerrar caso",
             reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cancelar", callback_data=f'caso_editar_{caso_id}')
+                InlineKeyboardButton("🔙 Voltar", callback_data=callback('caso_editar', caso_id))
             ]])
         )
-    
-    elif data.startswith('caso_alterar_obs_'):
-        context.user_data['editando'] = 'observacoes'
-        await query.message.edit_text(
-            "📝 Digite as novas observações do caso:\n"
-            "(ou envie /pular para deixar em branco)",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cancelar", callback_data=f'caso_editar_{caso_id}')
-            ]])
-        )
-    
-    elif data.startswith('caso_alterar_resp_'):
-        context.user_data['editando'] = 'responsaveis'
-        await mostrar_selecao_usuarios(update, context)  # Vai direto para a seleção
-    
-    elif data.startswith('caso_encerrar_'):
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Sim", callback_data=f'caso_confirmar_encerrar_{caso_id}'),
-                InlineKeyboardButton("❌ Não", callback_data=f'caso_editar_{caso_id}')
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.message.edit_text(
-            "⚠️ Tem certeza que deseja encerrar este caso?",
-            reply_markup=reply_markup
-        )
-    
-    elif data.startswith('caso_confirmar_encerrar_'):
-        if encerrar_caso_db(caso_id):
-            await query.message.edit_text(
-                "✅ Caso encerrado com sucesso!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='casos')
-                ]])
-            )
-        else:
-            await query.message.edit_text(
-                "❌ Erro ao encerrar caso",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data=f'caso_editar_{caso_id}')
-                ]])
-            )
@@ -0,0 +1,172 @@
+# codec_callback.py
+import base64
+import hashlib
+import os
+import zlib
+from datetime import datetime, timedelta
+from cachetools import TTLCache
+
+# callback_data compacto: '~' + base64url(payload) ou '@' + token do armazém.
+# payload = versão (1 byte) + id da rota (2 bytes) + argumentos serializados
+VERSAO_CALLBACK = 1
+LIMITE_CALLBACK = 64  # bytes aceitos pelo Telegram
+PREFIXO_INLINE = '~'
+PREFIXO_ARMAZEM = '@'
+
+# Payloads maiores que o limite ficam no servidor, referenciados por um token curto.
+# O armazém é local ao processo (perdido em reinícios e invisível aos outros workers):
+# é só uma rede de segurança; estado que cresce, como seleções, fica no user_data.
+CALLBACK_ARMAZEM_TAMANHO = int(os.getenv('CALLBACK_ARMAZEM_TAMANHO', '50000'))
+CALLBACK_ARMAZEM_TTL = int(os.getenv('CALLBACK_ARMAZEM_TTL', str(7 * 24 * 3600)))
+
+_armazem = TTLCache(maxsize=CALLBACK_ARMAZEM_TAMANHO, ttl=CALLBACK_ARMAZEM_TTL)
+_EPOCA = datetime(1970, 1, 1)
+
+# Tipos aceitos como argumento
+_NULO, _FALSO, _VERDADEIRO, _INTEIRO, _TEXTO, _LISTA, _DATA_HORA = range(7)
+
+
+class CallbackInvalido(Exception):
+    """callback_data que não pode ser decodificado"""
+
+
+class CallbackExpirado(CallbackInvalido):
+    """Token que já saiu do armazém (reinício ou expiração)"""
+
+
+def id_rota(chave: str) -> int:
+    """Id estável de 16 bits da rota (não muda entre deploys)"""
+    return zlib.crc32(chave.encode()) & 0xFFFF
+
+def eh_compacto(dados: str) -> bool:
+    return bool(dados) and dados[0] in (PREFIXO_INLINE, PREFIXO_ARMAZEM)
+
+def _varint(saida: bytearray, numero: int):
+    while True:
+        byte = numero & 0x7F
+        numero >>= 7
+        if numero:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return
+
+def _ler_varint(dados: bytes, pos: int):
+    numero = deslocamento = 0
+    while True:
+        if pos >= len(dados):
+            raise CallbackInvalido("varint truncado")
+        byte = dados[pos]
+        pos += 1
+        numero |= (byte & 0x7F) << deslocamento
+        if not byte & 0x80:
+            return numero, pos
+        deslocamento += 7
+
+def _zigzag(numero: int) -> int:
+    return numero * 2 if numero >= 0 else -numero * 2 - 1
+
+def _dezigzag(numero: int) -> int:
+    return numero >> 1 if not numero & 1 else -(numero >> 1) - 1
+
+def _serializar(saida: bytearray, valor):
+    if valor is None:
+        saida.append(_NULO)
+    elif valor is True:
+        saida.append(_VERDADEIRO)
+    elif valor is False:
+        saida.append(_FALSO)
+    elif isinstance(valor, int):
+        saida.append(_INTEIRO)
+        _varint(saida, _zigzag(valor))
+    elif isinstance(valor, str):
+        bruto = valor.encode()
+        saida.append(_TEXTO)
+        _varint(saida, len(bruto))
+        saida += bruto
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        itens = sorted(valor) if isinstance(valor, (set, frozenset)) else valor
+        saida.append(_LISTA)
+        _varint(saida, len(itens))
+        for item in itens:
+            _serializar(saida, item)
+    elif isinstance(valor, datetime):
+        saida.append(_DATA_HORA)
+        _varint(saida, _zigzag((valor.replace(tzinfo=None) - _EPOCA) // timedelta(microseconds=1)))
+    else:
+        raise TypeError(f"Tipo não suportado em callback_data: {type(valor).__name__}")
+
+def _desserializar(dados: bytes, pos: int):
+    if pos >= len(dados):
+        raise CallbackInvalido("payload truncado")
+    tipo = dados[pos]
+    pos += 1
+    if tipo == _NULO:
+        return None, pos
+    if tipo == _FALSO:
+        return False, pos
+    if tipo == _VERDADEIRO:
+        return True, pos
+    if tipo == _INTEIRO:
+        numero, pos = _ler_varint(dados, pos)
+        return _dezigzag(numero), pos
+    if tipo == _TEXTO:
+        tamanho, pos = _ler_varint(dados, pos)
+        if pos + tamanho > len(dados):
+            raise CallbackInvalido("texto truncado")
+        return dados[pos:pos + tamanho].decode(), pos + tamanho
+    if tipo == _LISTA:
+        tamanho, pos = _ler_varint(dados, pos)
+        itens = []
+        for _ in range(tamanho):
+            item, pos = _desserializar(dados, pos)
+            itens.append(item)
+        return itens, pos
+    if tipo == _DATA_HORA:
+        numero, pos = _ler_varint(dados, pos)
+        return _EPOCA + timedelta(microseconds=_dezigzag(numero)), pos
+    raise CallbackInvalido(f"tipo desconhecido: {tipo}")
+
+def codificar(rota: int, argumentos) -> str:
+    """Monta o callback_data da rota; payloads grandes vão para o armazém"""
+    payload = bytearray([VERSAO_CALLBACK])
+    payload += rota.to_bytes(2, 'big')
+    _varint(payload, len(argumentos))
+    for argumento in argumentos:
+        _serializar(payload, argumento)
+    payload = bytes(payload)
+
+    texto = PREFIXO_INLINE + base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+    if len(texto) <= LIMITE_CALLBACK:
+        return texto
+    # Token derivado do conteúdo: o mesmo teclado redesenhado reaproveita a entrada
+    token = base64.urlsafe_b64encode(hashlib.blake2b(payload, digest_size=9).digest()).decode()
+    _armazem[token] = payload
+    return PREFIXO_ARMAZEM + token
+
+def decodificar(dados: str):
+    """Retorna (id da rota, argumentos) de um callback_data compacto"""
+    if dados.startswith(PREFIXO_ARMAZEM):
+        payload = _armazem.get(dados[1:])
+        if payload is None:
+            raise CallbackExpirado(dados)
+    elif dados.startswith(PREFIXO_INLINE):
+        corpo = dados[1:]
+        try:
+            payload = base64.urlsafe_b64decode(corpo + '=' * (-len(corpo) % 4))
+        except ValueError as e:
+            raise CallbackInvalido(str(e))
+    else:
+        raise CallbackInvalido(dados)
+
+    if len(payload) < 4:
+        raise CallbackInvalido("payload curto")
+    if payload[0] != VERSAO_CALLBACK:
+        raise CallbackInvalido(f"versão {payload[0]} não suportada")
+    rota = int.from_bytes(payload[1:3], 'big')
+    total, pos = _ler_varint(payload, 3)
+    argumentos = []
+    for _ in range(total):
+        argumento, pos = _desserializar(payload, pos)
+        argumentos.append(argumento)
+    return rota, argumentos
@@ -2,15 +2,17 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from decorators import user_approved, admin_required
+from roteador import rota, callback
 from datetime import datetime
 from database_contatos import (
-    adicionar_contato_db,
-    consultar_contatos_db,
-    pesquisar_contatos_db,
-    apagar_contato_db
+    adicionar_contato_db_async,
+    consultar_contatos_db_async,
+    pesquisar_contatos_db_async,
+    apagar_contato_db_async
 )
-from database_estatisticas import incrementar_contador, registrar_acao_usuario
+from database_estatisticas import incrementar_contador_async, registrar_acao_usuario_async
 
+@rota('contatos')
 @user_approved
 async def menu_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
@@ -27,6 +29,7 @@ async def menu_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('contato_novo')
 async def criar_contato(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['criando_contato'] = True
     keyboard = [
@@ -47,9 +50,10 @@ async def criar_contato(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('contato_listar')
 async def listar_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.callback_query.from_user.id
-    contatos = consultar_contatos_db(user_id)
+    contatos = await consultar_contatos_db_async(user_id)
     
     if not contatos:
         keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='contatos')]]
@@ -72,7 +76,7 @@ async def listar_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         texto += "\n"
         keyboard.append([InlineKeyboardButton(
             f"❌ Apagar: {nome}",
-            callback_data=f'contato_apagar_{id_contato}'
+            callback_data=callback('contato_apagar', id_contato)
         )])
     
     keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='contatos')])
@@ -83,6 +87,7 @@ async def listar_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@rota('contato_pesquisar')
 async def pesquisar_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['pesquisando_contato'] = True
     keyboard = [
@@ -96,35 +101,16 @@ async def pesquisar_contatos(update: Update, context: ContextTypes.DEFAULT_TYPE)
         reply_markup=reply_markup
     )
 
-@user_approved
-async def handle_contatos_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    
-    if query.data == 'contatos':
-        await menu_contatos(update, context)
-    
-    elif query.data == 'contato_novo':
-        await criar_contato(update, context)
-    
-    elif query.data == 'contato_listar':
-        await listar_contatos(update, context)
-    
-    elif query.data == 'contato_pesquisar':
-        await pesquisar_contatos(update, context)
-    
-    elif query.data == 'contato_cancelar':
-        context.user_data.clear()
-        await menu_contatos(update, context)
-    
-    elif query.data.startswith('contato_apagar_'):
-        contato_id = int(query.data.split('_')[-1])
-        apagar_contato_db(contato_id)
-        await listar_contatos(update, context)
-    
-    elif query.data == 'menu_principal':
-        from dcyber_bot import start
-        await start(update, context)
+@rota('contato_cancelar')
+async def cancelar_contato(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear()
+    await menu_contatos(update, context)
+
+@rota('contato_apagar', legado=True)
+async def apagar_contato(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    contato_id, = context.args
+    await apagar_contato_db_async(contato_id)
+    await listar_contatos(update, context)
 
 @user_approved
 async def handle_contato_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -146,7 +132,7 @@ async def handle_contato_message(update: Update, context: ContextTypes.DEFAULT_T
             observacoes = linhas[2].strip() if len(linhas) > 2 else None
 
             user_id = update.effective_user.id
-            contato_id = adicionar_contato_db(user_id, nome, contato, observacoes)
+            contato_id = await adicionar_contato_db_async(user_id, nome, contato, observacoes)
             
             if contato_id:
                 texto_resposta = "✅ Contato adicionado com sucesso!\n\n"
@@ -167,8 +153,8 @@ async def handle_contato_message(update: Update, context: ContextTypes.DEFAULT_T
                 )
                 
                 # Registrar estatísticas
-                incrementar_contador('contatos')
-                registrar_acao_usuario(user_id, 'novo_contato')
+                await incrementar_contador_async('contatos')
+                await registrar_acao_usuario_async(user_id, 'novo_contato')
             else:
                 await update.message.reply_text("❌ Erro ao adicionar contato.")
             
@@ -182,7 +168,7 @@ async def handle_contato_message(update: Update, context: ContextTypes.DEFAULT_T
         try:
             termo = update.message.text.strip()
             user_id = update.effective_user.id
-            contatos = pesquisar_contatos_db(user_id, termo)
+            contatos = await pesquisar_contatos_db_async(user_id, termo)
             
             if not contatos:
                 keyboard = [
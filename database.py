@@ -1,111 +1,14 @@
-import os
-import psycopg2
-import pytz
 from datetime import datetime
 import time
-from database_manager import db
+from database_manager import db, assincrono
+import auth
+import cache_usuarios
+import cache_relatorios
+from telemetria import telemetria
 
 def get_db_connection():
-    DATABASE_URL = os.getenv('DATABASE_URL')
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    conn = psycopg2.connect(DATABASE_URL)
-    conn.autocommit = True
-    return conn
-
-# Funções de criação de tabelas
-def criar_tabela():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Recria a tabela de assinaturas
-        cursor.execute('''DROP TABLE IF EXISTS assinaturas''')
-        cursor.execute('''
-            CREATE TABLE assinaturas (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                username TEXT NOT NULL,
-                documento TEXT NOT NULL,
-                sequencia BIGINT NOT NULL,
-                ativo BOOLEAN DEFAULT TRUE,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
-
-def criar_tabela_usuarios(admin_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Criar a tabela com a nova estrutura
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                user_id BIGINT PRIMARY KEY,
-                nome TEXT NOT NULL,
-                username TEXT,
-                nivel TEXT DEFAULT 'pendente',
-                ativo BOOLEAN DEFAULT FALSE,
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Inserir admin padrão
-        cursor.execute('''
-            INSERT INTO usuarios (user_id, nome, username, nivel, ativo)
-            VALUES (%s, 'Admin', 'admin', 'admin', TRUE)
-            ON CONFLICT (user_id) DO UPDATE 
-            SET nome = 'Admin', username = 'admin', nivel = 'admin', ativo = TRUE
-        ''', (admin_id,))
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Erro ao criar tabela de usuários: {e}")
-        conn.rollback()
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
-
-def criar_tabela_lembretes():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS lembretes (
-            id SERIAL PRIMARY KEY,
-            criador_id BIGINT NOT NULL,
-            titulo TEXT NOT NULL,
-            data DATE NOT NULL,
-            hora TIME NOT NULL,
-            ativo BOOLEAN DEFAULT TRUE,
-            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (criador_id) REFERENCES usuarios (user_id)
-        )
-        ''')
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS lembrete_destinatarios (
-            id SERIAL PRIMARY KEY,
-            lembrete_id BIGINT NOT NULL,
-            user_id BIGINT NOT NULL,
-            notificado BOOLEAN DEFAULT FALSE,
-            FOREIGN KEY (lembrete_id) REFERENCES lembretes (id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES usuarios (user_id),
-            UNIQUE(lembrete_id, user_id)
-        )
-        ''')
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+    """Empresta uma conexão do pool compartilhado (conn.close() a devolve)"""
+    return db.get_connection()
 
 # Funções de usuários
 def registrar_novo_usuario(user_id: int, nome: str, username: str = None) -> bool:
@@ -121,6 +24,8 @@ def registrar_novo_usuario(user_id: int, nome: str, username: str = None) -> boo
         ''', (user_id, nome, username))
         result = cursor.fetchone()
         conn.commit()
+        if result:
+            cache_usuarios.invalidar_usuario(user_id)
         print(f"Usuário registrado com sucesso")
         return bool(result)
     except Exception as e:
@@ -142,6 +47,7 @@ def aprovar_usuario(user_id: int) -> bool:
         ''', (user_id,))
         result = cursor.fetchone()
         conn.commit()
+        cache_usuarios.invalidar_usuario(user_id)
         print(f"Status após aprovação - ID: {user_id}, Nível: {result[0]}, Ativo: {result[1]}")
         return bool(result)
     except Exception as e:
@@ -162,6 +68,7 @@ def recusar_usuario(user_id: int) -> bool:
         ''', (user_id,))
         result = cursor.fetchone()
         conn.commit()
+        cache_usuarios.invalidar_usuario(user_id)
         return bool(result)
     except Exception as e:
         print(f"Erro ao recusar usuário: {e}")
@@ -184,6 +91,7 @@ def alterar_nivel_usuario(user_id: int, novo_nivel: str) -> bool:
         
         result = cursor.fetchone()
         conn.commit()
+        cache_usuarios.invalidar_usuario(user_id)
         
         if result:
             print(f"Nível alterado - User ID: {result[0]}, Novo nível: {result[1]}")
@@ -199,36 +107,53 @@ def alterar_nivel_usuario(user_id: int, novo_nivel: str) -> bool:
         conn.close()
 
 # Funções de assinaturas
-def inserir_assinatura(user_id, username, documento, sequencia):
+# Serializa a numeração da fila entre conexões concorrentes
+CHAVE_LOCK_SEQUENCIA = 7_340_002
+
+def inserir_assinaturas(user_id, username, documentos) -> list:
+    """Insere os documentos e reserva suas sequências em uma única ida ao banco"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Atualizar username se já existir
+        # Os comandos seguem em uma só mensagem e formam uma única transação;
+        # o advisory lock vale até o fim dela. Fila vazia reinicia em 1.
         cursor.execute('''
+            SELECT pg_advisory_xact_lock(%(chave)s);
+            
             UPDATE assinaturas 
-            SET username = %s
-            WHERE user_id = %s AND username != %s
-            RETURNING id
-        ''', (username, user_id, username))
-        
-        # Inserir nova assinatura
-        cursor.execute('''
+            SET username = %(username)s
+            WHERE user_id = %(user_id)s AND username != %(username)s;
+            
             INSERT INTO assinaturas (user_id, username, documento, sequencia, ativo)
-            VALUES (%s, %s, %s, %s, TRUE)
-            RETURNING id
-        ''', (user_id, username, documento, sequencia))
+            SELECT %(user_id)s, %(username)s, d.documento, base.ultima + d.ordem, TRUE
+            FROM unnest(%(documentos)s::text[]) WITH ORDINALITY AS d (documento, ordem),
+                 (SELECT COALESCE(MAX(sequencia), 0) AS ultima
+                  FROM assinaturas WHERE ativo = TRUE) AS base
+            RETURNING sequencia;
+        ''', {
+            'chave': CHAVE_LOCK_SEQUENCIA,
+            'user_id': user_id,
+            'username': username,
+            'documentos': list(documentos)
+        })
         
-        result = cursor.fetchone()
+        sequencias = sorted(row[0] for row in cursor.fetchall())
         conn.commit()
-        return bool(result)
+        return sequencias
     except Exception as e:
-        print(f"Erro ao inserir assinatura: {e}")
-        return False
+        print(f"Erro ao inserir assinaturas: {e}")
+        conn.rollback()
+        return []
     finally:
         cursor.close()
         conn.close()
 
+def inserir_assinatura(user_id, username, documento):
+    """Insere um documento e retorna sua sequência (ou None)"""
+    sequencias = inserir_assinaturas(user_id, username, [documento])
+    return sequencias[0] if sequencias else None
+
 def apagar_assinatura_por_sequencia(sequencia):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -258,73 +183,98 @@ def apagar_assinatura_por_sequencia(sequencia):
         cursor.close()
         conn.close()
 
-# Funções de consulta
-def consultar_assinaturas():
+def assinar_todas():
+    """Marca todas as assinaturas pendentes como assinadas em um único UPDATE"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    
     try:
         cursor.execute('''
-            SELECT id, user_id, username, documento, sequencia
-            FROM assinaturas
+            UPDATE assinaturas
+            SET ativo = FALSE
             WHERE ativo = TRUE
-            ORDER BY data_criacao DESC
+            RETURNING user_id, username, documento, sequencia
         ''')
-        return cursor.fetchall()
+        assinadas = sorted(cursor.fetchall(), key=lambda row: row[3])
+        conn.commit()
+        return assinadas
     except Exception as e:
-        print(f"Erro ao consultar assinaturas: {e}")
+        print(f"Erro ao assinar todas: {e}")
+        conn.rollback()
         return []
     finally:
         cursor.close()
         conn.close()
 
-def gerar_sequencia():
+# Funções de consulta
+# Ordem da fila: mais recentes primeiro, id como desempate.
+# direção: (filtro da página, filtro dos itens do outro lado do cursor, ordenação)
+_PAGINA_ASSINATURAS = {
+    'proxima': ('(a.data_criacao, a.id) < (%s, %s)', '(b.data_criacao, b.id) >= (%s, %s)',
+                'a.data_criacao DESC, a.id DESC'),
+    'inicio': ('(a.data_criacao, a.id) <= (%s, %s)', '(b.data_criacao, b.id) > (%s, %s)',
+               'a.data_criacao DESC, a.id DESC'),
+    'anterior': ('(a.data_criacao, a.id) > (%s, %s)', '(b.data_criacao, b.id) <= (%s, %s)',
+                 'a.data_criacao ASC, a.id ASC'),
+}
+
+def consultar_assinaturas_pagina(chave=None, direcao='proxima', limite=5):
+    """Página da fila por keyset em (data_criacao, id), já com o nome de exibição.
+
+    `chave` é o (data_criacao, id) de referência: 'proxima' lista os itens
+    após ele, 'anterior' os itens antes dele e 'inicio' a partir dele.
+    Retorna (linhas, tem_anterior, tem_proxima).
+    """
+    if chave is None:
+        filtro, oposto, ordem = 'TRUE', 'FALSE', 'a.data_criacao DESC, a.id DESC'
+        params = [limite + 1]
+    else:
+        filtro, oposto, ordem = _PAGINA_ASSINATURAS[direcao]
+        params = [*chave, *chave, limite + 1]
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    
     try:
-        cursor.execute('SELECT COUNT(*) FROM assinaturas WHERE ativo = TRUE')
-        total_pendentes = cursor.fetchone()[0]
-        
-        if total_pendentes == 0:
-            return 1
-            
-        cursor.execute('SELECT MAX(sequencia) FROM assinaturas WHERE ativo = TRUE')
-        ultimo_numero = cursor.fetchone()[0] or 0
-        return ultimo_numero + 1
-    except Exception as e:
-        print(f"Erro ao gerar sequência: {e}")
-        return 1
+        cursor.execute(f'''
+            SELECT a.id, a.user_id, a.username, a.documento, a.sequencia, a.data_criacao,
+                   CASE
+                       WHEN u.nome LIKE '%% %%' THEN split_part(u.nome, ' ', 1)
+                       ELSE COALESCE(u.nome, a.username)
+                   END AS display_name,
+                   EXISTS (
+                       SELECT 1 FROM assinaturas b WHERE b.ativo = TRUE AND {oposto}
+                   ) AS tem_oposto
+            FROM assinaturas a
+            LEFT JOIN usuarios u ON a.user_id = u.user_id
+            WHERE a.ativo = TRUE
+            AND {filtro}
+            ORDER BY {ordem}
+            LIMIT %s
+        ''', params)
+        linhas = cursor.fetchall()
     finally:
         cursor.close()
         conn.close()
 
-# Funções de verificação
+    mais = len(linhas) > limite
+    tem_oposto = linhas[0][-1] if linhas else False
+    linhas = [linha[:-1] for linha in linhas[:limite]]
+    if direcao == 'anterior' and chave is not None:
+        linhas.reverse()
+        return linhas, mais, tem_oposto
+    return linhas, tem_oposto, mais
+
 def is_admin(user_id: int) -> bool:
     """Verifica se o usuário é admin"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] == 'admin' if result else False
+        usuario = cache_usuarios.obter_usuario(user_id)
+        return usuario['nivel'] == 'admin' if usuario else False
     except Exception as e:
         print(f"Erro ao verificar admin: {e}")
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 def is_dpc(user_id: int) -> bool:
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        return result[0] == 'dpc' if result else False
-    finally:
-        cursor.close()
-        conn.close()
+    usuario = cache_usuarios.obter_usuario(user_id)
+    return usuario['nivel'] == 'dpc' if usuario else False
 
 def get_usuarios_cadastrados(excluir_user_id=None):
     conn = get_db_connection()
@@ -350,202 +300,58 @@ def get_usuarios_cadastrados(excluir_user_id=None):
         cursor.close()
         conn.close()
 
-def get_user_display_info(user_id=None, username=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        if user_id:
-            cursor.execute('''
-                SELECT 
-                    user_id,
-                    username,
-                    nome,
-                    nivel,
-                    ativo
-                FROM usuarios 
-                WHERE user_id = %s
-            ''', (user_id,))
-        elif username:
-            cursor.execute('''
-                SELECT 
-                    user_id,
-                    username,
-                    nome,
-                    nivel,
-                    ativo
-                FROM usuarios 
-                WHERE username = %s
-            ''', (username,))
-        
-        result = cursor.fetchone()
-        if result:
-            user_id, username, nome, nivel, ativo = result
-            display_name = nome.split()[0] if nome and ' ' in nome else nome
-            
-            return {
-                'user_id': user_id,
-                'username': username,
-                'nome_completo': nome,
-                'display_name': display_name,
-                'nivel': nivel,
-                'ativo': ativo
-            }
+def _montar_display_info(usuario):
+    if not usuario:
         return None
-    finally:
-        cursor.close()
-        conn.close()
+    nome = usuario['nome']
+    display_name = nome.split()[0] if nome and ' ' in nome else nome
+    return {
+        'user_id': usuario['user_id'],
+        'username': usuario['username'],
+        'nome_completo': nome,
+        'display_name': display_name,
+        'nivel': usuario['nivel'],
+        'ativo': usuario['ativo']
+    }
+
+def get_user_display_info(user_id=None, username=None):
+    if user_id:
+        usuario = cache_usuarios.obter_usuario(user_id)
+    elif username:
+        usuario = cache_usuarios.obter_usuario_por_username(username)
+    else:
+        usuario = None
+    return _montar_display_info(usuario)
+
+async def get_user_display_info_async(user_id=None, username=None):
+    """Versão assíncrona: só usa o executor do banco quando não há cache"""
+    if user_id:
+        usuario = await cache_usuarios.obter_usuario_async(user_id)
+    elif username:
+        usuario = await cache_usuarios.obter_usuario_por_username_async(username)
+    else:
+        usuario = None
+    return _montar_display_info(usuario)
 
 def obter_relatorio_atividades(data_inicio, data_fim):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    """Acessos e assinaturas por usuário e dia, a partir dos agregados diários"""
+    if isinstance(data_inicio, datetime):
+        data_inicio = data_inicio.date()
+    if isinstance(data_fim, datetime):
+        data_fim = data_fim.date()
     try:
-        print(f"Consultando período: {data_inicio} até {data_fim}")
-        
-        # Configurar timezone
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        
-        cursor.execute('''
-            SELECT 
-                COALESCE(u.nome, u.username) as nome_usuario,
-                u.nivel,
-                DATE(a.data_acesso AT TIME ZONE 'America/Sao_Paulo') as data,
-                MIN(a.data_acesso AT TIME ZONE 'America/Sao_Paulo') as primeiro_acesso,
-                MAX(a.data_acesso AT TIME ZONE 'America/Sao_Paulo') as ultimo_acesso,
-                COUNT(*) as total_acessos
-            FROM user_acessos a
-            JOIN usuarios u ON a.user_id = u.user_id
-            WHERE a.data_acesso BETWEEN %s AND %s
-            GROUP BY u.nome, u.username, u.nivel, DATE(a.data_acesso AT TIME ZONE 'America/Sao_Paulo')
-            ORDER BY DATE(a.data_acesso AT TIME ZONE 'America/Sao_Paulo') DESC, nome_usuario
-        ''', (data_inicio, data_fim))
-        
-        acessos = cursor.fetchall()
-        print(f"Acessos encontrados: {len(acessos)}")
-        
-        cursor.execute('''
-            SELECT 
-                COALESCE(u.nome, u.username) as nome_usuario,
-                DATE(a.data_criacao AT TIME ZONE 'America/Sao_Paulo') as data,
-                COUNT(*) as total_assinaturas
-            FROM assinaturas a
-            JOIN usuarios u ON a.user_id = u.user_id
-            WHERE a.data_criacao BETWEEN %s AND %s
-            GROUP BY u.nome, u.username, DATE(a.data_criacao AT TIME ZONE 'America/Sao_Paulo')
-            ORDER BY DATE(a.data_criacao AT TIME ZONE 'America/Sao_Paulo') DESC, nome_usuario
-        ''', (data_inicio, data_fim))
-        
-        assinaturas = cursor.fetchall()
-        print(f"Assinaturas encontradas: {len(assinaturas)}")
-
-        return acessos, assinaturas
-        
+        return cache_relatorios.obter_relatorio(data_inicio, data_fim)
     except Exception as e:
         print(f"Erro ao obter relatório: {e}")
         print(f"Data início: {data_inicio}, Data fim: {data_fim}")
         return [], []
-    finally:
-        cursor.close()
-        conn.close()
 
 def registrar_acesso(user_id: int, tipo_acesso: str = 'login'):
-    timezone = pytz.timezone('America/Sao_Paulo')
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Configurar timezone
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        
-        # Registrar acesso com timezone correto
-        agora = datetime.now(timezone)
-        cursor.execute('''
-            INSERT INTO user_acessos (user_id, tipo_acesso, data_acesso)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        ''', (user_id, tipo_acesso, agora))
-        
-        result = cursor.fetchone()
-        conn.commit()
-        return bool(result)
-    except Exception as e:
-        print(f"Erro ao registrar acesso: {e}")
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+    """Enfileira o acesso no buffer de telemetria (gravado em lote)"""
+    return telemetria.registrar_acesso(user_id, tipo_acesso)
 
-def criar_tabela_acessos():
-    """Criar tabela para registrar acessos dos usuários"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_acessos (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tipo_acesso TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
-
-def criar_todas_tabelas():
-    """Cria todas as tabelas necessárias"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Tabela de acessos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_acessos (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tipo_acesso TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        
-        # Tabela de ações
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS acoes_usuarios (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                tipo_acao TEXT NOT NULL,
-                data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        
-        # Tabela de contadores
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contadores_permanentes (
-                id SERIAL PRIMARY KEY,
-                tipo TEXT NOT NULL UNIQUE,
-                total INTEGER DEFAULT 0,
-                ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Inicializar contadores se não existirem
-        tipos = ['documentos', 'lembretes', 'contatos', 'usuarios']
-        for tipo in tipos:
-            cursor.execute('''
-                INSERT INTO contadores_permanentes (tipo, total)
-                VALUES (%s, 0)
-                ON CONFLICT (tipo) DO NOTHING
-            ''', (tipo,))
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+async def registrar_acesso_async(user_id: int, tipo_acesso: str = 'login'):
+    return registrar_acesso(user_id, tipo_acesso)
 
 def listar_usuarios() -> list:
     """Lista todos os usuários"""
@@ -564,36 +370,8 @@ def listar_usuarios() -> list:
 
 def obter_id_dpc() -> int:
     """Obtém o ID do usuário DPC"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT user_id FROM usuarios WHERE nivel = %s', ('dpc',))
-        result = cursor.fetchone()
-        return result[0] if result else None
-    finally:
-        cursor.close()
-        conn.close()
+    return cache_usuarios.obter_id_dpc()
 
-def atualizar_nome_admin(admin_id: int) -> bool:
-    """Atualiza o nome do admin"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            UPDATE usuarios 
-            SET nome = 'Diego', username = 'Diego'
-            WHERE user_id = %s AND nivel = 'admin'
-            RETURNING user_id
-        ''', (admin_id,))
-        result = cursor.fetchone()
-        conn.commit()
-        return bool(result)
-    except Exception as e:
-        print(f"Erro ao atualizar nome do admin: {e}")
-        return False
-    finally:
-        cursor.close()
-        conn.close()
 def adicionar_usuario(user_id: int, nome: str, username: str = None, nivel: str = 'user') -> bool:
     """Adiciona ou atualiza um usuário"""
     conn = get_db_connection()
@@ -612,6 +390,7 @@ def adicionar_usuario(user_id: int, nome: str, username: str = None, nivel: str
         
         result = cursor.fetchone()
         conn.commit()
+        cache_usuarios.invalidar_usuario(user_id)
         return bool(result)
     except Exception as e:
         print(f"Erro ao adicionar usuário: {e}")
@@ -659,6 +438,7 @@ def desativar_usuario(user_id: int) -> bool:
             ''', (user_id,))
             
             conn.commit()
+            cache_usuarios.invalidar_usuario(user_id)
             return True
             
         return False
@@ -731,3 +511,24 @@ def listar_usuarios_ativos() -> list:
     finally:
         cursor.close()
         conn.close()
+
+# Equivalentes assíncronos (executados no executor dedicado do banco)
+registrar_novo_usuario_async = assincrono(registrar_novo_usuario)
+aprovar_usuario_async = assincrono(aprovar_usuario)
+recusar_usuario_async = assincrono(recusar_usuario)
+alterar_nivel_usuario_async = assincrono(alterar_nivel_usuario)
+inserir_assinatura_async = assincrono(inserir_assinatura)
+inserir_assinaturas_async = assincrono(inserir_assinaturas)
+apagar_assinatura_por_sequencia_async = assincrono(apagar_assinatura_por_sequencia)
+assinar_todas_async = assincrono(assinar_todas)
+consultar_assinaturas_pagina_async = assincrono(consultar_assinaturas_pagina)
+get_usuarios_cadastrados_async = assincrono(get_usuarios_cadastrados)
+obter_relatorio_atividades_async = assincrono(obter_relatorio_atividades)
+listar_usuarios_async = assincrono(listar_usuarios)
+obter_id_dpc_async = cache_usuarios.obter_id_dpc_async
+is_admin_async = auth.is_admin_async
+is_dpc_async = auth.is_dpc_async
+adicionar_usuario_async = assincrono(adicionar_usuario)
+desativar_usuario_async = assincrono(desativar_usuario)
+listar_usuarios_pendentes_async = assincrono(listar_usuarios_pendentes)
+listar_usuarios_ativos_async = assincrono(listar_usuarios_ativos)
@@ -1,45 +1,5 @@
-from database_manager import db
+from database_manager import db, assincrono
 from database_estatisticas import incrementar_contador
-from database import get_db_connection
-
-def criar_tabela_casos():
-    """Cria a tabela de casos"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS casos (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                titulo TEXT NOT NULL,
-                descricao TEXT,
-                observacoes TEXT,
-                status TEXT DEFAULT 'Em andamento',
-                ativo BOOLEAN DEFAULT TRUE,
-                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS caso_responsaveis (
-                id SERIAL PRIMARY KEY,
-                caso_id BIGINT NOT NULL,
-                user_id BIGINT NOT NULL,
-                FOREIGN KEY (caso_id) REFERENCES casos (id) ON DELETE CASCADE,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id),
-                UNIQUE(caso_id, user_id)
-            )
-        ''')
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Erro ao criar tabela de casos: {e}")
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
 
 def adicionar_caso_db(user_id: int, titulo: str, descricao: str, observacoes: str = None):
     conn = db.get_connection()
@@ -165,3 +125,10 @@ def apagar_caso_db(caso_id: int):
     finally:
         cursor.close()
         conn.close()
+
+# Equivalentes assíncronos (executados no executor dedicado do banco)
+adicionar_caso_db_async = assincrono(adicionar_caso_db)
+consultar_casos_db_async = assincrono(consultar_casos_db)
+atualizar_caso_db_async = assincrono(atualizar_caso_db)
+encerrar_caso_db_async = assincrono(encerrar_caso_db)
+apagar_caso_db_async = assincrono(apagar_caso_db)
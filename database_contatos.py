@@ -1,28 +1,6 @@
-from database_manager import db
+from database_manager import db, assincrono
 from database_estatisticas import incrementar_contador
 
-def criar_tabela_contatos():
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contatos (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                nome TEXT NOT NULL,
-                contato TEXT NOT NULL,
-                observacoes TEXT,
-                ativo BOOLEAN DEFAULT TRUE,
-                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
-
 def adicionar_contato_db(user_id, nome, contato, observacoes=None):
     """Adiciona um novo contato"""
     conn = db.get_connection()
@@ -142,3 +120,10 @@ def apagar_contato_db(contato_id):
     finally:
         cursor.close()
         conn.close()
+
+# Equivalentes assíncronos (executados no executor dedicado do banco)
+adicionar_contato_db_async = assincrono(adicionar_contato_db)
+consultar_contatos_db_async = assincrono(consultar_contatos_db)
+pesquisar_contatos_db_async = assincrono(pesquisar_contatos_db)
+atualizar_contato_db_async = assincrono(atualizar_contato_db)
+apagar_contato_db_async = assincrono(apagar_contato_db)
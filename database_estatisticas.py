@@ -1,127 +1,17 @@
-import psycopg2
-import pytz
-from datetime import datetime
-import time
-import os
+from database_manager import db, assincrono
+from telemetria import telemetria
 
 def get_db_connection():
-    DATABASE_URL = os.getenv('DATABASE_URL')
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    return psycopg2.connect(DATABASE_URL)
-
-def criar_tabela_estatisticas():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Tabela de contadores permanentes
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS contadores_permanentes (
-            id SERIAL PRIMARY KEY,
-            tipo TEXT NOT NULL UNIQUE,
-            total INTEGER DEFAULT 0,
-            ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Tabela de ações por usuário
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS acoes_usuarios (
-            id SERIAL PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            tipo_acao TEXT NOT NULL,
-            data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Tabela de acessos
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_acessos (
-            id SERIAL PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            tipo_acesso TEXT NOT NULL
-        )
-        ''')
-        
-        # Inicializar contadores se não existirem
-        tipos = ['documentos', 'lembretes', 'contatos', 'usuarios', 'casos']
-        for tipo in tipos:
-            cursor.execute('''
-            INSERT INTO contadores_permanentes (tipo, total)
-            VALUES (%s, 0)
-            ON CONFLICT (tipo) DO NOTHING
-            ''', (tipo,))
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Erro ao criar tabelas de estatísticas: {e}")
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
+    """Empresta uma conexão do pool compartilhado (conn.close() a devolve)"""
+    return db.get_connection()
 
 def incrementar_contador(tipo: str, quantidade: int = 1):
-    max_attempts = 3
-    attempt = 0
-    while attempt < max_attempts:
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-            UPDATE contadores_permanentes 
-            SET total = total + %s, 
-                ultima_atualizacao = CURRENT_TIMESTAMP 
-            WHERE tipo = %s
-            RETURNING id
-            ''', (quantidade, tipo))
-            result = cursor.fetchone()
-            conn.commit()
-            return bool(result)
-        except Exception as e:
-            attempt += 1
-            if attempt == max_attempts:
-                print(f"Erro ao incrementar contador após {max_attempts} tentativas: {e}")
-                return False
-            time.sleep(1)
-        finally:
-            try:
-                cursor.close()
-                conn.close()
-            except:
-                pass
+    """Soma ao contador no buffer de telemetria (agregado por gravação)"""
+    return telemetria.incrementar(tipo, quantidade)
 
-def registrar_acao_usuario(user_id: int, tipo_acao: str):
-    timezone = pytz.timezone('America/Sao_Paulo')
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM acoes_usuarios WHERE user_id = %s
-        ''', (user_id,))
-        
-        if cursor.fetchone()[0] == 0:
-            incrementar_contador('usuarios')
-        
-        agora = datetime.now(timezone)
-        cursor.execute('''
-            INSERT INTO acoes_usuarios (user_id, tipo_acao, data_hora)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        ''', (user_id, tipo_acao, agora))
-        
-        result = cursor.fetchone()
-        conn.commit()
-        return bool(result)
-    except Exception as e:
-        print(f"Erro ao registrar ação: {e}")
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+def registrar_acao_usuario(user_id: int, tipo_acao: str, quantidade: int = 1):
+    """Enfileira a ação no buffer de telemetria (gravada em lote)"""
+    return telemetria.registrar_acao(user_id, tipo_acao, quantidade)
 
 def obter_estatisticas():
     """Obtém estatísticas gerais do sistema"""
@@ -133,3 +23,13 @@ def obter_estatisticas():
     finally:
         cursor.close()
         conn.close()
+
+# Equivalentes assíncronos (executados no executor dedicado do banco)
+obter_estatisticas_async = assincrono(obter_estatisticas)
+
+# A telemetria só enfileira em memória, então não precisa do executor
+async def incrementar_contador_async(tipo: str, quantidade: int = 1):
+    return incrementar_contador(tipo, quantidade)
+
+async def registrar_acao_usuario_async(user_id: int, tipo_acao: str, quantidade: int = 1):
+    return registrar_acao_usuario(user_id, tipo_acao, quantidade)
@@ -1,34 +1,319 @@
+import asyncio
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial, wraps
+import threading
 import time
 import os
 from urllib.parse import urlparse
 
+# Configurações do pool (podem ser ajustadas por variáveis de ambiente)
+POOL_MIN_CONEXOES = int(os.getenv('DB_POOL_MIN', '1'))
+POOL_MAX_CONEXOES = int(os.getenv('DB_POOL_MAX', '10'))
+POOL_TIMEOUT_ESPERA = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+POOL_VIDA_MAXIMA = float(os.getenv('DB_POOL_VIDA_MAXIMA', '1800'))
+POOL_TEMPO_OCIOSO = float(os.getenv('DB_POOL_TEMPO_OCIOSO', '300'))
+POOL_VERIFICAR_APOS = float(os.getenv('DB_POOL_VERIFICAR_APOS', '30'))
+DB_TIMEZONE = os.getenv('DB_TIMEZONE', 'America/Sao_Paulo')
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool; close() devolve a conexão ao pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        if nome.startswith('_'):
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self._conn, nome, valor)
+
+    @property
+    def closed(self):
+        return self._devolvida or self._conn.closed
+
+    def close(self):
+        if not self._devolvida:
+            self._devolvida = True
+            self._pool.devolver(self._conn)
+
+
+class _Entrada:
+    __slots__ = ('conn', 'criada_em', 'usada_em')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.criada_em = time.monotonic()
+        self.usada_em = self.criada_em
+
+
+class PoolConexoes:
+    """Pool limitado e thread-safe de conexões psycopg2"""
+
+    def __init__(self, fabrica, minimo=POOL_MIN_CONEXOES, maximo=POOL_MAX_CONEXOES,
+                 timeout=POOL_TIMEOUT_ESPERA, vida_maxima=POOL_VIDA_MAXIMA,
+                 tempo_ocioso=POOL_TEMPO_OCIOSO, verificar_apos=POOL_VERIFICAR_APOS):
+        self._fabrica = fabrica
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.vida_maxima = vida_maxima
+        self.tempo_ocioso = tempo_ocioso
+        self.verificar_apos = verificar_apos
+        self._livres = []
+        self._emprestadas = {}
+        self._abertas = 0
+        self._condicao = threading.Condition()
+        self._fechado = False
+        self._coletor = None
+
+    def emprestar(self):
+        """Obtém uma conexão saudável do pool, abrindo uma nova se necessário"""
+        limite = time.monotonic() + self.timeout
+        with self._condicao:
+            self._iniciar_coletor()
+            while True:
+                if self._fechado:
+                    raise Exception("Pool de conexões encerrado")
+                if self._livres:
+                    entrada = self._livres.pop()
+                    break
+                if self._abertas < self.maximo:
+                    self._abertas += 1
+                    entrada = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise Exception("Tempo esgotado aguardando conexão livre no pool")
+                self._condicao.wait(restante)
+
+        if entrada is not None and not self._saudavel(entrada):
+            # Mantém a vaga (_abertas inalterado) e abre a substituta em seguida
+            self._fechar(entrada.conn)
+            entrada = None
+
+        if entrada is None:
+            try:
+                entrada = _Entrada(self._fabrica())
+            except Exception:
+                with self._condicao:
+                    self._abertas -= 1
+                    self._condicao.notify()
+                raise
+
+        with self._condicao:
+            self._emprestadas[id(entrada.conn)] = entrada
+        return entrada.conn
+
+    def devolver(self, conn):
+        """Devolve a conexão ao pool (ou a descarta se estiver inválida)"""
+        with self._condicao:
+            entrada = self._emprestadas.pop(id(conn), None)
+        if entrada is None:
+            return
+
+        reutilizavel = not conn.closed and not self._fechado
+        if reutilizavel:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                reutilizavel = False
+
+        agora = time.monotonic()
+        if reutilizavel and agora - entrada.criada_em < self.vida_maxima:
+            entrada.usada_em = agora
+            with self._condicao:
+                self._livres.append(entrada)
+                self._condicao.notify()
+        else:
+            self._descartar(conn)
+
+    def _saudavel(self, entrada):
+        """Verifica vida máxima e, se ociosa há algum tempo, testa a conexão"""
+        agora = time.monotonic()
+        if entrada.conn.closed or agora - entrada.criada_em >= self.vida_maxima:
+            return False
+        if agora - entrada.usada_em < self.verificar_apos:
+            return True
+        try:
+            cursor = entrada.conn.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _fechar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _descartar(self, conn):
+        self._fechar(conn)
+        with self._condicao:
+            self._abertas -= 1
+            self._condicao.notify()
+
+    def coletar_ociosas(self):
+        """Fecha conexões ociosas ou vencidas, mantendo o mínimo configurado"""
+        agora = time.monotonic()
+        removidas = []
+        with self._condicao:
+            manter = []
+            # As mais recentes ficam no fim da lista; preserva as mais novas
+            for entrada in reversed(self._livres):
+                vencida = agora - entrada.criada_em >= self.vida_maxima
+                ociosa = agora - entrada.usada_em >= self.tempo_ocioso
+                total = len(manter) + len(self._emprestadas)
+                if vencida or (ociosa and total >= self.minimo):
+                    removidas.append(entrada)
+                else:
+                    manter.append(entrada)
+            self._livres = list(reversed(manter))
+        for entrada in removidas:
+            self._descartar(entrada.conn)
+        return len(removidas)
+
+    def _iniciar_coletor(self):
+        if self._coletor is None:
+            self._coletor = threading.Thread(
+                target=self._loop_coletor,
+                name='pool-coletor',
+                daemon=True
+            )
+            self._coletor.start()
+
+    def _loop_coletor(self):
+        intervalo = max(1.0, min(self.tempo_ocioso, self.vida_maxima) / 2)
+        while not self._fechado:
+            time.sleep(intervalo)
+            try:
+                self.coletar_ociosas()
+            except Exception as e:
+                print(f"Erro ao coletar conexões ociosas: {e}")
+
+    def fechar(self):
+        """Fecha todas as conexões livres e impede novos empréstimos"""
+        with self._condicao:
+            self._fechado = True
+            livres, self._livres = self._livres, []
+            self._condicao.notify_all()
+        for entrada in livres:
+            self._descartar(entrada.conn)
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                'abertas': self._abertas,
+                'livres': len(self._livres),
+                'emprestadas': len(self._emprestadas),
+                'maximo': self.maximo
+            }
+
+
 class DatabaseManager:
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
+            cls._instance._pool = None
+            cls._instance._executor = None
+            cls._instance._lock = threading.Lock()
         return cls._instance
-    
-    def get_connection(self):
-        """Obtém conexão com o banco de dados com retry"""
+
+    def _abrir_conexao(self):
+        """Abre uma nova conexão física com retry"""
         max_attempts = 3
         attempt = 0
         while attempt < max_attempts:
             try:
                 DATABASE_URL = os.getenv('DATABASE_URL')
-                if DATABASE_URL.startswith("postgres://"):
-                    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-                conn = psycopg2.connect(DATABASE_URL)
+                opcoes = f'-c timezone={DB_TIMEZONE}'
+                if DATABASE_URL:
+                    if DATABASE_URL.startswith("postgres://"):
+                        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+                    conn = psycopg2.connect(DATABASE_URL, options=opcoes)
+                else:
+                    # Local
+                    conn = psycopg2.connect(
+                        database="dcyber_bot",
+                        user="postgres",
+                        password=os.getenv('DB_PASSWORD'),
+                        host="localhost",
+                        port="5432",
+                        options=opcoes
+                    )
                 conn.autocommit = True
                 return conn
             except psycopg2.OperationalError:
                 attempt += 1
                 time.sleep(1)
         raise Exception("Não foi possível conectar ao banco de dados após várias tentativas")
-    
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = PoolConexoes(self._abrir_conexao)
+        return self._pool
+
+    def get_connection(self):
+        """Empresta uma conexão do pool; conn.close() a devolve"""
+        return ConexaoPool(self.pool, self.pool.emprestar())
+
+    def conexao_dedicada(self):
+        """Conexão própria, fora do pool, para sessões longas (LISTEN, locks de sessão)"""
+        return self._abrir_conexao()
+
+    @contextmanager
+    def conexao(self):
+        """Context manager que empresta e devolve uma conexão do pool"""
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @property
+    def executor(self):
+        """Executor dedicado às chamadas síncronas ao banco"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=POOL_MAX_CONEXOES,
+                        thread_name_prefix='db'
+                    )
+        return self._executor
+
+    async def executar(self, func, *args, **kwargs):
+        """Executa uma função síncrona de banco sem bloquear o event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def fechar(self):
+        """Fecha o executor e o pool (usado no encerramento do bot)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._pool is not None:
+            self._pool.fechar()
+
     def execute_query(self, query, params=None):
         """Executa uma query com tratamento de erros"""
         conn = self.get_connection()
@@ -51,3 +336,12 @@ class DatabaseManager:
 
 # Criar instância global
 db = DatabaseManager()
+
+def assincrono(func):
+    """Cria o equivalente awaitable de uma função síncrona de banco"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db.executar(func, *args, **kwargs)
+    wrapper.__name__ = f'{func.__name__}_async'
+    wrapper.__qualname__ = wrapper.__name__
+    return wrapper
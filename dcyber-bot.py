@@ -19,43 +19,36 @@ from telegram.ext import (
 
 # Database imports
 from database_manager import db
+from telemetria import telemetria
+from cache_usuarios import obter_usuario, obter_usuario_async
 from database import (
-    criar_tabela, 
-    criar_tabela_lembretes, 
-    criar_tabela_usuarios,
-    criar_tabela_acessos,
-    criar_todas_tabelas,
-    get_db_connection,
     listar_usuarios,
-    obter_id_dpc,
-    registrar_acesso,
-    registrar_novo_usuario,
-    atualizar_nome_admin,
-    is_admin  # Adicione esta importação
+    is_admin,  # Adicione esta importação
+    obter_id_dpc_async,
+    registrar_acesso_async,
+    registrar_novo_usuario_async
 )
 from database_estatisticas import (  # Adicione esta importação
-    criar_tabela_estatisticas,
     incrementar_contador,
     registrar_acao_usuario
 )
 
-# Feature handlers
-from casos import menu_casos, handle_casos_callback, handle_caso_message
-from contatos import menu_contatos, handle_contatos_callback, handle_contato_message
-from database_contatos import criar_tabela_contatos
-from database_casos import criar_tabela_casos
-from lembretes import (
-    menu_lembretes, 
-    handle_lembretes_callback, 
-    handle_lembrete_message,
-    verificar_lembretes
-)
-from assinaturas import button_handler, adicionar_assinatura, create_admin_notification_markup
-from estatisticas import menu_estatisticas, mostrar_estatisticas_gerais, mostrar_estatisticas_pessoais
-from ajuda import menu_ajuda, comando_ajuda, handle_ajuda_callback
+# Feature handlers (cada módulo registra suas rotas de callback ao ser importado)
+from roteador import roteador, rota
+from casos import menu_casos, handle_caso_message
+from contatos import handle_contato_message
+from lembretes import handle_lembrete_message
+from lideranca import lideranca
+from despachante import despachante, DESPACHO_CONCORRENCIA
+import exportacao
+from migracoes import aplicar_migracoes
+from persistencia import criar_persistencia
+from webhook import webhook_configurado, executar_webhook
+from assinaturas import adicionar_assinaturas_async, montar_notificacoes_lote
+import estatisticas  # noqa: F401 - só registra as rotas de estatísticas
+from ajuda import menu_ajuda, comando_ajuda
 from admin import (
     menu_admin, 
-    handle_admin_callback, 
     processar_id_dpc,
     menu_usuarios,
     menu_relatorios,
@@ -69,20 +62,19 @@ load_dotenv()
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 ADMIN_ID = 1697670772
 
+def _status_usuario(user_id: int, usuario) -> bool:
+    is_active = usuario['ativo'] if usuario else False
+    nivel = usuario['nivel'] if usuario else None
+    print(f"Verificação de usuário - ID: {user_id}, Ativo: {is_active}, Nível: {nivel}")
+    return is_active
+
 def verificar_usuario_ativo(user_id: int) -> bool:
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('SELECT ativo, nivel FROM usuarios WHERE user_id = %s', (user_id,))
-        result = cursor.fetchone()
-        is_active = result[0] if result else False
-        nivel = result[1] if result else None
-        print(f"Verificação de usuário - ID: {user_id}, Ativo: {is_active}, Nível: {nivel}")
-        return is_active
-    finally:
-        cursor.close()
-        conn.close()
+    return _status_usuario(user_id, obter_usuario(user_id))
+
+async def verificar_usuario_ativo_async(user_id: int) -> bool:
+    return _status_usuario(user_id, await obter_usuario_async(user_id))
 
+@rota('menu_principal')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     user_name = update.effective_user.first_name
@@ -91,16 +83,16 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     print(f"Start command - User ID: {user_id}, Name: {user_name}, Username: {username}")
     
     if user_id != ADMIN_ID:
-        registrar_novo_usuario(
+        await registrar_novo_usuario_async(
             user_id=user_id,
             nome=user_name,
             username=username
         )
     
-    registrar_acesso(user_id, 'login')
+    await registrar_acesso_async(user_id, 'login')
     
     if user_id != ADMIN_ID:
-        is_active = verificar_usuario_ativo(user_id)
+        is_active = await verificar_usuario_ativo_async(user_id)
         print(f"Status do usuário {user_id}: {'Ativo' if is_active else 'Inativo'}")
         
         if not is_active:
@@ -125,7 +117,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text('👋 Bem-vindo ao Dcyber Bot! Escolha uma opção:', reply_markup=reply_markup)
     elif hasattr(update, 'callback_query') and update.callback_query:
         await update.callback_query.edit_message_text('👋 Bem-vindo ao Dcyber Bot! Escolha uma opção:', reply_markup=reply_markup)
-        await update.callback_query.answer()
 
 @user_approved
 async def assinaturas_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -195,58 +186,41 @@ async def texto_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         user_id = update.message.from_user.id
         username = update.message.from_user.first_name or update.message.from_user.username
 
-        num_documentos_adicionados = 0
-        documentos_adicionados = []
-
-        for documento in documentos:
-            documento = documento.strip()
-            if documento:
-                try:
-                    seq = adicionar_assinatura(user_id, username, documento)
-                    if seq:
-                        documentos_adicionados.append((documento, seq))
-                        num_documentos_adicionados += 1
-                except Exception as e:
-                    print(f"Erro ao processar documento: {e}")
-                    await update.message.reply_text(f"❌ Erro ao processar documento: {str(e)}")
-                    continue
+        # Todas as linhas são gravadas em uma única inserção
+        documentos_adicionados = await adicionar_assinaturas_async(user_id, username, documentos)
+        num_documentos_adicionados = len(documentos_adicionados)
 
         if num_documentos_adicionados > 0:
             await update.message.reply_text(
                 f"✅ {num_documentos_adicionados} documento(s) cadastrado(s) para assinatura. O DPC será notificado."
             )
 
-            dpc_id = obter_id_dpc()
+            dpc_id = await obter_id_dpc_async()
             print(f"DPC ID obtido: {dpc_id}")
             
             if dpc_id:
-                for documento, seq in documentos_adicionados:
-                    try:
-                        mensagem_dpc = (
-                            f"📄 Nova solicitação #{seq}\n"
-                            f"👤 Solicitante: {username}\n"
-                            f"📝 Documento: {documento}"
-                        )
-                        reply_markup = await create_admin_notification_markup(seq)
-                        
-                        print(f"Tentando enviar notificação para DPC ID {dpc_id}")
-                        await context.bot.send_message(
-                            chat_id=dpc_id,
-                            text=mensagem_dpc,
-                            reply_markup=reply_markup
-                        )
-                        print("Notificação enviada com sucesso")
-                        
-                    except Exception as e:
-                        print(f"Erro detalhado ao enviar notificação para DPC: {str(e)}")
-                        try:
-                            await context.bot.send_message(
-                                chat_id=ADMIN_ID,
-                                text=f"⚠️ Erro ao notificar DPC. Por favor, verifique:\n{mensagem_dpc}\nErro: {str(e)}",
-                                reply_markup=reply_markup
-                            )
-                        except Exception as admin_error:
-                            print(f"Erro ao enviar fallback para admin: {str(admin_error)}")
+                # Uma notificação consolidada (dividida só se for muito grande)
+                envios = montar_notificacoes_lote(dpc_id, username, documentos_adicionados)
+                
+                print(f"Enviando {len(envios)} notificação(ões) para DPC ID {dpc_id}")
+                tarefa = despachante.enviar(context.bot, envios)
+                
+                async def repassar_falhas():
+                    await tarefa.aguardar()
+                    # Notificações que falharam são repassadas ao admin
+                    falhas = [
+                        {
+                            'chat_id': ADMIN_ID,
+                            'text': f"⚠️ Erro ao notificar DPC. Por favor, verifique:\n{envio['text']}\nErro: {resultado}",
+                            'reply_markup': envio['reply_markup']
+                        }
+                        for envio, resultado in zip(tarefa.envios, tarefa.resultados)
+                        if isinstance(resultado, Exception)
+                    ]
+                    if falhas:
+                        despachante.enviar(context.bot, falhas)
+                
+                context.application.create_task(repassar_falhas(), update=update)
             else:
                 print("Nenhum DPC definido no sistema")
                 await context.bot.send_message(
@@ -258,75 +232,6 @@ async def texto_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         
         context.user_data['esperando_documento'] = False
 
-@user_approved
-async def button_handler_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    print(f"button_handler_main recebeu callback: {query.data}")
-    
-    # Processar callbacks administrativos e de gestão de usuários
-    admin_patterns = (
-        'admin_', 
-        'gerenciar_usuario_', 
-        'set_nivel_', 
-        'set_status_', 
-        'enviar_msg_',
-        'menu_admin', 
-        'relatorio_', 
-        'definir_dpc'
-    )
-    
-    if query.data.startswith(admin_patterns):
-        print(f"Encaminhando para handle_admin_callback: {query.data}")
-        await handle_admin_callback(update, context)
-        return
-    
-    await query.answer()
-    
-    if query.data == 'ajuda' or query.data.startswith('ajuda_'):
-        await handle_ajuda_callback(update, context)
-    
-    elif query.data == 'lembretes':
-        await menu_lembretes(update, context)
-    
-    elif query.data.startswith('lembrete_'):
-        await handle_lembretes_callback(update, context)
-    
-    elif query.data == 'casos' or query.data.startswith('caso_'):
-        await handle_casos_callback(update, context)
-    
-    elif query.data == 'contatos':
-        await menu_contatos(update, context)
-    
-    elif query.data.startswith('contato_'):
-        await handle_contatos_callback(update, context)
-    
-    elif query.data == 'estatisticas':
-        await menu_estatisticas(update, context)
-    
-    elif query.data == 'stats_gerais':
-        await mostrar_estatisticas_gerais(update, context)
-    
-    elif query.data == 'stats_pessoais':
-        await mostrar_estatisticas_pessoais(update, context)
-    
-    elif query.data == 'menu_principal':
-        await start(update, context)
-    
-    elif query.data == 'assinaturas':
-        keyboard = [
-            [InlineKeyboardButton("✍️ Solicitar Assinatura", callback_data='solicitar_assinatura')],
-            [InlineKeyboardButton("🔍 Consultar Assinatura", callback_data='consultar_assinatura')],
-            [InlineKeyboardButton("🔙 Menu Principal", callback_data='menu_principal')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.edit_text("📑 Menu de Assinaturas", reply_markup=reply_markup)
-    
-    elif query.data in ['solicitar_assinatura', 'consultar_assinatura']:
-        await button_handler(update, context)
-    
-    else:
-        await button_handler(update, context)
-
 @user_approved
 async def handle_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE):
     print(f"Recebida mensagem: {update.message.text}")
@@ -386,65 +291,37 @@ async def handle_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE):
         print("Processando envio de mensagem")
         await processar_mensagem(update, context)
 
+async def iniciar_servicos(application: Application):
+    """Executado após a inicialização do Application"""
+    # O agendador de lembretes roda só no worker eleito líder
+    await lideranca.iniciar(application.bot)
+
+async def parar_servicos(application: Application):
+    """Executado quando o Application é parado"""
+    await lideranca.parar()
+    await despachante.parar()
+    await exportacao.encerrar()
+
 def main():
     print("🚀 Iniciando o bot...")
     
-    # Configurar timezone no PostgreSQL
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
-
-    # Criar todas as tabelas necessárias
-    criar_tabela_usuarios(ADMIN_ID)
-    atualizar_nome_admin(ADMIN_ID)
-    criar_tabela()
-    criar_tabela_lembretes()
-    criar_tabela_acessos()
-    criar_todas_tabelas()
-    criar_tabela_estatisticas()
-    criar_tabela_contatos()
-    criar_tabela_casos() 
+    # Cria/atualiza o esquema (uma consulta quando já está na versão atual)
+    aplicar_migracoes(ADMIN_ID)
     
-    # Criar tabelas específicas
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Tabela de acessos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_acessos (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tipo_acesso TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        
-        # Tabela de ações
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS acoes_usuarios (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                tipo_acao TEXT NOT NULL,
-                data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
-            )
-        ''')
-        
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
-    
-    application = Application.builder().token(TOKEN).build()
-    
-    job_queue = application.job_queue
-    job_queue.run_repeating(verificar_lembretes, interval=60)
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        # Uma conexão HTTP por worker do despachante, mais folga para os handlers
+        .connection_pool_size(DESPACHO_CONCORRENCIA + 4)
+        .pool_timeout(10)
+        .post_init(iniciar_servicos)
+        .post_stop(parar_servicos)
+    )
+    # Fluxos em andamento (user_data) sobrevivem a reinícios; gravados em lote
+    persistencia = criar_persistencia()
+    if persistencia is not None:
+        builder = builder.persistence(persistencia)
+    application = builder.build()
 
     # Comandos básicos
     application.add_handler(CommandHandler('start', start))
@@ -453,7 +330,7 @@ def main():
     application.add_handler(CommandHandler('admin07', menu_admin))
     
     # Handlers principais
-    application.add_handler(CallbackQueryHandler(button_handler_main))
+    application.add_handler(CallbackQueryHandler(roteador.despachar))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_mensagem))
     
     # Comandos de atalho
@@ -464,7 +341,16 @@ def main():
     application.add_handler(CommandHandler('stats', stats_command))
     application.add_handler(CommandHandler('cancel', cancelar_operacao))
 
-    application.run_polling()
+    try:
+        # Webhook quando configurado (MODO_BOT=webhook); polling continua como padrão
+        if webhook_configurado():
+            executar_webhook(application)
+        else:
+            application.run_polling()
+    finally:
+        # Grava a telemetria pendente e fecha as conexões do pool compartilhado
+        telemetria.parar()
+        db.fechar()
 
 if __name__ == '__main__':
     main()
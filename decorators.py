@@ -1,44 +1,72 @@
+from contextvars import ContextVar
 from functools import wraps
 from telegram import Update
 from telegram.constants import ParseMode
-from auth import is_admin, is_user_active
-
-def admin_required(func):
-    @wraps(func)
-    async def wrapper(update: Update, context, *args, **kwargs):
-        user_id = update.effective_user.id
-        if is_admin(user_id):
-            return await func(update, context, *args, **kwargs)
-        else:
-            if update.callback_query:
-                await update.callback_query.answer("❌ Acesso negado")
-            else:
-                await update.message.reply_text(
-                    "❌ Apenas administradores podem usar este comando.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            return None
-    return wrapper
-
-def user_approved(func):
-    @wraps(func)
-    async def wrapper(update: Update, context, *args, **kwargs):
-        user_id = update.effective_user.id
-        if is_admin(user_id) or is_user_active(user_id):
-            return await func(update, context, *args, **kwargs)
+from cache_usuarios import obter_usuario_async
+
+# Níveis de acesso exigidos pelos handlers
+PUBLICO = 'publico'
+APROVADO = 'aprovado'
+ADMIN = 'admin'
+
+# (update, usuário) já verificados no update em andamento; handlers aninhados reaproveitam
+usuario_atual = ContextVar('usuario_atual', default=None)
+
+def tem_acesso(usuario, acesso: str) -> bool:
+    """Verifica se o registro do usuário atende ao nível exigido"""
+    if acesso == PUBLICO:
+        return True
+    if not usuario:
+        return False
+    if usuario['nivel'] == 'admin':
+        return True
+    return acesso == APROVADO and bool(usuario['ativo'])
+
+async def negar_acesso(update: Update, acesso: str):
+    """Responde ao usuário sem permissão para a ação"""
+    if acesso == ADMIN:
+        if update.callback_query:
+            await update.callback_query.answer("❌ Acesso negado")
         else:
-            if update.callback_query:
-                await update.callback_query.answer("❌ Acesso pendente")
-                await update.callback_query.message.reply_text(
-                    "⚠️ Seu acesso ainda está pendente de aprovação.\n"
-                    "Por favor, aguarde a aprovação do administrador.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            else:
-                await update.message.reply_text(
-                    "⚠️ Seu acesso ainda está pendente de aprovação.\n"
-                    "Por favor, aguarde a aprovação do administrador.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
+            await update.message.reply_text(
+                "❌ Apenas administradores podem usar este comando.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+        return
+
+    texto = ("⚠️ Seu acesso ainda está pendente de aprovação.\n"
+             "Por favor, aguarde a aprovação do administrador.")
+    if update.callback_query:
+        await update.callback_query.answer("❌ Acesso pendente")
+        await update.callback_query.message.reply_text(texto, parse_mode=ParseMode.MARKDOWN)
+    else:
+        await update.message.reply_text(texto, parse_mode=ParseMode.MARKDOWN)
+
+async def executar_com_acesso(acesso: str, func, update: Update, context, *args, **kwargs):
+    """Executa func se o usuário tiver o acesso exigido; o usuário é carregado uma vez por update"""
+    atual = usuario_atual.get()
+    token = None
+    if atual is not None and atual[0] is update:
+        usuario = atual[1]
+    else:
+        usuario = await obter_usuario_async(update.effective_user.id)
+        token = usuario_atual.set((update, usuario))
+    try:
+        if not tem_acesso(usuario, acesso):
+            await negar_acesso(update, acesso)
             return None
-    return wrapper
+        return await func(update, context, *args, **kwargs)
+    finally:
+        if token is not None:
+            usuario_atual.reset(token)
+
+def _exigir(acesso: str):
+    def decorador(func):
+        @wraps(func)
+        async def wrapper(update: Update, context, *args, **kwargs):
+            return await executar_com_acesso(acesso, func, update, context, *args, **kwargs)
+        return wrapper
+    return decorador
+
+admin_required = _exigir(ADMIN)
+user_approved = _exigir(APROVADO)
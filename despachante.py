@@ -0,0 +1,206 @@
+# despachante.py
+import asyncio
+import os
+import time
+from collections import deque
+from cachetools import TTLCache
+from telegram.error import RetryAfter, TimedOut, NetworkError, BadRequest, Forbidden
+
+# Limites do Telegram: ~30 mensagens/s no total e ~1 mensagem/s por chat
+DESPACHO_CONCORRENCIA = int(os.getenv('DESPACHO_CONCORRENCIA', '8'))
+DESPACHO_TAXA_GLOBAL = float(os.getenv('DESPACHO_TAXA_GLOBAL', '25'))
+DESPACHO_RAJADA_GLOBAL = float(os.getenv('DESPACHO_RAJADA_GLOBAL', '25'))
+DESPACHO_TAXA_CHAT = float(os.getenv('DESPACHO_TAXA_CHAT', '1'))
+DESPACHO_RAJADA_CHAT = float(os.getenv('DESPACHO_RAJADA_CHAT', '3'))
+DESPACHO_TENTATIVAS = int(os.getenv('DESPACHO_TENTATIVAS', '3'))
+# Intervalo mínimo entre chamadas do callback de progresso
+DESPACHO_INTERVALO_PROGRESSO = float(os.getenv('DESPACHO_INTERVALO_PROGRESSO', '2'))
+
+
+class BaldeTokens:
+    """Token bucket: `taxa` tokens por segundo, acumulando até `capacidade`"""
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = capacidade
+        self._atualizado = time.monotonic()
+        self._bloqueado_ate = 0.0
+
+    def _repor(self, agora):
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def bloquear(self, segundos: float):
+        """Suspende o balde (usado quando o Telegram responde RetryAfter)"""
+        agora = time.monotonic()
+        self._bloqueado_ate = max(self._bloqueado_ate, agora + segundos)
+        self._tokens = 0
+        self._atualizado = max(self._atualizado, self._bloqueado_ate)
+
+    async def adquirir(self):
+        while True:
+            agora = time.monotonic()
+            if agora < self._bloqueado_ate:
+                await asyncio.sleep(self._bloqueado_ate - agora)
+                continue
+            self._repor(agora)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+class Tarefa:
+    """Lote de mensagens despachadas; acompanha o progresso do envio"""
+
+    def __init__(self, bot, envios, ao_progresso=None):
+        self.bot = bot
+        self.envios = envios
+        self.total = len(envios)
+        self.enviados = 0
+        self.falhas = 0
+        # resultados[i] é a Message enviada ou a exceção final do envio i
+        self.resultados = [None] * self.total
+        self.ao_progresso = ao_progresso
+        self._ultimo_progresso = 0.0
+        self._concluida = asyncio.get_running_loop().create_future()
+        if self.total == 0:
+            self._concluida.set_result(self)
+
+    @property
+    def concluida(self) -> bool:
+        return self._concluida.done()
+
+    async def aguardar(self):
+        """Aguarda o fim do envio de todas as mensagens do lote"""
+        return await asyncio.shield(self._concluida)
+
+    async def _registrar(self, indice, resultado, sucesso):
+        self.resultados[indice] = resultado
+        if sucesso:
+            self.enviados += 1
+        else:
+            self.falhas += 1
+        fim = self.enviados + self.falhas == self.total
+        agora = time.monotonic()
+        if self.ao_progresso and (fim or agora - self._ultimo_progresso >= DESPACHO_INTERVALO_PROGRESSO):
+            self._ultimo_progresso = agora
+            try:
+                await self.ao_progresso(self)
+            except Exception as e:
+                print(f"Erro no callback de progresso: {e}")
+        if fim and not self._concluida.done():
+            self._concluida.set_result(self)
+
+
+class Despachante:
+    """Fila de saída com workers limitados e controle de taxa global e por chat"""
+
+    def __init__(self, concorrencia=DESPACHO_CONCORRENCIA):
+        self.concorrencia = concorrencia
+        self._pendentes = {}
+        self._prontos = None
+        self._workers = []
+        self._global = BaldeTokens(DESPACHO_TAXA_GLOBAL, DESPACHO_RAJADA_GLOBAL)
+        # Baldes por chat expiram quando o chat fica sem envios
+        self._baldes_chat = TTLCache(maxsize=10000, ttl=60)
+
+    def iniciar(self):
+        if self._workers:
+            return
+        self._prontos = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f'despacho-{i}')
+            for i in range(self.concorrencia)
+        ]
+
+    async def parar(self, timeout: float = 30):
+        """Aguarda a fila esvaziar (até `timeout`) e encerra os workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._prontos.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Despachante encerrado com {self.pendentes()} mensagem(ns) pendente(s)")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def pendentes(self) -> int:
+        return sum(len(fila) for fila in self._pendentes.values())
+
+    def enviar(self, bot, envios, ao_progresso=None) -> Tarefa:
+        """Enfileira mensagens; cada envio é um dict de argumentos de send_message"""
+        self.iniciar()
+        tarefa = Tarefa(bot, list(envios), ao_progresso)
+        for indice, envio in enumerate(tarefa.envios):
+            chat_id = envio['chat_id']
+            fila = self._pendentes.get(chat_id)
+            if fila is None:
+                # Um chat fica na fila de prontos uma única vez, preservando a ordem
+                fila = self._pendentes[chat_id] = deque()
+                self._prontos.put_nowait(chat_id)
+            fila.append((tarefa, indice))
+        return tarefa
+
+    def _balde_chat(self, chat_id):
+        balde = self._baldes_chat.get(chat_id)
+        if balde is None:
+            balde = BaldeTokens(DESPACHO_TAXA_CHAT, DESPACHO_RAJADA_CHAT)
+        self._baldes_chat[chat_id] = balde
+        return balde
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._prontos.get()
+            try:
+                fila = self._pendentes[chat_id]
+                tarefa, indice = fila.popleft()
+                await self._enviar(tarefa, indice, chat_id)
+                if fila:
+                    # Volta ao fim da fila para alternar entre chats
+                    self._prontos.put_nowait(chat_id)
+                else:
+                    del self._pendentes[chat_id]
+            finally:
+                self._prontos.task_done()
+
+    async def _enviar(self, tarefa, indice, chat_id):
+        envio = tarefa.envios[indice]
+        balde = self._balde_chat(chat_id)
+        tentativa = 0
+        while True:
+            await balde.adquirir()
+            await self._global.adquirir()
+            try:
+                mensagem = await tarefa.bot.send_message(**envio)
+            except RetryAfter as e:
+                # Limite de flood: suspende todos os envios pelo tempo indicado
+                print(f"Telegram pediu espera de {e.retry_after}s (chat {chat_id})")
+                self._global.bloquear(e.retry_after)
+                balde.bloquear(e.retry_after)
+                continue
+            except (BadRequest, Forbidden) as e:
+                print(f"Erro ao enviar mensagem para {chat_id}: {e}")
+                await tarefa._registrar(indice, e, False)
+                return
+            except (TimedOut, NetworkError) as e:
+                tentativa += 1
+                if tentativa >= DESPACHO_TENTATIVAS:
+                    print(f"Erro ao enviar mensagem para {chat_id}: {e}")
+                    await tarefa._registrar(indice, e, False)
+                    return
+                await asyncio.sleep(2 ** tentativa)
+                continue
+            except Exception as e:
+                print(f"Erro ao enviar mensagem para {chat_id}: {e}")
+                await tarefa._registrar(indice, e, False)
+                return
+            await tarefa._registrar(indice, mensagem, True)
+            return
+
+
+# Instância global
+despachante = Despachante()
@@ -0,0 +1,304 @@
+# entregador_lembretes.py
+"""Caixa de saída dos lembretes: envio em lotes com retentativa.
+
+A entrega é "pelo menos uma vez". Uma reivindicação sem confirmação após
+ENTREGA_PRAZO_REIVINDICACAO volta a valer. Se o worker cair depois do
+send_message e antes da confirmação do lote, o aviso é enviado de novo.
+"""
+import asyncio
+import os
+import pytz
+from datetime import datetime
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden
+from telegram.helpers import escape_markdown
+from database_manager import db, assincrono
+from despachante import despachante
+
+# Caixa de saída (lembrete_entregas): pendente -> reivindicada -> enviada | morta
+ENTREGA_LOTE = int(os.getenv('ENTREGA_LOTE', '200'))
+ENTREGA_MAX_TENTATIVAS = int(os.getenv('ENTREGA_MAX_TENTATIVAS', '6'))
+# Espera exponencial entre tentativas: base * 2^(tentativas-1), limitada ao teto
+ENTREGA_ESPERA_BASE = int(os.getenv('ENTREGA_ESPERA_BASE', '30'))
+ENTREGA_ESPERA_TETO = int(os.getenv('ENTREGA_ESPERA_TETO', '3600'))
+# Reivindicação sem confirmação após este prazo (worker caiu no meio) volta a valer
+ENTREGA_PRAZO_REIVINDICACAO = int(os.getenv('ENTREGA_PRAZO_REIVINDICACAO', '300'))
+# Espera máxima do loop quando não há entregas agendadas
+ENTREGA_ESPERA_OCIOSA = 300
+TIMEZONE = pytz.timezone('America/Sao_Paulo')
+
+def montar_texto_lembrete(titulo: str, agendado_para: datetime) -> str:
+    """Texto do aviso; entregas atrasadas (retentativas) mostram a data completa"""
+    if agendado_para.tzinfo is not None:
+        agendado_para = agendado_para.astimezone(TIMEZONE)
+    if agendado_para.date() == datetime.now(TIMEZONE).date():
+        quando = f"hoje às {agendado_para:%H:%M}"
+    else:
+        quando = f"{agendado_para:%d/%m/%Y às %H:%M}"
+    return (f"🔔 *Lembrete!*\n\n"
+            f"📝 {escape_markdown(titulo, version=1)}\n"
+            f"⏰ Agendado para {quando}")
+
+def enfileirar_entregas(lembrete_id: int, ocorrencia: datetime = None) -> int:
+    """Move os destinatários pendentes do lembrete para a caixa de saída.
+
+    notificado=TRUE passa a significar "entregue à caixa de saída"; a troca e a
+    inserção acontecem no mesmo comando, então nenhum destinatário se perde.
+    Para uma ocorrência de série todos os destinatários são enfileirados e a
+    série registra a última ocorrência (o flag notificado não é usado).
+    """
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        if ocorrencia is not None:
+            # O UPDATE condicional torna a ocorrência idempotente entre workers
+            cursor.execute('''
+                WITH serie AS (
+                    UPDATE lembretes
+                    SET ultima_ocorrencia = %(ocorrencia)s
+                    WHERE id = %(id)s
+                    AND ativo = TRUE
+                    AND (ultima_ocorrencia IS NULL OR ultima_ocorrencia < %(ocorrencia)s)
+                    RETURNING id
+                )
+                INSERT INTO lembrete_entregas (lembrete_id, user_id, agendado_para)
+                SELECT ld.lembrete_id, ld.user_id, %(ocorrencia)s
+                FROM lembrete_destinatarios ld
+                JOIN serie ON serie.id = ld.lembrete_id
+                ON CONFLICT (lembrete_id, user_id, agendado_para) DO NOTHING
+            ''', {'id': lembrete_id, 'ocorrencia': ocorrencia})
+            total = cursor.rowcount
+            conn.commit()
+            return total
+        cursor.execute('''
+            WITH reivindicados AS (
+                UPDATE lembrete_destinatarios ld
+                SET notificado = TRUE
+                WHERE ld.id IN (
+                    SELECT p.id
+                    FROM lembrete_destinatarios p
+                    JOIN lembretes pl ON pl.id = p.lembrete_id
+                    WHERE p.lembrete_id = %s
+                    AND pl.ativo = TRUE
+                    AND p.notificado = FALSE
+                    FOR UPDATE OF p SKIP LOCKED
+                )
+                RETURNING ld.lembrete_id, ld.user_id
+            )
+            INSERT INTO lembrete_entregas (lembrete_id, user_id, agendado_para)
+            SELECT r.lembrete_id, r.user_id, l.data + l.hora
+            FROM reivindicados r
+            JOIN lembretes l ON l.id = r.lembrete_id
+            ON CONFLICT (lembrete_id, user_id, agendado_para) DO NOTHING
+        ''', (lembrete_id,))
+        total = cursor.rowcount
+        conn.commit()
+        return total
+    finally:
+        cursor.close()
+        conn.close()
+
+def reivindicar_entregas(limite: int = ENTREGA_LOTE):
+    """Reivindica um lote de entregas vencidas (SKIP LOCKED entre workers)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        # Sem confirmação após o máximo de tentativas: não reenviar indefinidamente
+        cursor.execute('''
+            UPDATE lembrete_entregas
+            SET estado = 'morta', ultimo_erro = 'Envio sem confirmação'
+            WHERE estado = 'reivindicada'
+            AND reivindicada_em < CURRENT_TIMESTAMP - %(prazo)s * INTERVAL '1 second'
+            AND tentativas >= %(maximo)s
+        ''', {'prazo': ENTREGA_PRAZO_REIVINDICACAO, 'maximo': ENTREGA_MAX_TENTATIVAS})
+        cursor.execute('''
+            WITH lote AS (
+                SELECT id
+                FROM lembrete_entregas
+                WHERE (estado = 'pendente' AND proxima_tentativa <= CURRENT_TIMESTAMP)
+                OR (estado = 'reivindicada'
+                    AND reivindicada_em < CURRENT_TIMESTAMP - %(prazo)s * INTERVAL '1 second')
+                ORDER BY proxima_tentativa
+                LIMIT %(limite)s
+                FOR UPDATE SKIP LOCKED
+            ), reivindicadas AS (
+                UPDATE lembrete_entregas e
+                SET estado = 'reivindicada',
+                    tentativas = e.tentativas + 1,
+                    reivindicada_em = CURRENT_TIMESTAMP
+                FROM lote
+                WHERE e.id = lote.id
+                RETURNING e.id, e.lembrete_id, e.user_id, e.agendado_para
+            )
+            SELECT r.id, r.user_id, r.agendado_para, l.titulo, l.ativo
+            FROM reivindicadas r
+            JOIN lembretes l ON l.id = r.lembrete_id
+        ''', {'prazo': ENTREGA_PRAZO_REIVINDICACAO, 'limite': limite})
+        result = cursor.fetchall()
+        conn.commit()
+        return result
+    finally:
+        cursor.close()
+        conn.close()
+
+def confirmar_entregas(resultados: list):
+    """Registra o resultado do lote em um único UPDATE.
+
+    resultados: tuplas (id, enviada, definitiva, erro). Falhas voltam para
+    'pendente' com espera exponencial ou viram 'morta' (definitiva/limite).
+    """
+    if not resultados:
+        return
+    ids, enviadas, definitivas, erros = (list(coluna) for coluna in zip(*resultados))
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            UPDATE lembrete_entregas e
+            SET estado = CASE
+                    WHEN r.enviada THEN 'enviada'
+                    WHEN r.definitiva OR e.tentativas >= %(maximo)s THEN 'morta'
+                    ELSE 'pendente'
+                END,
+                enviada_em = CASE WHEN r.enviada THEN CURRENT_TIMESTAMP END,
+                proxima_tentativa = CASE
+                    WHEN r.enviada THEN e.proxima_tentativa
+                    ELSE CURRENT_TIMESTAMP + LEAST(
+                        %(base)s * power(2, e.tentativas - 1), %(teto)s
+                    ) * INTERVAL '1 second'
+                END,
+                ultimo_erro = r.erro
+            FROM unnest(
+                %(ids)s::bigint[], %(enviadas)s::boolean[],
+                %(definitivas)s::boolean[], %(erros)s::text[]
+            ) AS r(id, enviada, definitiva, erro)
+            WHERE e.id = r.id AND e.estado = 'reivindicada'
+        ''', {
+            'ids': ids,
+            'enviadas': enviadas,
+            'definitivas': definitivas,
+            'erros': erros,
+            'maximo': ENTREGA_MAX_TENTATIVAS,
+            'base': ENTREGA_ESPERA_BASE,
+            'teto': ENTREGA_ESPERA_TETO
+        })
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+def proxima_entrega():
+    """Momento da próxima entrega pendente (None se a caixa está vazia)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT MIN(proxima_tentativa), CURRENT_TIMESTAMP::timestamp
+            FROM lembrete_entregas
+            WHERE estado = 'pendente'
+        ''')
+        proxima, agora = cursor.fetchone()
+        return None if proxima is None else (proxima - agora).total_seconds()
+    finally:
+        cursor.close()
+        conn.close()
+
+enfileirar_entregas_async = assincrono(enfileirar_entregas)
+reivindicar_entregas_async = assincrono(reivindicar_entregas)
+confirmar_entregas_async = assincrono(confirmar_entregas)
+proxima_entrega_async = assincrono(proxima_entrega)
+
+
+class EntregadorLembretes:
+    """Processa a caixa de saída em lotes: reivindica, envia e confirma"""
+
+    def __init__(self):
+        self._bot = None
+        self._acordar = None
+        self._tarefa = None
+        self._parando = False
+
+    async def iniciar(self, bot):
+        self._bot = bot
+        self._acordar = asyncio.Event()
+        self._parando = False
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self, timeout: float = 30):
+        """Termina o lote em andamento (enviar e confirmar) antes de encerrar"""
+        if self._tarefa is None:
+            return
+        self._parando = True
+        self._acordar.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._tarefa), timeout)
+        except asyncio.TimeoutError:
+            print("Caixa de saída encerrada com lote sem confirmação")
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+
+    def acordar(self):
+        """Processa a caixa de saída agora (novas entregas enfileiradas)"""
+        if self._acordar is not None:
+            self._acordar.set()
+
+    async def _executar(self):
+        while not self._parando:
+            self._acordar.clear()
+            try:
+                # Lotes cheios indicam que ainda há entregas vencidas
+                while await self._processar_lote() >= ENTREGA_LOTE and not self._parando:
+                    pass
+                espera = await proxima_entrega_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro no processamento da caixa de saída: {e}")
+                espera = ENTREGA_ESPERA_BASE
+            if espera is None:
+                espera = ENTREGA_ESPERA_OCIOSA
+            # Reivindicações abandonadas são retomadas mesmo sem pendentes
+            espera = min(max(espera, 0.1), ENTREGA_PRAZO_REIVINDICACAO, ENTREGA_ESPERA_OCIOSA)
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _processar_lote(self) -> int:
+        entregas = await reivindicar_entregas_async()
+        if not entregas:
+            return 0
+
+        resultados = [
+            (entrega_id, False, True, 'Lembrete apagado')
+            for entrega_id, _, _, _, ativo in entregas if not ativo
+        ]
+        envios = [entrega for entrega in entregas if entrega[4]]
+        tarefa = despachante.enviar(self._bot, [
+            {
+                'chat_id': user_id,
+                'text': montar_texto_lembrete(titulo, agendado_para),
+                'parse_mode': ParseMode.MARKDOWN
+            }
+            for _, user_id, agendado_para, titulo, _ in envios
+        ])
+        await tarefa.aguardar()
+
+        for (entrega_id, _, _, _, _), resultado in zip(envios, tarefa.resultados):
+            if isinstance(resultado, Exception):
+                # Usuário bloqueou o bot ou chat inválido: não adianta repetir
+                definitiva = isinstance(resultado, (Forbidden, BadRequest))
+                resultados.append((entrega_id, False, definitiva, str(resultado)))
+            else:
+                resultados.append((entrega_id, True, False, None))
+        # Todas as confirmações do lote em uma única ida ao banco
+        await confirmar_entregas_async(resultados)
+        falhas = sum(1 for _, enviada, _, _ in resultados if not enviada)
+        if falhas:
+            print(f"Caixa de saída: {len(resultados) - falhas} enviada(s), {falhas} falha(s)")
+        return len(entregas)
+
+
+# Instância global
+entregador = EntregadorLembretes()
@@ -1,15 +1,18 @@
 import pytz
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # Configuração global do timezone
 TIMEZONE = pytz.timezone('America/Sao_Paulo')
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from database_estatisticas import get_db_connection, criar_tabela_estatisticas
+from database_estatisticas import get_db_connection
+from database_manager import assincrono
+from cache_estatisticas import obter_perfil, obter_perfil_async
 from decorators import user_approved, admin_required
-from datetime import datetime, timedelta
+from roteador import rota
 
+@rota('estatisticas')
 @user_approved
 async def menu_estatisticas(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
@@ -26,123 +29,58 @@ async def menu_estatisticas(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
 
+def _estatisticas_gerais_vazias():
+    return {
+        'usuarios': 0,
+        'documentos': 0,
+        'lembretes': 0,
+        'contatos': 0,
+        'casos': 0,
+        'usuarios_ativos_hoje': 0,
+        'documentos_pendentes': 0,
+        'casos_ativos': 0
+    }
+
 def get_estatisticas_gerais():
-    """Obtém estatísticas gerais do sistema"""
-    try:
-        criar_tabela_estatisticas()
-    except Exception as e:
-        print(f"Erro ao criar tabela de estatísticas: {e}")
-        
+    """Obtém estatísticas gerais do sistema em uma única consulta"""
+    stats = _estatisticas_gerais_vazias()
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        stats = {
-            'usuarios': 0,
-            'documentos': 0,
-            'lembretes': 0,
-            'contatos': 0,
-            'casos': 0,
-            'usuarios_ativos_hoje': 0,
-            'documentos_pendentes': 0,
-            'casos_ativos': 0
-        }
-        
-        # Estatísticas básicas dos contadores
-        try:
-            cursor.execute('SELECT tipo, total FROM contadores_permanentes')
-            for tipo, total in cursor.fetchall():
-                stats[tipo] = total
-        except Exception as e:
-            print(f"Erro ao obter contadores: {e}")
-        
-        # Usuários ativos hoje
-        hoje = datetime.now().strftime('%Y-%m-%d')
-        try:
-            cursor.execute('''
-                SELECT COUNT(DISTINCT user_id) 
-                FROM user_acessos 
-                WHERE DATE(data_acesso) = %s
-            ''', (hoje,))
-            result = cursor.fetchone()
-            stats['usuarios_ativos_hoje'] = result[0] if result else 0
-        except Exception as e:
-            print(f"Erro ao obter usuários ativos: {e}")
-        
-        # Documentos pendentes
-        try:
-            cursor.execute('SELECT COUNT(*) FROM assinaturas WHERE ativo = TRUE')
-            result = cursor.fetchone()
-            stats['documentos_pendentes'] = result[0] if result else 0
-        except Exception as e:
-            print(f"Erro ao obter documentos pendentes: {e}")
-        
-        # Casos ativos
-        try:
-            cursor.execute('SELECT COUNT(*) FROM casos WHERE ativo = TRUE')
-            result = cursor.fetchone()
-            stats['casos_ativos'] = result[0] if result else 0
-        except Exception as e:
-            print(f"Erro ao obter casos ativos: {e}")
-        
+        # Contadores e atividade do dia vêm dos agregados gravados pela telemetria
+        cursor.execute('''
+            SELECT
+                (SELECT json_object_agg(tipo, total) FROM contadores_permanentes),
+                (SELECT COUNT(*) FROM atividade_diaria
+                 WHERE dia = CURRENT_DATE AND tipo = 'acesso'),
+                (SELECT COUNT(*) FROM assinaturas WHERE ativo = TRUE),
+                (SELECT COUNT(*) FROM casos WHERE ativo = TRUE)
+        ''')
+        contadores, ativos_hoje, pendentes, casos_ativos = cursor.fetchone()
+        stats.update(contadores or {})
+        stats['usuarios_ativos_hoje'] = ativos_hoje
+        stats['documentos_pendentes'] = pendentes
+        stats['casos_ativos'] = casos_ativos
         return stats
     except Exception as e:
         print(f"Erro geral em get_estatisticas_gerais: {e}")
-        return {
-            'usuarios': 0,
-            'documentos': 0,
-            'lembretes': 0,
-            'contatos': 0,
-            'casos': 0,
-            'usuarios_ativos_hoje': 0,
-            'documentos_pendentes': 0,
-            'casos_ativos': 0
-        }
+        return _estatisticas_gerais_vazias()
     finally:
         cursor.close()
         conn.close()
 
 def get_estatisticas_pessoais(user_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        stats = {}
-        
-        # Ações do usuário
-        for acao in ['novo_documento', 'novo_lembrete', 'novo_contato', 'novo_caso']:
-            cursor.execute('''
-                SELECT COUNT(*) 
-                FROM acoes_usuarios 
-                WHERE user_id = %s AND tipo_acao = %s
-            ''', (user_id, acao))
-            stats[acao] = cursor.fetchone()[0]
-        
-        # Últimos acessos
-        cursor.execute('''
-            SELECT MAX(data_acesso) AT TIME ZONE 'UTC' AT TIME ZONE 'America/Sao_Paulo'
-            FROM user_acessos
-            WHERE user_id = %s
-        ''', (user_id,))
-        ultimo_acesso = cursor.fetchone()
-        stats['ultimo_acesso'] = ultimo_acesso[0] if ultimo_acesso else None
-        
-        # Total de acessos
-        cursor.execute('''
-            SELECT COUNT(*)
-            FROM user_acessos
-            WHERE user_id = %s
-        ''', (user_id,))
-        stats['total_acessos'] = cursor.fetchone()[0]
-        
-        return stats
-    finally:
-        cursor.close()
-        conn.close()
+    """Estatísticas do usuário (perfil agregado em cache)"""
+    return obter_perfil(user_id)
+
+get_estatisticas_gerais_async = assincrono(get_estatisticas_gerais)
+get_estatisticas_pessoais_async = obter_perfil_async
 
+@rota('stats_gerais')
 @user_approved
 async def mostrar_estatisticas_gerais(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Exibe estatísticas gerais do sistema"""
-    stats = get_estatisticas_gerais()
+    stats = await get_estatisticas_gerais_async()
     
     texto = "*📊 Estatísticas Gerais*\n\n"
     texto += "*👥 Usuários*\n"
@@ -172,11 +110,12 @@ async def mostrar_estatisticas_gerais(update: Update, context: ContextTypes.DEFA
         parse_mode=ParseMode.MARKDOWN
     )
 
+@rota('stats_pessoais')
 @user_approved
 async def mostrar_estatisticas_pessoais(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Exibe estatísticas pessoais do usuário"""
     user_id = update.callback_query.from_user.id
-    stats = get_estatisticas_pessoais(user_id)
+    stats = await get_estatisticas_pessoais_async(user_id)
     
     texto = "*👤 Suas Estatísticas*\n\n"
     
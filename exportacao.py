@@ -0,0 +1,163 @@
+# exportacao.py
+"""Exportação dos relatórios de atividade em PDF/CSV.
+
+Os dados são lidos em blocos por um cursor nomeado (no servidor) e gravados em
+um CSV temporário, sem montar o relatório inteiro em memória. O PDF é gerado a
+partir desse CSV em um processo separado, para não ocupar o event loop.
+"""
+import asyncio
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from database_manager import db
+
+# Linhas trazidas do servidor por ida ao banco
+EXPORTACAO_LOTE = int(os.getenv('EXPORTACAO_LOTE', '2000'))
+# Processos que geram os PDFs
+EXPORTACAO_PROCESSOS = int(os.getenv('EXPORTACAO_PROCESSOS', '1'))
+
+FORMATOS = ('pdf', 'csv')
+CABECALHO = ['Data', 'Usuário', 'Nível', 'Tipo', 'Quantidade', 'Primeiro', 'Último']
+TIPOS = {
+    'acesso': 'Acessos',
+    'novo_documento': 'Assinaturas',
+    'novo_lembrete': 'Lembretes',
+    'novo_contato': 'Contatos',
+    'novo_caso': 'Casos',
+}
+
+_processos = None
+
+def _hora(momento) -> str:
+    return momento.strftime('%H:%M') if momento else ''
+
+def gravar_csv(caminho: str, inicio, fim) -> int:
+    """Grava as atividades do período no CSV em blocos; retorna o número de linhas"""
+    conn = db.get_connection()
+    try:
+        # Cursores nomeados só existem dentro de uma transação
+        conn.autocommit = False
+        cursor = conn.cursor(name='exportacao_relatorio')
+        cursor.itersize = EXPORTACAO_LOTE
+        try:
+            cursor.execute('''
+                SELECT a.dia, COALESCE(u.nome, u.username) AS nome_usuario, u.nivel,
+                       a.tipo, a.quantidade, a.primeiro, a.ultimo
+                FROM atividade_diaria a
+                JOIN usuarios u ON u.user_id = a.user_id
+                WHERE a.dia BETWEEN %s AND %s
+                ORDER BY a.dia DESC, nome_usuario, a.tipo
+            ''', (inicio, fim))
+            total = 0
+            with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+                escritor = csv.writer(arquivo)
+                escritor.writerow(CABECALHO)
+                while True:
+                    linhas = cursor.fetchmany(EXPORTACAO_LOTE)
+                    if not linhas:
+                        break
+                    escritor.writerows(
+                        (dia.strftime('%d/%m/%Y'), nome, nivel, TIPOS.get(tipo, tipo),
+                         quantidade, _hora(primeiro), _hora(ultimo))
+                        for dia, nome, nivel, tipo, quantidade, primeiro, ultimo in linhas
+                    )
+                    total += len(linhas)
+            return total
+        finally:
+            cursor.close()
+            conn.rollback()
+    finally:
+        try:
+            conn.autocommit = True
+        except Exception:
+            pass
+        conn.close()
+
+def renderizar_pdf(caminho_csv: str, caminho_pdf: str, titulo: str):
+    """Desenha o CSV como tabela paginada (executado no pool de processos)"""
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    largura, altura = landscape(A4)
+    margem = 36
+    colunas = [0, 80, 300, 380, 480, 560, 640]
+    pdf = canvas.Canvas(caminho_pdf, pagesize=(largura, altura))
+    pdf.setTitle(titulo)
+
+    def nova_pagina(cabecalho, pagina):
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(margem, altura - margem, titulo)
+        pdf.setFont('Helvetica', 8)
+        pdf.drawRightString(largura - margem, altura - margem, f"Página {pagina}")
+        y = altura - margem - 28
+        pdf.setFont('Helvetica-Bold', 9)
+        for x, valor in zip(colunas, cabecalho):
+            pdf.drawString(margem + x, y, valor)
+        pdf.line(margem, y - 4, largura - margem, y - 4)
+        pdf.setFont('Helvetica', 9)
+        return y - 16
+
+    with open(caminho_csv, newline='', encoding='utf-8') as arquivo:
+        leitor = csv.reader(arquivo)
+        cabecalho = next(leitor)
+        pagina = 1
+        y = nova_pagina(cabecalho, pagina)
+        vazio = True
+        for linha in leitor:
+            vazio = False
+            if y < margem:
+                pdf.showPage()
+                pagina += 1
+                y = nova_pagina(cabecalho, pagina)
+            for x, valor in zip(colunas, linha):
+                pdf.drawString(margem + x, y, valor[:45])
+            y -= 13
+        if vazio:
+            pdf.drawString(margem, y, "Nenhuma atividade registrada no período.")
+    pdf.save()
+
+def _pool():
+    global _processos
+    if _processos is None:
+        # spawn: um fork herdaria locks presos pelas threads do processo (pool, executor, telemetria)
+        _processos = ProcessPoolExecutor(
+            max_workers=EXPORTACAO_PROCESSOS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _processos
+
+async def exportar_relatorio(formato: str, inicio, fim, titulo: str):
+    """Gera o arquivo do período; retorna (diretório temporário, caminho, linhas).
+
+    O chamador apaga o diretório depois de enviar o arquivo (remover_exportacao).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    diretorio = tempfile.mkdtemp(prefix='relatorio_')
+    try:
+        caminho_csv = os.path.join(diretorio, 'relatorio.csv')
+        linhas = await db.executar(gravar_csv, caminho_csv, inicio, fim)
+        if formato == 'csv':
+            return diretorio, caminho_csv, linhas
+        caminho_pdf = os.path.join(diretorio, 'relatorio.pdf')
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_pool(), renderizar_pdf, caminho_csv, caminho_pdf, titulo)
+        return diretorio, caminho_pdf, linhas
+    except Exception:
+        remover_exportacao(diretorio)
+        raise
+
+def remover_exportacao(diretorio: str):
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+async def encerrar():
+    """Finaliza o pool de processos (encerramento do bot) sem bloquear o event loop"""
+    global _processos
+    processos, _processos = _processos, None
+    if processos is not None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(processos.shutdown, wait=True, cancel_futures=True))
@@ -9,19 +9,42 @@ from telegram.constants import ParseMode
 TIMEZONE = pytz.timezone('America/Sao_Paulo')
 from database import (
     get_db_connection,
-    get_usuarios_cadastrados,
-    get_user_display_info
+    get_usuarios_cadastrados_async,
+    get_user_display_info_async
 )
+from database_manager import assincrono
+from agendador_lembretes import notificar_lembrete
+from recorrencia import validar as validar_recorrencia, descrever as descrever_recorrencia, RegraInvalida
 from database_estatisticas import incrementar_contador, registrar_acao_usuario
 from decorators import user_approved, admin_required
-from telegram.constants import ParseMode
+from roteador import rota, callback
 
 # Estados para o lembrete
 TITULO = 'titulo'
 DATA = 'data'
 HORA = 'hora'
+RECORRENCIA = 'recorrencia'
 DESTINATARIOS = 'destinatarios'
 
+def teclado_recorrencia():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("1️⃣ Uma vez", callback_data=callback('lembrete_recorrencia', 'unica'))],
+        [InlineKeyboardButton("📆 Todo dia", callback_data=callback('lembrete_recorrencia', 'diario'))],
+        [InlineKeyboardButton("🗓 Toda semana", callback_data=callback('lembrete_recorrencia', 'semanal'))],
+        [InlineKeyboardButton("📅 Todo mês", callback_data=callback('lembrete_recorrencia', 'mensal'))],
+        [InlineKeyboardButton("⚙️ Personalizada (cron)", callback_data='lembrete_recorrencia_cron')],
+        [InlineKeyboardButton("🔙 Cancelar", callback_data='lembrete_cancelar')]
+    ])
+
+def teclado_destinatarios():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("👤 Apenas eu", callback_data='lembrete_dest_eu')],
+        [InlineKeyboardButton("👥 Selecionar usuários", callback_data='lembrete_dest_selecionar')],
+        [InlineKeyboardButton("📢 Todos os usuários", callback_data='lembrete_dest_todos')],
+        [InlineKeyboardButton("🔙 Cancelar", callback_data='lembrete_cancelar')]
+    ])
+
+@rota('lembretes')
 @user_approved
 async def menu_lembretes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu principal de lembretes"""
@@ -39,10 +62,11 @@ async def menu_lembretes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
 
+@rota('lembrete_listar')
 async def listar_lembretes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Lista os lembretes do usuário"""
     user_id = update.callback_query.from_user.id
-    lembretes = consultar_lembretes_db(user_id)
+    lembretes = await consultar_lembretes_db_async(user_id)
     
     if not lembretes:
         keyboard = [[InlineKeyboardButton("🔙 Voltar", callback_data='lembretes')]]
@@ -59,14 +83,18 @@ async def listar_lembretes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = []
     
     for lembrete in lembretes:
-        id_lembrete, titulo, data, hora, destinatarios = lembrete
+        id_lembrete, titulo, data, hora, destinatarios, recorrencia = lembrete
         texto += f"📌 *{titulo}*\n"
-        texto += f"📅 Data: {data.strftime('%d/%m/%Y')}\n"
+        if recorrencia:
+            texto += f"🔁 {descrever_recorrencia(recorrencia)}\n"
+            texto += f"📅 Início: {data.strftime('%d/%m/%Y')}\n"
+        else:
+            texto += f"📅 Data: {data.strftime('%d/%m/%Y')}\n"
         texto += f"⏰ Hora: {hora}\n"
         texto += f"👥 Para: {destinatarios}\n\n"
         keyboard.append([InlineKeyboardButton(
             f"❌ Apagar: {titulo}",
-            callback_data=f'lembrete_apagar_{id_lembrete}'
+            callback_data=callback('lembrete_apagar', id_lembrete)
         )])
     
     keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data='lembretes')])
@@ -78,6 +106,7 @@ async def listar_lembretes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
 
+@rota('lembrete_novo')
 async def criar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Inicia o processo de criação de um novo lembrete"""
     context.user_data['criando_lembrete'] = True
@@ -94,28 +123,61 @@ async def criar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode=ParseMode.MARKDOWN
     )
 
+@rota('lembrete_dest_voltar')
 async def selecionar_destinatarios_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu de seleção de destinatários"""
-    keyboard = [
-        [InlineKeyboardButton("👤 Apenas eu", callback_data='lembrete_dest_eu')],
-        [InlineKeyboardButton("👥 Selecionar usuários", callback_data='lembrete_dest_selecionar')],
-        [InlineKeyboardButton("📢 Todos os usuários", callback_data='lembrete_dest_todos')],
-        [InlineKeyboardButton("🔙 Cancelar", callback_data='lembrete_cancelar')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.callback_query.message.edit_text(
         text="🔔 *Destinatários do Lembrete*\n\n"
              "Quem deve receber este lembrete?",
-        reply_markup=reply_markup,
+        reply_markup=teclado_destinatarios(),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+@rota('lembrete_recorrencia')
+async def escolher_recorrencia(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Regra de repetição escolhida nos botões; segue para os destinatários"""
+    regra, = context.args
+    context.user_data['recorrencia'] = validar_recorrencia(regra)
+    context.user_data['estado_lembrete'] = DESTINATARIOS
+    await selecionar_destinatarios_callback(update, context)
+
+@rota('lembrete_recorrencia_cron')
+async def solicitar_recorrencia_cron(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pede a expressão cron da repetição personalizada"""
+    context.user_data['estado_lembrete'] = RECORRENCIA
+    await update.callback_query.message.edit_text(
+        text="⚙️ *Repetição personalizada*\n\n"
+             "Digite 5 campos: `minuto hora dia mês dia-da-semana`\n"
+             "Aceita `*`, listas (`1,15`), intervalos (`1-5`) e passos (`*/15`).\n"
+             "Domingo é 0.\n\n"
+             "Exemplo: `0 9 * * 1-5` (dias úteis às 09:00)\n"
+             "A série começa na data e hora informadas.",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Voltar", callback_data='lembrete_recorrencia_voltar')
+        ]]),
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+@rota('lembrete_recorrencia_voltar')
+async def voltar_recorrencia(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['estado_lembrete'] = RECORRENCIA
+    await update.callback_query.message.edit_text(
+        text="🔁 *Repetição do Lembrete*\n\n"
+             "Com que frequência o lembrete deve se repetir?",
+        reply_markup=teclado_recorrencia(),
         parse_mode=ParseMode.MARKDOWN
     )
 
+@rota('lembrete_dest_selecionar', 'lembrete_user')
 async def selecionar_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Interface de seleção de usuários específicos"""
+    """Interface de seleção de usuários específicos.
+
+    A seleção fica no user_data (persistido); cada botão leva só o usuário a
+    marcar/desmarcar, então o callback_data não cresce com a seleção.
+    """
     current_user_id = update.callback_query.from_user.id
-    current_user = get_user_display_info(user_id=current_user_id)
-    outros_usuarios = get_usuarios_cadastrados(excluir_user_id=current_user_id)
+    current_user = await get_user_display_info_async(user_id=current_user_id)
+    outros_usuarios = await get_usuarios_cadastrados_async(excluir_user_id=current_user_id)
     
     if not outros_usuarios and not current_user:
         await update.callback_query.edit_message_text(
@@ -128,34 +190,32 @@ async def selecionar_usuarios(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     keyboard = []
     texto = "👥 *Selecione os destinatários:*\n(Clique para marcar/desmarcar)"
-    destinatarios = context.user_data.get('destinatarios', [])
+    if context.args:
+        # lembrete_user: alterna o usuário do botão
+        destinatarios = set(context.user_data.get('selecao_destinatarios', [])) ^ {context.args[0]}
+    else:
+        destinatarios = set()
+    context.user_data['selecao_destinatarios'] = sorted(destinatarios)
+    
+    def botao(user_id, nome):
+        emoji = "✅" if user_id in destinatarios else "⭕"
+        return InlineKeyboardButton(
+            f"{emoji} {nome}",
+            callback_data=callback('lembrete_user', user_id)
+        )
     
     # Adiciona o usuário atual (se for ativo e não pendente)
     if current_user and current_user.get('nivel') != 'pendente':
-        selecionado = str(current_user_id) in destinatarios
-        emoji = "✅" if selecionado else "⭕"
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{emoji} {current_user['display_name']} (Você)",
-                callback_data=f'lembrete_user_{current_user_id}'
-            )
-        ])
+        keyboard.append([botao(current_user_id, f"{current_user['display_name']} (Você)")])
     
     # Adiciona outros usuários
     for user_id, display_name in outros_usuarios:
-        selecionado = str(user_id) in destinatarios
-        emoji = "✅" if selecionado else "⭕"
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{emoji} {display_name}",
-                callback_data=f'lembrete_user_{user_id}'
-            )
-        ])
+        keyboard.append([botao(user_id, display_name)])
     
     if destinatarios:
         texto += "\n\n📌 *Selecionados:*"
-        for dest_id in destinatarios:
-            user_info = get_user_display_info(user_id=int(dest_id))
+        for dest_id in sorted(destinatarios):
+            user_info = await get_user_display_info_async(user_id=dest_id)
             if user_info:
                 texto += f"\n• {user_info['display_name']}"
     
@@ -177,13 +237,15 @@ async def finalizar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE)
         data = context.user_data['data']
         hora = context.user_data['hora']
         destinatarios = context.user_data.get('destinatarios', [])
+        recorrencia = context.user_data.get('recorrencia')
         
-        lembrete_id = adicionar_lembrete_db(
+        lembrete_id = await adicionar_lembrete_db_async(
             user_id, 
             titulo, 
             data.strftime('%Y-%m-%d'),
             hora.strftime('%H:%M'),
-            destinatarios
+            destinatarios,
+            recorrencia
         )
         
         if lembrete_id:
@@ -197,13 +259,14 @@ async def finalizar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 "✅ *Lembrete criado com sucesso!*\n\n"
                 f"📝 *Título:* {titulo}\n"
                 f"📅 *Data:* {data.strftime('%d/%m/%Y')}\n"
-                f"⏰ *Hora:* {hora.strftime('%H:%M')}"
+                f"⏰ *Hora:* {hora.strftime('%H:%M')}\n"
+                f"🔁 *Repetição:* {descrever_recorrencia(recorrencia)}"
             )
             
             if destinatarios:
                 texto += "\n\n👥 *Destinatários:*"
                 for dest_id in destinatarios:
-                    user_info = get_user_display_info(user_id=int(dest_id))
+                    user_info = await get_user_display_info_async(user_id=int(dest_id))
                     if user_info:
                         texto += f"\n• {user_info['display_name']}"
             
@@ -247,16 +310,17 @@ async def finalizar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE)
         context.user_data.clear()
         return None
 
-def adicionar_lembrete_db(user_id: int, titulo: str, data: str, hora: str, destinatarios: list):
-    """Adiciona um novo lembrete no banco de dados"""
+def adicionar_lembrete_db(user_id: int, titulo: str, data: str, hora: str, destinatarios: list,
+                          recorrencia: str = None):
+    """Adiciona um novo lembrete no banco de dados (recorrencia=None: lembrete único)"""
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
-        INSERT INTO lembretes (criador_id, titulo, data, hora, ativo)
-        VALUES (%s, %s, %s, %s, TRUE)
+        INSERT INTO lembretes (criador_id, titulo, data, hora, ativo, recorrencia)
+        VALUES (%s, %s, %s, %s, TRUE, %s)
         RETURNING id
-        ''', (user_id, titulo, data, hora))
+        ''', (user_id, titulo, data, hora, recorrencia))
         
         lembrete_id = cursor.fetchone()[0]
         
@@ -278,6 +342,8 @@ def adicionar_lembrete_db(user_id: int, titulo: str, data: str, hora: str, desti
             VALUES (%s, %s, FALSE)
             ''', (lembrete_id, dest_id))
         
+        # O líder (que pode ser outro worker) agenda o lembrete após o commit
+        notificar_lembrete(cursor, lembrete_id)
         conn.commit()
         incrementar_contador('lembretes')
         registrar_acao_usuario(user_id, 'novo_lembrete')
@@ -303,7 +369,8 @@ def consultar_lembretes_db(user_id: int):
                        ELSE u.nome
                    END, 
                    ', '
-               ) as destinatarios
+               ) as destinatarios,
+               l.recorrencia
         FROM lembretes l
         JOIN lembrete_destinatarios ld ON l.id = ld.lembrete_id
         LEFT JOIN usuarios u ON ld.user_id = u.user_id
@@ -329,6 +396,8 @@ def apagar_lembrete_db(lembrete_id: int):
             RETURNING id
         ''', (lembrete_id,))
         result = cursor.fetchone()
+        if result:
+            notificar_lembrete(cursor, lembrete_id)
         conn.commit()
         return bool(result)
     except Exception as e:
@@ -338,73 +407,47 @@ def apagar_lembrete_db(lembrete_id: int):
         cursor.close()
         conn.close()
 
-@user_approved
-async def handle_lembretes_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler principal para callbacks de lembretes"""
-    query = update.callback_query
-    await query.answer()
-    
-    if query.data == 'lembretes':
-        await menu_lembretes(update, context)
-    
-    elif query.data == 'lembrete_novo':
-        await criar_lembrete(update, context)
-    
-    elif query.data == 'lembrete_listar':
-        await listar_lembretes(update, context)
-    
-    elif query.data == 'lembrete_cancelar':
-        context.user_data.clear()
-        await menu_lembretes(update, context)
-    
-    elif query.data == 'lembrete_dest_eu':
-        context.user_data['destinatarios'] = [query.from_user.id]  # Armazena como número
-        await finalizar_lembrete(update, context)
-    
-    elif query.data == 'lembrete_dest_todos':
-        context.user_data['destinatarios'] = ['todos']
-        await finalizar_lembrete(update, context)
-    
-    elif query.data == 'lembrete_dest_selecionar':
-        await selecionar_usuarios(update, context)
-    
-    elif query.data == 'lembrete_dest_voltar':
-        await selecionar_destinatarios_callback(update, context)
-    
-    elif query.data.startswith('lembrete_user_'):
-        user_id = int(query.data.split('_')[-1])  # Converte para número aqui
-        destinatarios = context.user_data.get('destinatarios', [])
-        
-        if user_id in destinatarios:
-            destinatarios.remove(user_id)
-        else:
-            destinatarios.append(user_id)
-        
+@rota('lembrete_cancelar')
+async def cancelar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear()
+    await menu_lembretes(update, context)
+
+@rota('lembrete_dest_eu')
+async def destinatario_eu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['destinatarios'] = [update.callback_query.from_user.id]  # Armazena como número
+    await finalizar_lembrete(update, context)
+
+@rota('lembrete_dest_todos')
+async def destinatarios_todos(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['destinatarios'] = ['todos']
+    await finalizar_lembrete(update, context)
+
+@rota('lembrete_dest_confirmar')
+async def confirmar_destinatarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    destinatarios = context.user_data.pop('selecao_destinatarios', [])
+    if destinatarios:
         context.user_data['destinatarios'] = destinatarios
-        await selecionar_usuarios(update, context)
-    
-    elif query.data == 'lembrete_dest_confirmar':
-        if context.user_data.get('destinatarios'):
-            await finalizar_lembrete(update, context)
-        else:
-            await query.edit_message_text(
-                "⚠️ Selecione pelo menos um destinatário!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='lembrete_dest_selecionar')
-                ]])
-            )
-    
-    elif query.data.startswith('lembrete_apagar_'):
-        lembrete_id = int(query.data.split('_')[-1])
-        if apagar_lembrete_db(lembrete_id):
-            await listar_lembretes(update, context)
-        else:
-            await query.edit_message_text(
-                "❌ Erro ao apagar lembrete",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Voltar", callback_data='lembrete_listar')
-                ]])
-            )
+        await finalizar_lembrete(update, context)
+    else:
+        await update.callback_query.edit_message_text(
+            "⚠️ Selecione pelo menos um destinatário!",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='lembrete_dest_selecionar')
+            ]])
+        )
+
+@rota('lembrete_apagar', legado=True)
+async def apagar_lembrete(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    lembrete_id, = context.args
+    if await apagar_lembrete_db_async(lembrete_id):
+        await listar_lembretes(update, context)
+    else:
+        await update.callback_query.edit_message_text(
+            "❌ Erro ao apagar lembrete",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data='lembrete_listar')
+            ]])
+        )
 
 @user_approved
 async def handle_lembrete_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -473,69 +516,40 @@ async def handle_lembrete_message(update: Update, context: ContextTypes.DEFAULT_
                 return
             
             context.user_data['hora'] = hora
-            context.user_data['estado_lembrete'] = DESTINATARIOS
-            
-            keyboard = [
-                [InlineKeyboardButton("👤 Apenas eu", callback_data='lembrete_dest_eu')],
-                [InlineKeyboardButton("👥 Selecionar usuários", callback_data='lembrete_dest_selecionar')],
-                [InlineKeyboardButton("📢 Todos os usuários", callback_data='lembrete_dest_todos')],
-                [InlineKeyboardButton("🔙 Cancelar", callback_data='lembrete_cancelar')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            context.user_data['estado_lembrete'] = RECORRENCIA
             
             await update.message.reply_text(
-                "🔔 *Destinatários do Lembrete*\n\n"
-                "Quem deve receber este lembrete?",
-                reply_markup=reply_markup,
+                "🔁 *Repetição do Lembrete*\n\n"
+                "Com que frequência o lembrete deve se repetir?",
+                reply_markup=teclado_recorrencia(),
                 parse_mode=ParseMode.MARKDOWN
             )
             
         except ValueError:
             await update.message.reply_text("❌ Hora inválida! Use o formato HH:MM")
-        except Exception as e:
+        except Exception:
             await update.message.reply_text("❌ Erro ao criar lembrete. Tente novamente.")
             context.user_data.clear()
-
-async def verificar_lembretes(context: ContextTypes.DEFAULT_TYPE):
-    timezone = pytz.timezone('America/Sao_Paulo')
-    agora = datetime.now(timezone)
-    conn = get_db_connection()
-    cursor = conn.cursor()
     
-    try:
-        cursor.execute("SET TIME ZONE 'America/Sao_Paulo'")
-        cursor.execute('''
-            SELECT l.id, ld.user_id, l.titulo, l.data, l.hora
-            FROM lembretes l
-            JOIN lembrete_destinatarios ld ON l.id = ld.lembrete_id
-            WHERE l.data = %s 
-            AND l.hora <= %s
-            AND ld.notificado = FALSE
-            AND l.ativo = TRUE
-        ''', (agora.strftime('%Y-%m-%d'), agora.strftime('%H:%M')))
-        
-        lembretes = cursor.fetchall()
-        
-        for lembrete_id, user_id, titulo, data, hora in lembretes:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"🔔 *Lembrete!*\n\n"
-                         f"📝 {titulo}\n"
-                         f"⏰ Agendado para hoje às {hora}",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                
-                cursor.execute('''
-                    UPDATE lembrete_destinatarios 
-                    SET notificado = TRUE 
-                    WHERE lembrete_id = %s AND user_id = %s
-                    RETURNING id
-                ''', (lembrete_id, user_id))
-                conn.commit()
-                
-            except Exception as e:
-                print(f"Erro ao enviar notificação: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    elif estado == RECORRENCIA:
+        # Texto só é esperado depois de escolher a repetição personalizada
+        try:
+            context.user_data['recorrencia'] = validar_recorrencia('cron:' + texto)
+        except RegraInvalida as e:
+            await update.message.reply_text(
+                f"❌ Expressão inválida: {e}\n"
+                "Use 5 campos, por exemplo: 0 9 * * 1-5"
+            )
+            return
+        context.user_data['estado_lembrete'] = DESTINATARIOS
+        await update.message.reply_text(
+            "🔔 *Destinatários do Lembrete*\n\n"
+            "Quem deve receber este lembrete?",
+            reply_markup=teclado_destinatarios(),
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+# Equivalentes assíncronos (executados no executor dedicado do banco)
+adicionar_lembrete_db_async = assincrono(adicionar_lembrete_db)
+consultar_lembretes_db_async = assincrono(consultar_lembretes_db)
+apagar_lembrete_db_async = assincrono(apagar_lembrete_db)
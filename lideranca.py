@@ -0,0 +1,178 @@
+# lideranca.py
+import asyncio
+import os
+from database_manager import db
+from agendador_lembretes import agendador, CANAL_LEMBRETES
+from entregador_lembretes import entregador
+from retencao import retencao
+from cache_usuarios import CANAL_USUARIOS, aplicar_invalidacao
+
+# Chave do advisory lock de sessão que elege o worker líder
+CHAVE_LOCK_LIDER = 7_340_003
+# Intervalo (s) entre as tentativas de assumir a liderança / verificações da conexão
+LIDERANCA_INTERVALO = float(os.getenv('LIDERANCA_INTERVALO', '15'))
+
+
+class Lideranca:
+    """Eleição de líder entre os workers via pg_try_advisory_lock.
+
+    O lock pertence à sessão de uma conexão dedicada: se o processo morre ou a
+    conexão cai, o Postgres o libera e outro worker assume na próxima tentativa.
+    Somente o líder executa os serviços únicos (agendador, caixa de saída e
+    retenção). A mesma conexão faz LISTEN dos canais de lembretes e de invalidação
+    do cache.
+    """
+
+    def __init__(self, servicos=()):
+        self.lider = False
+        self._servicos = list(servicos)
+        self._conn = None
+        self._fd = None
+        self._bot = None
+        self._loop = None
+        self._tarefa = None
+        self._acordar = None
+
+    async def iniciar(self, bot):
+        self._bot = bot
+        self._loop = asyncio.get_running_loop()
+        self._acordar = asyncio.Event()
+        await self._verificar()
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        await self._deixar_lideranca()
+        # Fechar a sessão libera o lock para outro worker
+        self._desconectar()
+
+    async def _executar(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=LIDERANCA_INTERVALO)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            await self._verificar()
+
+    async def _verificar(self):
+        try:
+            if self._conn is None:
+                await db.executar(self._conectar)
+            lider = await db.executar(self._consultar_lock)
+        except Exception as e:
+            print(f"Liderança: conexão perdida ({e})")
+            self._desconectar()
+            lider = False
+        if lider and not self.lider:
+            await self._assumir_lideranca()
+        elif not lider and self.lider:
+            await self._deixar_lideranca()
+        # Notificações recebidas durante a consulta ficam em conn.notifies
+        if self._conn is not None:
+            await self._processar_notificacoes()
+
+    def _conectar(self):
+        conn = db.conexao_dedicada()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'LISTEN {CANAL_LEMBRETES}')
+            cursor.execute(f'LISTEN {CANAL_USUARIOS}')
+        finally:
+            cursor.close()
+        self._conn = conn
+        self._loop.call_soon_threadsafe(self._observar, conn)
+
+    def _observar(self, conn):
+        if conn is self._conn:
+            self._fd = conn.fileno()
+            self._loop.add_reader(self._fd, self._ao_ler, conn)
+
+    def _desconectar(self):
+        conn, self._conn = self._conn, None
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _consultar_lock(self) -> bool:
+        """Tenta obter o lock (ou confirma que a sessão ainda o detém)"""
+        cursor = self._conn.cursor()
+        try:
+            if self.lider:
+                cursor.execute('''
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_locks
+                        WHERE locktype = 'advisory' AND pid = pg_backend_pid()
+                        AND objid = %s AND granted
+                    )
+                ''', (CHAVE_LOCK_LIDER,))
+            else:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', (CHAVE_LOCK_LIDER,))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _coletar_notificacoes(self):
+        conn = self._conn
+        if conn is None:
+            return []
+        conn.poll()
+        notificacoes = [(n.channel, n.payload) for n in conn.notifies]
+        conn.notifies.clear()
+        return notificacoes
+
+    def _ao_ler(self, conn):
+        # O socket é lido no executor (a conexão também é usada lá pelas verificações);
+        # o reader fica suspenso até a leitura terminar para não disparar de novo
+        self._loop.remove_reader(self._fd)
+        asyncio.ensure_future(self._processar_notificacoes(conn))
+
+    async def _processar_notificacoes(self, conn=None):
+        try:
+            notificacoes = await db.executar(self._coletar_notificacoes)
+        except Exception as e:
+            print(f"Liderança: erro ao ler notificações ({e})")
+            self._desconectar()
+            self._acordar.set()
+            return
+        finally:
+            if conn is not None:
+                self._observar(conn)
+        for canal, payload in notificacoes:
+            try:
+                if canal == CANAL_USUARIOS:
+                    aplicar_invalidacao(payload)
+                elif canal == CANAL_LEMBRETES and self.lider:
+                    await agendador.sincronizar(int(payload))
+            except Exception as e:
+                print(f"Liderança: notificação inválida {canal}/{payload}: {e}")
+
+    async def _assumir_lideranca(self):
+        self.lider = True
+        print("Liderança: este worker é o líder")
+        for servico in self._servicos:
+            await servico.iniciar(self._bot)
+
+    async def _deixar_lideranca(self):
+        if not self.lider:
+            return
+        self.lider = False
+        print("Liderança: este worker deixou de ser o líder")
+        for servico in reversed(self._servicos):
+            await servico.parar()
+
+
+# Instância global
+lideranca = Lideranca(servicos=[entregador, agendador, retencao])
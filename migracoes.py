@@ -0,0 +1,413 @@
+# migracoes.py
+import psycopg2
+import psycopg2.errors
+import cache_usuarios
+from database_manager import db
+
+# Chave do advisory lock que serializa migrações de instâncias concorrentes
+CHAVE_LOCK_MIGRACOES = 7_340_001
+
+# Esquema base: todas as tabelas do bot (idempotente para bancos já existentes)
+ESQUEMA_BASE = [
+    '''CREATE TABLE IF NOT EXISTS usuarios (
+        user_id BIGINT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        username TEXT,
+        nivel TEXT DEFAULT 'pendente',
+        ativo BOOLEAN DEFAULT FALSE,
+        data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS assinaturas (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        username TEXT NOT NULL,
+        documento TEXT NOT NULL,
+        sequencia BIGINT NOT NULL,
+        ativo BOOLEAN DEFAULT TRUE,
+        data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS lembretes (
+        id SERIAL PRIMARY KEY,
+        criador_id BIGINT NOT NULL,
+        titulo TEXT NOT NULL,
+        data DATE NOT NULL,
+        hora TIME NOT NULL,
+        ativo BOOLEAN DEFAULT TRUE,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (criador_id) REFERENCES usuarios (user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS lembrete_destinatarios (
+        id SERIAL PRIMARY KEY,
+        lembrete_id BIGINT NOT NULL,
+        user_id BIGINT NOT NULL,
+        notificado BOOLEAN DEFAULT FALSE,
+        FOREIGN KEY (lembrete_id) REFERENCES lembretes (id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id),
+        UNIQUE(lembrete_id, user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS user_acessos (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tipo_acesso TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS acoes_usuarios (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        tipo_acao TEXT NOT NULL,
+        data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS contadores_permanentes (
+        id SERIAL PRIMARY KEY,
+        tipo TEXT NOT NULL UNIQUE,
+        total INTEGER DEFAULT 0,
+        ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''INSERT INTO contadores_permanentes (tipo, total)
+       VALUES ('documentos', 0), ('lembretes', 0), ('contatos', 0), ('usuarios', 0), ('casos', 0)
+       ON CONFLICT (tipo) DO NOTHING''',
+    '''CREATE TABLE IF NOT EXISTS contatos (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        nome TEXT NOT NULL,
+        contato TEXT NOT NULL,
+        observacoes TEXT,
+        ativo BOOLEAN DEFAULT TRUE,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS casos (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        titulo TEXT NOT NULL,
+        descricao TEXT,
+        observacoes TEXT,
+        status TEXT DEFAULT 'Em andamento',
+        ativo BOOLEAN DEFAULT TRUE,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS caso_responsaveis (
+        id SERIAL PRIMARY KEY,
+        caso_id BIGINT NOT NULL,
+        user_id BIGINT NOT NULL,
+        FOREIGN KEY (caso_id) REFERENCES casos (id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES usuarios (user_id),
+        UNIQUE(caso_id, user_id)
+    )''',
+]
+
+# Admin padrão: reafirmado a cada boot (fora das migrações), para que trocar o
+# ADMIN_ID ou um rebaixamento por engano não deixe o bot sem administrador
+ADMIN_PADRAO = '''
+    INSERT INTO usuarios (user_id, nome, username, nivel, ativo)
+    VALUES (%(admin_id)s, 'Diego', 'Diego', 'admin', TRUE)
+    ON CONFLICT (user_id) DO UPDATE
+    SET nome = 'Diego', username = 'Diego', nivel = 'admin', ativo = TRUE'''
+
+# Cria as partições mensais [de, até] que ainda não existem (usada também pela retenção).
+# Eventos do mês que caíram na partição padrão (retenção parada) são movidos para a
+# nova partição; sem isso o CREATE falha porque a partição padrão violaria o intervalo.
+FUNCAO_PARTICOES = '''
+    CREATE OR REPLACE FUNCTION garantir_particoes_mensais(tabela TEXT, de DATE, ate DATE)
+    RETURNS INTEGER LANGUAGE plpgsql AS $$
+    DECLARE
+        mes DATE := date_trunc('month', de)::date;
+        fim DATE;
+        nome TEXT;
+        padrao TEXT := tabela || '_padrao';
+        coluna TEXT;
+        filtro TEXT;
+        criadas INTEGER := 0;
+    BEGIN
+        SELECT a.attname INTO coluna
+        FROM pg_partitioned_table p
+        JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+        WHERE p.partrelid = tabela::regclass;
+        WHILE mes <= ate LOOP
+            nome := tabela || '_' || to_char(mes, 'YYYYMM');
+            fim := (mes + INTERVAL '1 month')::date;
+            IF to_regclass(nome) IS NULL THEN
+                IF to_regclass(padrao) IS NOT NULL THEN
+                    filtro := quote_ident(coluna) || ' >= ' || quote_literal(mes)
+                        || ' AND ' || quote_ident(coluna) || ' < ' || quote_literal(fim);
+                    -- Bloqueia novas inserções na padrão até a partição do mês existir
+                    EXECUTE 'LOCK TABLE ' || quote_ident(padrao) || ' IN EXCLUSIVE MODE';
+                    EXECUTE 'CREATE TEMP TABLE particao_movidos (LIKE ' || quote_ident(tabela) || ')';
+                    EXECUTE 'WITH m AS (DELETE FROM ' || quote_ident(padrao) || ' WHERE ' || filtro
+                        || ' RETURNING *) INSERT INTO particao_movidos SELECT * FROM m';
+                END IF;
+                EXECUTE 'CREATE TABLE ' || quote_ident(nome)
+                    || ' PARTITION OF ' || quote_ident(tabela)
+                    || ' FOR VALUES FROM (' || quote_literal(mes)
+                    || ') TO (' || quote_literal(fim) || ')';
+                IF to_regclass('pg_temp.particao_movidos') IS NOT NULL THEN
+                    EXECUTE 'INSERT INTO ' || quote_ident(tabela) || ' SELECT * FROM particao_movidos';
+                    DROP TABLE particao_movidos;
+                END IF;
+                criadas := criadas + 1;
+            END IF;
+            mes := (mes + INTERVAL '1 month')::date;
+        END LOOP;
+        RETURN criadas;
+    END
+    $$'''
+
+def _particionar(tabela: str, coluna: str, tipo: str) -> list:
+    """Recria a tabela de eventos particionada por mês em `coluna`, copiando os dados.
+
+    A partição padrão recebe eventos fora das partições criadas (e datas nulas).
+    """
+    return [
+        f'ALTER TABLE {tabela} RENAME TO {tabela}_legado',
+        f'ALTER TABLE {tabela}_legado RENAME CONSTRAINT {tabela}_pkey TO {tabela}_legado_pkey',
+        f'''CREATE TABLE {tabela} (
+            id BIGINT NOT NULL DEFAULT nextval('{tabela}_id_seq'),
+            user_id BIGINT NOT NULL,
+            {coluna} TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            {tipo} TEXT NOT NULL,
+            PRIMARY KEY (id, {coluna}),
+            FOREIGN KEY (user_id) REFERENCES usuarios (user_id)
+        ) PARTITION BY RANGE ({coluna})''',
+        f'CREATE TABLE {tabela}_padrao PARTITION OF {tabela} DEFAULT',
+        f'''SELECT garantir_particoes_mensais('{tabela}',
+               COALESCE((SELECT MIN({coluna}) FROM {tabela}_legado)::date, CURRENT_DATE),
+               CURRENT_DATE + 62)''',
+        f'''INSERT INTO {tabela} (id, user_id, {coluna}, {tipo})
+           SELECT id, user_id, COALESCE({coluna}, '-infinity'), {tipo}
+           FROM {tabela}_legado''',
+        f'ALTER SEQUENCE {tabela}_id_seq OWNED BY {tabela}.id',
+        f'DROP TABLE {tabela}_legado',
+    ]
+
+# Lista ordenada de migrações: (versão, descrição, comandos SQL).
+# Os comandos recebem os parâmetros de aplicar_migracoes (ex.: %(admin_id)s).
+# A versão 0 precede as demais porque cria as tabelas que elas alteram.
+MIGRACOES = [
+    (0, 'Esquema base', ESQUEMA_BASE),
+    (1, 'Índices das consultas mais frequentes', [
+        # Agendador de lembretes: destinatários ainda não notificados
+        '''CREATE INDEX IF NOT EXISTS idx_lembrete_destinatarios_pendentes
+           ON lembrete_destinatarios (lembrete_id) WHERE NOT notificado''',
+        '''CREATE INDEX IF NOT EXISTS idx_lembrete_destinatarios_user
+           ON lembrete_destinatarios (user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_lembretes_ativos_data
+           ON lembretes (data, hora) WHERE ativo''',
+        '''CREATE INDEX IF NOT EXISTS idx_lembretes_ativos_criador
+           ON lembretes (criador_id) WHERE ativo''',
+        # Estatísticas pessoais e detecção de primeira ação
+        '''CREATE INDEX IF NOT EXISTS idx_acoes_usuarios_user_tipo
+           ON acoes_usuarios (user_id, tipo_acao)''',
+        # Último acesso / total por usuário e relatórios por período
+        '''CREATE INDEX IF NOT EXISTS idx_user_acessos_user_data
+           ON user_acessos (user_id, data_acesso)''',
+        '''CREATE INDEX IF NOT EXISTS idx_user_acessos_data
+           ON user_acessos (data_acesso)''',
+        # Fila de assinaturas: busca por sequência e listagem das ativas
+        '''CREATE INDEX IF NOT EXISTS idx_assinaturas_ativas_sequencia
+           ON assinaturas (sequencia) WHERE ativo''',
+        '''CREATE INDEX IF NOT EXISTS idx_assinaturas_ativas_data
+           ON assinaturas (data_criacao DESC) WHERE ativo''',
+        '''CREATE INDEX IF NOT EXISTS idx_assinaturas_data
+           ON assinaturas (data_criacao)''',
+        '''CREATE INDEX IF NOT EXISTS idx_assinaturas_ativas_user
+           ON assinaturas (user_id) WHERE ativo''',
+        # Contatos do usuário já na ordem da listagem
+        '''CREATE INDEX IF NOT EXISTS idx_contatos_ativos_user_nome
+           ON contatos (user_id, nome) WHERE ativo''',
+        '''CREATE INDEX IF NOT EXISTS idx_casos_ativos_criado
+           ON casos (criado_em DESC) WHERE ativo''',
+        # caso_id já é coberto pelo UNIQUE (caso_id, user_id)
+        '''CREATE INDEX IF NOT EXISTS idx_caso_responsaveis_user
+           ON caso_responsaveis (user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_usuarios_username
+           ON usuarios (username)''',
+        '''CREATE INDEX IF NOT EXISTS idx_usuarios_nivel
+           ON usuarios (nivel)''',
+    ]),
+    (2, 'Índice de paginação da fila de assinaturas', [
+        # Keyset em (data_criacao, id); substitui o índice só por data
+        '''CREATE INDEX IF NOT EXISTS idx_assinaturas_ativas_data_id
+           ON assinaturas (data_criacao DESC, id DESC) WHERE ativo''',
+        'DROP INDEX IF EXISTS idx_assinaturas_ativas_data',
+    ]),
+    (3, 'Estado das conversas (persistência do user_data)', [
+        '''CREATE TABLE IF NOT EXISTS conversas_usuarios (
+            user_id BIGINT PRIMARY KEY,
+            dados BYTEA NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (4, 'Caixa de saída das entregas de lembretes', [
+        # Uma linha por destinatário e ocorrência: pendente -> reivindicada -> enviada | morta
+        '''CREATE TABLE IF NOT EXISTS lembrete_entregas (
+            id BIGSERIAL PRIMARY KEY,
+            lembrete_id BIGINT NOT NULL REFERENCES lembretes (id) ON DELETE CASCADE,
+            user_id BIGINT NOT NULL,
+            agendado_para TIMESTAMP NOT NULL,
+            estado VARCHAR(12) NOT NULL DEFAULT 'pendente'
+                CHECK (estado IN ('pendente', 'reivindicada', 'enviada', 'morta')),
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            proxima_tentativa TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            reivindicada_em TIMESTAMP,
+            enviada_em TIMESTAMP,
+            ultimo_erro TEXT,
+            UNIQUE (lembrete_id, user_id, agendado_para)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_lembrete_entregas_fila
+           ON lembrete_entregas (proxima_tentativa)
+           WHERE estado IN ('pendente', 'reivindicada')''',
+    ]),
+    (5, 'Recorrência dos lembretes', [
+        # NULL = lembrete único; data + hora passam a ser o início da série
+        'ALTER TABLE lembretes ADD COLUMN IF NOT EXISTS recorrencia TEXT',
+        'ALTER TABLE lembretes ADD COLUMN IF NOT EXISTS ultima_ocorrencia TIMESTAMP',
+        '''CREATE INDEX IF NOT EXISTS idx_lembretes_recorrentes
+           ON lembretes (id) WHERE ativo AND recorrencia IS NOT NULL''',
+    ]),
+    (6, 'Agregados de atividade para as estatísticas', [
+        # Uma linha por dia, usuário e tipo ('acesso' ou o tipo da ação)
+        '''CREATE TABLE IF NOT EXISTS atividade_diaria (
+            dia DATE NOT NULL,
+            user_id BIGINT NOT NULL,
+            tipo TEXT NOT NULL,
+            quantidade BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, user_id, tipo)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_atividade_diaria_user
+           ON atividade_diaria (user_id, tipo)''',
+        '''CREATE TABLE IF NOT EXISTS estatisticas_usuarios (
+            user_id BIGINT PRIMARY KEY,
+            total_acessos BIGINT NOT NULL DEFAULT 0,
+            ultimo_acesso TIMESTAMP
+        )''',
+        # Carga inicial a partir do histórico bruto
+        '''INSERT INTO atividade_diaria (dia, user_id, tipo, quantidade)
+           SELECT data_acesso::date, user_id, 'acesso', COUNT(*)
+           FROM user_acessos
+           WHERE data_acesso IS NOT NULL
+           GROUP BY 1, 2
+           ON CONFLICT DO NOTHING''',
+        '''INSERT INTO atividade_diaria (dia, user_id, tipo, quantidade)
+           SELECT data_hora::date, user_id, tipo_acao, COUNT(*)
+           FROM acoes_usuarios
+           WHERE data_hora IS NOT NULL
+           GROUP BY 1, 2, 3
+           ON CONFLICT DO NOTHING''',
+        '''INSERT INTO estatisticas_usuarios (user_id, total_acessos, ultimo_acesso)
+           SELECT user_id, COUNT(*), MAX(data_acesso)
+           FROM user_acessos
+           GROUP BY user_id
+           ON CONFLICT DO NOTHING''',
+    ]),
+    (7, 'Primeiro e último evento de cada dia nos agregados (relatórios)', [
+        '''ALTER TABLE atividade_diaria
+           ADD COLUMN IF NOT EXISTS primeiro TIMESTAMP,
+           ADD COLUMN IF NOT EXISTS ultimo TIMESTAMP''',
+        '''UPDATE atividade_diaria d
+           SET primeiro = s.primeiro, ultimo = s.ultimo
+           FROM (
+               SELECT data_acesso::date AS dia, user_id,
+                      MIN(data_acesso) AS primeiro, MAX(data_acesso) AS ultimo
+               FROM user_acessos
+               WHERE data_acesso IS NOT NULL
+               GROUP BY 1, 2
+           ) s
+           WHERE d.tipo = 'acesso' AND d.dia = s.dia AND d.user_id = s.user_id''',
+    ]),
+    (8, 'Particionamento mensal de user_acessos e acoes_usuarios', [
+        FUNCAO_PARTICOES,
+        *_particionar('user_acessos', 'data_acesso', 'tipo_acesso'),
+        *_particionar('acoes_usuarios', 'data_hora', 'tipo_acao'),
+        # Períodos são resolvidos pela poda de partições; ficam os índices por usuário
+        '''CREATE INDEX IF NOT EXISTS idx_user_acessos_user_data
+           ON user_acessos (user_id, data_acesso)''',
+        '''CREATE INDEX IF NOT EXISTS idx_acoes_usuarios_user_tipo
+           ON acoes_usuarios (user_id, tipo_acao)''',
+    ]),
+    (9, 'Partições mensais absorvem eventos da partição padrão', [
+        FUNCAO_PARTICOES,
+    ]),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+def versoes_aplicadas(cursor) -> set:
+    """Versões registradas em schema_migracoes"""
+    cursor.execute('SELECT versao FROM schema_migracoes')
+    return {row[0] for row in cursor.fetchall()}
+
+def esquema_atualizado() -> bool:
+    """Caminho rápido do boot: uma consulta, sem lock nem DDL"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        aplicadas = versoes_aplicadas(cursor)
+        return all(versao in aplicadas for versao, _, _ in MIGRACOES)
+    except psycopg2.errors.UndefinedTable:
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+def garantir_admin(admin_id: int):
+    """Garante o ADMIN_ID como administrador ativo"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(ADMIN_PADRAO, {'admin_id': admin_id})
+    finally:
+        cursor.close()
+        conn.close()
+    cache_usuarios.invalidar_usuario(admin_id)
+
+def aplicar_migracoes(admin_id: int) -> int:
+    """Aplica as migrações pendentes e reafirma o admin padrão"""
+    total = 0 if esquema_atualizado() else _aplicar_pendentes(admin_id)
+    garantir_admin(admin_id)
+    return total
+
+def _aplicar_pendentes(admin_id: int) -> int:
+    """Aplica, em uma única transação, as migrações ainda não registradas"""
+    parametros = {'admin_id': admin_id}
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        conn.autocommit = False
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (CHAVE_LOCK_MIGRACOES,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migracoes (
+                versao INTEGER PRIMARY KEY,
+                descricao TEXT NOT NULL,
+                aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Relido sob o lock: outra instância pode ter migrado nesse meio tempo
+        aplicadas = versoes_aplicadas(cursor)
+        total = 0
+        for versao, descricao, comandos in MIGRACOES:
+            if versao in aplicadas:
+                continue
+            for comando in comandos:
+                cursor.execute(comando, parametros)
+            cursor.execute('''
+                INSERT INTO schema_migracoes (versao, descricao)
+                VALUES (%s, %s)
+            ''', (versao, descricao))
+            total += 1
+            print(f"Migração {versao} aplicada: {descricao}")
+        conn.commit()
+        return total
+    except Exception as e:
+        print(f"Erro ao aplicar migrações: {e}")
+        conn.rollback()
+        raise e
+    finally:
+        try:
+            conn.autocommit = True
+        except Exception:
+            pass
+        cursor.close()
+        conn.close()
@@ -0,0 +1,246 @@
+# persistencia.py
+import asyncio
+import hashlib
+import os
+import pickle
+from psycopg2.extras import execute_values
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+from database_manager import db, assincrono
+
+# Backend do estado das conversas (context.user_data): postgres, arquivo ou nenhuma
+PERSISTENCIA = os.getenv('PERSISTENCIA', 'postgres')
+PERSISTENCIA_ARQUIVO = os.getenv('PERSISTENCIA_ARQUIVO', 'dcyber_conversas.pickle')
+# Vários workers atendendo o mesmo usuário: relê o estado a cada update e grava mais cedo
+PERSISTENCIA_COMPARTILHADA = os.getenv('PERSISTENCIA_COMPARTILHADA', '0') == '1'
+# Intervalo (s) entre as gravações em lote; o Application também grava no encerramento
+PERSISTENCIA_INTERVALO = float(os.getenv(
+    'PERSISTENCIA_INTERVALO', '1' if PERSISTENCIA_COMPARTILHADA else '30'
+))
+
+# Só o user_data guarda os fluxos em andamento (casos, lembretes, contatos, DPC, mensagens)
+APENAS_USER_DATA = PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False)
+
+def carregar_conversas() -> dict:
+    """Estado salvo de todos os usuários, carregado uma vez na inicialização"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT user_id, dados, atualizado_em FROM conversas_usuarios')
+        return [(user_id, bytes(dados), versao) for user_id, dados, versao in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def carregar_conversa(user_id: int):
+    """(dados, versão) do estado salvo do usuário ou None"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT dados, atualizado_em FROM conversas_usuarios WHERE user_id = %s
+        ''', (user_id,))
+        result = cursor.fetchone()
+        return (bytes(result[0]), result[1]) if result else None
+    finally:
+        cursor.close()
+        conn.close()
+
+def gravar_conversas(alteradas: dict, removidas: set) -> dict:
+    """Grava e remove os estados do lote em uma única transação; retorna as versões gravadas"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        conn.autocommit = False
+        if removidas:
+            cursor.execute(
+                'DELETE FROM conversas_usuarios WHERE user_id = ANY(%s)',
+                (list(removidas),)
+            )
+        versoes = {}
+        if alteradas:
+            versoes = dict(execute_values(cursor, '''
+                INSERT INTO conversas_usuarios (user_id, dados)
+                VALUES %s
+                ON CONFLICT (user_id) DO UPDATE
+                SET dados = EXCLUDED.dados, atualizado_em = CURRENT_TIMESTAMP
+                RETURNING user_id, atualizado_em
+            ''', list(alteradas.items()), template='(%s, %s)', fetch=True))
+        conn.commit()
+        return versoes
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            conn.autocommit = True
+        except Exception:
+            pass
+        cursor.close()
+        conn.close()
+
+carregar_conversas_async = assincrono(carregar_conversas)
+carregar_conversa_async = assincrono(carregar_conversa)
+gravar_conversas_async = assincrono(gravar_conversas)
+
+
+class PersistenciaPostgres(BasePersistence):
+    """user_data em conversas_usuarios; alterações acumuladas e gravadas em lote"""
+
+    def __init__(self, update_interval: float = PERSISTENCIA_INTERVALO,
+                 compartilhada: bool = PERSISTENCIA_COMPARTILHADA):
+        super().__init__(store_data=APENAS_USER_DATA, update_interval=update_interval)
+        self.compartilhada = compartilhada
+        self._alteradas = {}
+        self._removidas = set()
+        # Resumo do último estado gravado de cada usuário (evita regravar o mesmo conteúdo)
+        self._gravados = {}
+        # atualizado_em da linha que este worker conhece (modo compartilhado)
+        self._versoes = {}
+        self._gravacao = None
+
+    @staticmethod
+    def _resumo(dados: bytes) -> bytes:
+        return hashlib.blake2b(dados, digest_size=16).digest()
+
+    async def get_user_data(self) -> dict:
+        user_data = {}
+        for user_id, dados, versao in await carregar_conversas_async():
+            try:
+                user_data[user_id] = pickle.loads(dados)
+            except Exception as e:
+                print(f"Estado da conversa de {user_id} ignorado: {e}")
+                continue
+            self._gravados[user_id] = self._resumo(dados)
+            self._versoes[user_id] = versao
+        print(f"Persistência: {len(user_data)} conversa(s) restaurada(s)")
+        return user_data
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        # O Application entrega todos os usuários que tiveram updates no intervalo
+        if not data:
+            await self.drop_user_data(user_id)
+            return
+        try:
+            dados = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Estado da conversa de {user_id} não serializável: {e}")
+            return
+        if self._gravados.get(user_id) == self._resumo(dados):
+            self._alteradas.pop(user_id, None)
+            return
+        self._alteradas[user_id] = dados
+        self._removidas.discard(user_id)
+        self._agendar()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._alteradas.pop(user_id, None)
+        if user_id in self._gravados:
+            self._removidas.add(user_id)
+            self._agendar()
+
+    def _agendar(self):
+        # As chamadas de um mesmo ciclo chegam juntas: uma única tarefa grava todas
+        if self._gravacao is None or self._gravacao.done():
+            self._gravacao = asyncio.get_running_loop().create_task(self._gravar())
+
+    async def _gravar(self):
+        while self._alteradas or self._removidas:
+            alteradas, self._alteradas = self._alteradas, {}
+            removidas, self._removidas = self._removidas, set()
+            try:
+                versoes = await gravar_conversas_async(alteradas, removidas)
+            except Exception as e:
+                print(f"Erro ao gravar estado das conversas: {e}")
+                # Devolve o lote sem sobrescrever alterações mais novas
+                for user_id, dados in alteradas.items():
+                    self._alteradas.setdefault(user_id, dados)
+                self._removidas |= removidas - self._alteradas.keys()
+                return
+            for user_id, dados in alteradas.items():
+                self._gravados[user_id] = self._resumo(dados)
+            self._versoes.update(versoes)
+            for user_id in removidas:
+                self._gravados.pop(user_id, None)
+                self._versoes.pop(user_id, None)
+
+    async def flush(self) -> None:
+        """Chamado no encerramento: aguarda a gravação em curso e grava o restante"""
+        if self._gravacao is not None:
+            await asyncio.gather(self._gravacao, return_exceptions=True)
+        await self._gravar()
+        if self._alteradas or self._removidas:
+            print(f"Persistência: {len(self._alteradas) + len(self._removidas)} conversa(s) não gravada(s)")
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Chamado antes de cada update; só consulta o banco no modo compartilhado"""
+        if not self.compartilhada or user_id in self._alteradas:
+            return
+        try:
+            salvo = await carregar_conversa_async(user_id)
+        except Exception as e:
+            print(f"Erro ao recarregar estado da conversa de {user_id}: {e}")
+            return
+        if salvo is None:
+            # Outro worker encerrou o fluxo e removeu o estado que conhecíamos
+            if self._versoes.pop(user_id, None) is not None:
+                self._gravados.pop(user_id, None)
+                user_data.clear()
+            return
+        dados, versao = salvo
+        if self._versoes.get(user_id) == versao:
+            return
+        # Estado gravado por outro worker depois da versão conhecida aqui
+        user_data.clear()
+        user_data.update(pickle.loads(dados))
+        self._gravados[user_id] = self._resumo(dados)
+        self._versoes[user_id] = versao
+
+    # Dados não persistidos por este backend
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+
+def criar_persistencia():
+    """Backend configurado em PERSISTENCIA (None desativa a persistência)"""
+    if PERSISTENCIA == 'postgres':
+        return PersistenciaPostgres()
+    if PERSISTENCIA == 'arquivo':
+        # Regrava o arquivo no intervalo (só se houve updates) e no encerramento
+        return PicklePersistence(
+            PERSISTENCIA_ARQUIVO,
+            store_data=APENAS_USER_DATA,
+            update_interval=PERSISTENCIA_INTERVALO
+        )
+    if PERSISTENCIA != 'nenhuma':
+        print(f"PERSISTENCIA inválida: {PERSISTENCIA}; estado das conversas não será persistido")
+    return None
@@ -0,0 +1,131 @@
+# recorrencia.py
+"""Regras de recorrência dos lembretes e cálculo da próxima ocorrência.
+
+Regras guardadas em lembretes.recorrencia (NULL = lembrete único):
+'diario', 'semanal', 'mensal' ou 'cron:<min> <hora> <dia> <mês> <dia-semana>'.
+Os horários são locais e sem fuso (o agendador localiza o resultado).
+"""
+import calendar
+from datetime import datetime, timedelta
+
+REGRAS = {
+    'diario': 'Todo dia',
+    'semanal': 'Toda semana',
+    'mensal': 'Todo mês',
+}
+PREFIXO_CRON = 'cron:'
+
+# (mínimo, máximo) de cada campo do cron; no dia da semana 0 e 7 são domingo
+_CAMPOS_CRON = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+# Limite da busca de uma ocorrência cron (regras como "30 de fevereiro" nunca ocorrem)
+_DIAS_BUSCA_CRON = 366 * 5
+
+
+class RegraInvalida(ValueError):
+    """Regra de recorrência que não pode ser interpretada"""
+
+
+def _campo_cron(texto: str, minimo: int, maximo: int) -> set:
+    valores = set()
+    for parte in texto.split(','):
+        faixa, _, passo = parte.partition('/')
+        if faixa == '*':
+            inicio, fim = minimo, maximo
+        elif '-' in faixa:
+            inicio, fim = (int(valor) for valor in faixa.split('-', 1))
+        else:
+            # Como no cron, 'N/passo' vale de N até o máximo do campo
+            inicio = int(faixa)
+            fim = maximo if passo else inicio
+        passo = int(passo) if passo else 1
+        if not (minimo <= inicio <= fim <= maximo) or passo < 1:
+            raise RegraInvalida(f"Campo fora do intervalo {minimo}-{maximo}: {parte}")
+        valores.update(range(inicio, fim + 1, passo))
+    return valores
+
+def _interpretar_cron(expressao: str):
+    campos = expressao.split()
+    if len(campos) != 5:
+        raise RegraInvalida("Use 5 campos: minuto hora dia mês dia-da-semana")
+    try:
+        minutos, horas, dias, meses, semana = (
+            _campo_cron(campo, *limites) for campo, limites in zip(campos, _CAMPOS_CRON)
+        )
+    except ValueError as e:
+        raise RegraInvalida(str(e))
+    semana = {dia % 7 for dia in semana}
+    # Como no cron: com dia do mês e da semana restritos, basta um deles coincidir
+    ambos = campos[2] != '*' and campos[4] != '*'
+    return sorted(minutos), sorted(horas), dias, meses, semana, ambos
+
+def validar(regra):
+    """Normaliza a regra (None para lembrete único) ou levanta RegraInvalida"""
+    if regra is None or regra in ('', 'unica'):
+        return None
+    regra = regra.strip()
+    if regra in REGRAS:
+        return regra
+    if regra.startswith(PREFIXO_CRON):
+        expressao = ' '.join(regra[len(PREFIXO_CRON):].split())
+        _interpretar_cron(expressao)
+        return PREFIXO_CRON + expressao
+    raise RegraInvalida(f"Regra desconhecida: {regra}")
+
+def descrever(regra) -> str:
+    if regra is None:
+        return 'Uma vez'
+    if regra.startswith(PREFIXO_CRON):
+        # Em bloco de código: os '*' do cron não são lidos como Markdown
+        return f"Personalizada (`{regra[len(PREFIXO_CRON):]}`)"
+    return REGRAS.get(regra, regra)
+
+def _somar_meses(inicio: datetime, meses: int) -> datetime:
+    ano, mes = divmod(inicio.month - 1 + meses, 12)
+    ano += inicio.year
+    dia = min(inicio.day, calendar.monthrange(ano, mes + 1)[1])
+    return inicio.replace(year=ano, month=mes + 1, day=dia)
+
+def _proxima_cron(expressao: str, inicio: datetime, depois: datetime):
+    minutos, horas, dias, meses, semana, ambos = _interpretar_cron(expressao)
+    # Primeiro minuto candidato: depois do instante dado e não antes do início
+    atual = max(depois + timedelta(minutes=1), inicio)
+    atual = atual.replace(second=0, microsecond=0)
+    if atual < inicio:
+        atual += timedelta(minutes=1)
+    dia = atual.date()
+    for _ in range(_DIAS_BUSCA_CRON):
+        dia_semana = (dia.weekday() + 1) % 7
+        if ambos:
+            coincide = dia.day in dias or dia_semana in semana
+        else:
+            coincide = dia.day in dias and dia_semana in semana
+        if dia.month in meses and coincide:
+            mesmo_dia = dia == atual.date()
+            for hora in horas:
+                if mesmo_dia and hora < atual.hour:
+                    continue
+                for minuto in minutos:
+                    if mesmo_dia and hora == atual.hour and minuto < atual.minute:
+                        continue
+                    return datetime(dia.year, dia.month, dia.day, hora, minuto)
+        dia += timedelta(days=1)
+    return None
+
+def proxima_ocorrencia(regra, inicio: datetime, depois: datetime):
+    """Primeira ocorrência estritamente posterior a `depois` (None se não houver)"""
+    if regra is None:
+        return inicio if inicio > depois else None
+    if regra.startswith(PREFIXO_CRON):
+        return _proxima_cron(regra[len(PREFIXO_CRON):], inicio, depois)
+    if depois < inicio:
+        return inicio
+    if regra in ('diario', 'semanal'):
+        periodo = timedelta(days=1 if regra == 'diario' else 7)
+        return inicio + ((depois - inicio) // periodo + 1) * periodo
+    if regra == 'mensal':
+        meses = (depois.year - inicio.year) * 12 + depois.month - inicio.month
+        ocorrencia = _somar_meses(inicio, meses)
+        if ocorrencia <= depois:
+            ocorrencia = _somar_meses(inicio, meses + 1)
+        return ocorrencia
+    raise RegraInvalida(f"Regra desconhecida: {regra}")
@@ -0,0 +1,166 @@
+# retencao.py
+import asyncio
+import os
+import pytz
+from datetime import datetime, date, timedelta
+import psycopg2
+from psycopg2 import sql
+from database_manager import db
+
+TIMEZONE = pytz.timezone('America/Sao_Paulo')
+# Meses completos de eventos brutos mantidos além do mês corrente
+RETENCAO_MESES = int(os.getenv('RETENCAO_MESES', '6'))
+# Intervalo (s) entre as execuções da retenção no worker líder
+RETENCAO_INTERVALO = float(os.getenv('RETENCAO_INTERVALO', str(6 * 3600)))
+# Partições futuras criadas com antecedência (dias)
+RETENCAO_ANTECEDENCIA = 62
+
+# (tabela, coluna da data, expressão do tipo em atividade_diaria)
+TABELAS = [
+    ('user_acessos', 'data_acesso', "'acesso'"),
+    ('acoes_usuarios', 'data_hora', 'tipo_acao'),
+]
+
+# Garante que os agregados cubram os eventos brutos antes do descarte. A telemetria
+# já grava os agregados junto com os eventos, então GREATEST evita contar duas vezes.
+_CONSOLIDAR = '''
+    INSERT INTO atividade_diaria (dia, user_id, tipo, quantidade, primeiro, ultimo)
+    SELECT {coluna}::date, user_id, {tipo}, COUNT(*), MIN({coluna}), MAX({coluna})
+    FROM {origem}
+    WHERE {coluna} < %(corte)s AND {coluna} > '-infinity'
+    GROUP BY 1, 2, 3
+    ON CONFLICT (dia, user_id, tipo) DO UPDATE
+    SET quantidade = GREATEST(atividade_diaria.quantidade, EXCLUDED.quantidade),
+        primeiro = LEAST(atividade_diaria.primeiro, EXCLUDED.primeiro),
+        ultimo = GREATEST(atividade_diaria.ultimo, EXCLUDED.ultimo)
+'''
+
+def _mes_inicial(hoje: date, meses: int) -> date:
+    ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - meses, 12)
+    return date(ano, mes + 1, 1)
+
+def _particoes(cursor, tabela: str) -> list:
+    """Partições mensais da tabela: [(nome, primeiro dia do mês)]"""
+    cursor.execute('''
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    ''', (tabela,))
+    particoes = []
+    for (nome,) in cursor.fetchall():
+        sufixo = nome[len(tabela) + 1:]
+        if len(sufixo) == 6 and sufixo.isdigit():
+            particoes.append((nome, date(int(sufixo[:4]), int(sufixo[4:]), 1)))
+    return particoes
+
+def _descartar_particao(conn, cursor, tabela, coluna, tipo, particao, corte):
+    """Consolida, desanexa e apaga uma partição em uma única transação"""
+    try:
+        conn.autocommit = False
+        # Não segurar a tabela se houver transações longas; tenta de novo na próxima execução
+        cursor.execute("SET LOCAL lock_timeout = '5s'")
+        cursor.execute(sql.SQL(_CONSOLIDAR).format(
+            origem=sql.Identifier(particao),
+            coluna=sql.Identifier(coluna),
+            tipo=sql.SQL(tipo)
+        ), {'corte': corte})
+        cursor.execute(sql.SQL('ALTER TABLE {} DETACH PARTITION {}').format(
+            sql.Identifier(tabela), sql.Identifier(particao)))
+        cursor.execute(sql.SQL('DROP TABLE {}').format(sql.Identifier(particao)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+def _limpar_padrao(conn, cursor, tabela, coluna, tipo, corte) -> int:
+    """Eventos antigos que caíram na partição padrão: consolida e apaga"""
+    padrao = f'{tabela}_padrao'
+    try:
+        conn.autocommit = False
+        cursor.execute(sql.SQL(_CONSOLIDAR).format(
+            origem=sql.Identifier(padrao),
+            coluna=sql.Identifier(coluna),
+            tipo=sql.SQL(tipo)
+        ), {'corte': corte})
+        cursor.execute(sql.SQL('DELETE FROM {} WHERE {} < %s').format(
+            sql.Identifier(padrao), sql.Identifier(coluna)), (corte,))
+        apagados = cursor.rowcount
+        conn.commit()
+        return apagados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+def aplicar_retencao(meses: int = RETENCAO_MESES) -> int:
+    """Cria as partições futuras e descarta as anteriores ao período de retenção.
+
+    Retorna o número de partições descartadas.
+    """
+    hoje = datetime.now(TIMEZONE).date()
+    corte = _mes_inicial(hoje, meses)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    descartadas = 0
+    try:
+        for tabela, coluna, tipo in TABELAS:
+            try:
+                try:
+                    cursor.execute('SELECT garantir_particoes_mensais(%s, %s, %s)', (
+                        tabela, hoje, hoje + timedelta(days=RETENCAO_ANTECEDENCIA)))
+                except psycopg2.errors.CheckViolation as e:
+                    # A função move os eventos do mês para fora da padrão; se ainda assim
+                    # falhar, os eventos novos seguem caindo em {tabela}_padrao
+                    print(f"Retenção: partições futuras de {tabela} não criadas, "
+                          f"eventos continuam em {tabela}_padrao: {e}")
+                for particao, mes in _particoes(cursor, tabela):
+                    # Só partições inteiramente anteriores ao corte
+                    if _mes_inicial(mes, -1) <= corte:
+                        _descartar_particao(conn, cursor, tabela, coluna, tipo, particao, corte)
+                        descartadas += 1
+                        print(f"Retenção: partição {particao} consolidada e descartada")
+                apagados = _limpar_padrao(conn, cursor, tabela, coluna, tipo, corte)
+                if apagados:
+                    print(f"Retenção: {apagados} evento(s) antigo(s) removido(s) de {tabela}_padrao")
+            except Exception as e:
+                print(f"Erro na retenção de {tabela}: {e}")
+        return descartadas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class Retencao:
+    """Execução periódica da retenção (somente no worker líder)"""
+
+    def __init__(self):
+        self._tarefa = None
+
+    async def iniciar(self, bot):
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def _executar(self):
+        while True:
+            try:
+                await db.executar(aplicar_retencao)
+            except Exception as e:
+                print(f"Erro na retenção: {e}")
+            await asyncio.sleep(RETENCAO_INTERVALO)
+
+
+# Instância global
+retencao = Retencao()
@@ -0,0 +1,105 @@
+# roteador.py
+from telegram import Update
+from telegram.ext import ContextTypes
+from decorators import APROVADO, executar_com_acesso
+from codec_callback import (
+    CallbackInvalido,
+    id_rota,
+    eh_compacto,
+    codificar,
+    decodificar
+)
+
+
+class Roteador:
+    """Tabela de despacho dos callbacks: callback_data -> (handler, acesso)"""
+
+    def __init__(self):
+        self._rotas = {}
+        self._por_id = {}
+        # Prefixo antigo -> (chave da rota, argumentos fixos antes do número)
+        self._legado = {}
+
+    def registrar(self, chave: str, handler, acesso: str = APROVADO, legado=False):
+        """Registra o handler da chave; o id compacto da rota deriva da chave.
+
+        legado=True aceita também '<chave>_<número>', formato de botões enviados
+        por versões anteriores que continuam no histórico dos chats. Um dict
+        {prefixo: argumentos} aceita '<prefixo>_<número>' para botões antigos
+        que levavam argumentos fixos no nome (ex.: 'set_nivel_admin_<id>').
+        """
+        if chave in self._rotas:
+            raise ValueError(f"Rota de callback duplicada: {chave}")
+        rota_id = id_rota(chave)
+        if rota_id in self._por_id:
+            raise ValueError(f"Colisão de id entre rotas de callback: {chave}")
+        self._rotas[chave] = self._por_id[rota_id] = (handler, acesso)
+        if legado is True:
+            legado = {chave: ()}
+        for prefixo, fixos in (legado or {}).items():
+            if prefixo in self._legado:
+                raise ValueError(f"Prefixo de callback legado duplicado: {prefixo}")
+            self._legado[prefixo] = (chave, tuple(fixos))
+
+    def rota(self, *chaves: str, acesso: str = APROVADO, legado=False):
+        """Decorador que registra o handler para uma ou mais chaves"""
+        def decorador(handler):
+            for chave in chaves:
+                self.registrar(chave, handler, acesso, legado)
+            return handler
+        return decorador
+
+    def callback(self, chave: str, *argumentos) -> str:
+        """callback_data da rota com argumentos (int, str, bool, None, datetime e listas)"""
+        if chave not in self._rotas:
+            raise KeyError(f"Rota de callback não registrada: {chave}")
+        return codificar(id_rota(chave), argumentos)
+
+    def resolver(self, dados: str):
+        """Retorna (handler, acesso, argumentos) ou None se o botão não tem rota"""
+        if eh_compacto(dados):
+            rota_id, argumentos = decodificar(dados)
+            rota = self._por_id.get(rota_id)
+        else:
+            # Botões sem parâmetros usam a própria chave como callback_data
+            argumentos = []
+            rota = self._rotas.get(dados)
+            if rota is None:
+                prefixo, _, numero = dados.rpartition('_')
+                if prefixo in self._legado and numero.isdigit():
+                    chave, fixos = self._legado[prefixo]
+                    argumentos = [*fixos, int(numero)]
+                    rota = self._rotas[chave]
+        if rota is None:
+            return None
+        handler, acesso = rota
+        return handler, acesso, argumentos
+
+    async def despachar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """CallbackQueryHandler único: resolve a rota e verifica o acesso uma vez"""
+        query = update.callback_query
+        try:
+            rota = self.resolver(query.data or '')
+        except (CallbackInvalido, ValueError) as e:
+            print(f"Callback inválido ({query.data}): {e}")
+            rota = None
+        if rota is None:
+            # Botão de uma versão anterior ou cujo estado já expirou
+            await query.answer("⚠️ Este botão expirou. Abra o menu novamente.", show_alert=True)
+            return
+
+        handler, acesso, argumentos = rota
+        # Os handlers leem os parâmetros do callback em context.args
+        context.args = argumentos
+
+        async def executar(update, context):
+            await query.answer()
+            return await handler(update, context)
+
+        return await executar_com_acesso(acesso, executar, update, context)
+
+
+# Instância global
+roteador = Roteador()
+rota = roteador.rota
+callback = roteador.callback
@@ -0,0 +1,239 @@
+# telemetria.py
+import os
+import threading
+import pytz
+from collections import Counter
+from datetime import datetime
+from psycopg2.extras import execute_values
+from database_manager import db
+from cache_estatisticas import invalidar_perfis
+from cache_relatorios import invalidar_dias
+
+# Buffer em memória para acessos, ações e contadores (gravação em lote)
+TELEMETRIA_INTERVALO = float(os.getenv('TELEMETRIA_INTERVALO', '5'))
+TELEMETRIA_CAPACIDADE = int(os.getenv('TELEMETRIA_CAPACIDADE', '10000'))
+TELEMETRIA_LOTE = int(os.getenv('TELEMETRIA_LOTE', '500'))
+TIMEZONE = pytz.timezone('America/Sao_Paulo')
+
+
+class BufferTelemetria:
+    """Fila limitada de eventos gravada por uma thread em segundo plano"""
+
+    def __init__(self, intervalo=TELEMETRIA_INTERVALO, capacidade=TELEMETRIA_CAPACIDADE,
+                 lote=TELEMETRIA_LOTE):
+        self.intervalo = intervalo
+        self.capacidade = capacidade
+        self.lote = lote
+        self.descartados = 0
+        self._acessos = []
+        self._acoes = []
+        self._contadores = Counter()
+        self._usuarios_com_acoes = set()
+        self._lock = threading.Lock()
+        self._gravacao = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = False
+        self._thread = None
+
+    def _pendentes(self):
+        return len(self._acessos) + len(self._acoes)
+
+    def _enfileirar(self, fila, evento):
+        with self._lock:
+            if self._parar:
+                return False
+            if self._pendentes() >= self.capacidade:
+                self.descartados += 1
+                if self.descartados % 100 == 1:
+                    print(f"Telemetria: buffer cheio, {self.descartados} evento(s) descartado(s)")
+                return False
+            fila.append(evento)
+            cheio = self._pendentes() >= self.lote
+        self.iniciar()
+        if cheio:
+            self._acordar.set()
+        return True
+
+    def registrar_acesso(self, user_id: int, tipo_acesso: str = 'login') -> bool:
+        return self._enfileirar(self._acessos, (user_id, tipo_acesso, datetime.now(TIMEZONE)))
+
+    def registrar_acao(self, user_id: int, tipo_acao: str, quantidade: int = 1) -> bool:
+        agora = datetime.now(TIMEZONE)
+        aceitos = [self._enfileirar(self._acoes, (user_id, tipo_acao, agora)) for _ in range(quantidade)]
+        return all(aceitos)
+
+    def incrementar(self, tipo: str, quantidade: int = 1) -> bool:
+        # Contadores são agregados por tipo, então não ocupam espaço na fila
+        with self._lock:
+            if self._parar:
+                return False
+            self._contadores[tipo] += quantidade
+        self.iniciar()
+        return True
+
+    def iniciar(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._parar:
+                    self._thread = threading.Thread(
+                        target=self._loop,
+                        name='telemetria',
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _loop(self):
+        while not self._parar:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            if self._parar:
+                break
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"Erro ao gravar telemetria: {e}")
+
+    def descarregar(self):
+        """Grava todos os eventos pendentes em uma única transação"""
+        with self._gravacao:
+            with self._lock:
+                acessos, self._acessos = self._acessos, []
+                acoes, self._acoes = self._acoes, []
+                contadores, self._contadores = self._contadores, Counter()
+            if not acessos and not acoes and not contadores:
+                return 0
+
+            try:
+                self._gravar(acessos, acoes, contadores)
+            except Exception:
+                # Devolve o lote ao buffer para a próxima tentativa
+                with self._lock:
+                    espaco = max(0, self.capacidade - self._pendentes())
+                    devolver_acessos = acessos[:espaco]
+                    devolver_acoes = acoes[:espaco - len(devolver_acessos)]
+                    self.descartados += (len(acessos) - len(devolver_acessos)
+                                         + len(acoes) - len(devolver_acoes))
+                    self._acessos[:0] = devolver_acessos
+                    self._acoes[:0] = devolver_acoes
+                    self._contadores.update(contadores)
+                raise
+            # Perfis em cache dos usuários do lote ficaram desatualizados
+            invalidar_perfis({user_id for user_id, _, _ in acessos}
+                             | {user_id for user_id, _, _ in acoes})
+            # Lotes devolvidos ao buffer podem chegar depois que o dia já fechou
+            invalidar_dias({momento.date() for _, _, momento in acessos + acoes})
+            return len(acessos) + len(acoes)
+
+    def _gravar(self, acessos, acoes, contadores):
+        contadores = Counter(contadores)
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            conn.autocommit = False
+
+            if acessos:
+                execute_values(cursor, '''
+                    INSERT INTO user_acessos (user_id, tipo_acesso, data_acesso)
+                    VALUES %s
+                ''', acessos, page_size=self.lote)
+
+            if acoes:
+                ids = {user_id for user_id, _, _ in acoes} - self._usuarios_com_acoes
+                if ids:
+                    # Primeira ação de um usuário conta como novo usuário; os agregados
+                    # guardam o histórico completo (os eventos brutos antigos são descartados)
+                    cursor.execute('''
+                        SELECT DISTINCT user_id FROM atividade_diaria
+                        WHERE user_id = ANY(%s) AND tipo <> 'acesso'
+                    ''', (list(ids),))
+                    existentes = {row[0] for row in cursor.fetchall()}
+                    novos = ids - existentes
+                    if novos:
+                        contadores['usuarios'] += len(novos)
+
+                execute_values(cursor, '''
+                    INSERT INTO acoes_usuarios (user_id, tipo_acao, data_hora)
+                    VALUES %s
+                ''', acoes, page_size=self.lote)
+
+            self._agregar(cursor, acessos, acoes)
+
+            if contadores:
+                execute_values(cursor, '''
+                    UPDATE contadores_permanentes AS c
+                    SET total = c.total + v.quantidade,
+                        ultima_atualizacao = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v (tipo, quantidade)
+                    WHERE c.tipo = v.tipo
+                ''', list(contadores.items()), template='(%s, %s::int)')
+
+            conn.commit()
+            self._usuarios_com_acoes.update(user_id for user_id, _, _ in acoes)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                conn.autocommit = True
+            except Exception:
+                pass
+            cursor.close()
+            conn.close()
+
+    def _agregar(self, cursor, acessos, acoes):
+        """Atualiza atividade_diaria e estatisticas_usuarios na mesma transação do lote"""
+        # (dia, user_id, tipo) -> [quantidade, primeiro, último]
+        atividade = {}
+        por_usuario = {}
+        for user_id, tipo, momento in [(u, 'acesso', m) for u, _, m in acessos] + acoes:
+            chave = (momento.date(), user_id, tipo)
+            if chave in atividade:
+                balde = atividade[chave]
+                balde[0] += 1
+                balde[1] = min(balde[1], momento)
+                balde[2] = max(balde[2], momento)
+            else:
+                atividade[chave] = [1, momento, momento]
+        for user_id, _, momento in acessos:
+            total, ultimo = por_usuario.get(user_id, (0, momento))
+            por_usuario[user_id] = (total + 1, max(ultimo, momento))
+
+        # Linhas ordenadas pela chave: workers concorrentes travam na mesma ordem
+        if atividade:
+            execute_values(cursor, '''
+                INSERT INTO atividade_diaria (dia, user_id, tipo, quantidade, primeiro, ultimo)
+                VALUES %s
+                ON CONFLICT (dia, user_id, tipo) DO UPDATE
+                SET quantidade = atividade_diaria.quantidade + EXCLUDED.quantidade,
+                    primeiro = LEAST(atividade_diaria.primeiro, EXCLUDED.primeiro),
+                    ultimo = GREATEST(atividade_diaria.ultimo, EXCLUDED.ultimo)
+            ''', sorted((dia, user_id, tipo, *balde)
+                        for (dia, user_id, tipo), balde in atividade.items()),
+                page_size=self.lote)
+        if por_usuario:
+            execute_values(cursor, '''
+                INSERT INTO estatisticas_usuarios (user_id, total_acessos, ultimo_acesso)
+                VALUES %s
+                ON CONFLICT (user_id) DO UPDATE
+                SET total_acessos = estatisticas_usuarios.total_acessos + EXCLUDED.total_acessos,
+                    ultimo_acesso = GREATEST(estatisticas_usuarios.ultimo_acesso, EXCLUDED.ultimo_acesso)
+            ''', sorted((user_id, total, ultimo) for user_id, (total, ultimo) in por_usuario.items()),
+                page_size=self.lote)
+
+    def parar(self, timeout: float = 10):
+        """Interrompe a thread e grava o que ainda estiver no buffer"""
+        with self._lock:
+            self._parar = True
+            thread = self._thread
+        self._acordar.set()
+        if thread is not None:
+            thread.join(timeout)
+        try:
+            return self.descarregar()
+        except Exception as e:
+            print(f"Erro ao gravar telemetria no encerramento: {e}")
+            return 0
+
+
+# Instância global
+telemetria = BufferTelemetria()
@@ -0,0 +1,149 @@
+# webhook.py
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import signal
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as AppTornado, RequestHandler
+from telegram import Update
+from database_manager import db
+
+# Modo de recebimento dos updates: polling (padrão) ou webhook
+MODO_BOT = os.getenv('MODO_BOT', 'polling')
+# URL pública (https) que o Telegram chama; sem ela o bot volta ao polling
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_CAMINHO = os.getenv('WEBHOOK_CAMINHO', 'telegram').strip('/')
+WEBHOOK_ENDERECO = os.getenv('WEBHOOK_ENDERECO', '0.0.0.0')
+WEBHOOK_PORTA = int(os.getenv('WEBHOOK_PORTA', os.getenv('PORT', '8443')))
+# Segredo conferido no cabeçalho X-Telegram-Bot-Api-Secret-Token.
+# Igual em todos os workers atrás do balanceador (padrão derivado do token do bot)
+WEBHOOK_SEGREDO = os.getenv('WEBHOOK_SEGREDO', '')
+WEBHOOK_MAX_CONEXOES = int(os.getenv('WEBHOOK_MAX_CONEXOES', '40'))
+# Tempo (s) em que /saude responde 503 antes de fechar o listener, para o balanceador desviar o tráfego
+WEBHOOK_DRENO = float(os.getenv('WEBHOOK_DRENO', '5'))
+
+CABECALHO_SEGREDO = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def webhook_configurado() -> bool:
+    """Indica se o modo webhook foi pedido e tem o necessário para funcionar"""
+    if MODO_BOT != 'webhook':
+        return False
+    if not WEBHOOK_URL:
+        print("MODO_BOT=webhook sem WEBHOOK_URL; usando polling")
+        return False
+    return True
+
+def segredo_webhook(token: str) -> str:
+    return WEBHOOK_SEGREDO or hashlib.sha256(token.encode()).hexdigest()
+
+
+class UpdateHandler(RequestHandler):
+    """Recebe os updates do Telegram e os entrega à fila do Application"""
+
+    def initialize(self, servidor):
+        self.servidor = servidor
+
+    async def post(self):
+        recebido = self.request.headers.get(CABECALHO_SEGREDO, '')
+        if not hmac.compare_digest(recebido.encode(), self.servidor.segredo.encode()):
+            self.set_status(403)
+            return
+        try:
+            dados = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)
+            return
+        update = Update.de_json(dados, self.servidor.application.bot)
+        # Responde logo; o processamento segue pela fila (Telegram não espera o handler)
+        await self.servidor.application.update_queue.put(update)
+        self.set_status(200)
+
+
+class SaudeHandler(RequestHandler):
+    """Verificação do balanceador: 503 durante o dreno ou se o Application parou"""
+
+    def initialize(self, servidor):
+        self.servidor = servidor
+
+    def get(self):
+        application = self.servidor.application
+        pronto = application.running and not self.servidor.drenando
+        self.set_status(200 if pronto else 503)
+        self.write({
+            'status': 'ok' if pronto else 'drenando',
+            'fila': application.update_queue.qsize(),
+            'banco': db.pool.estatisticas()
+        })
+
+
+class ServidorWebhook:
+    """Listener HTTP assíncrono do modo webhook, no mesmo event loop do bot"""
+
+    def __init__(self, application, segredo: str):
+        self.application = application
+        self.segredo = segredo
+        self.drenando = False
+        self._servidor = None
+
+    def iniciar(self):
+        rotas = [
+            (f'/{WEBHOOK_CAMINHO}', UpdateHandler, {'servidor': self}),
+            ('/saude', SaudeHandler, {'servidor': self}),
+        ]
+        self._servidor = HTTPServer(AppTornado(rotas))
+        self._servidor.listen(WEBHOOK_PORTA, WEBHOOK_ENDERECO)
+        print(f"Webhook ouvindo em {WEBHOOK_ENDERECO}:{WEBHOOK_PORTA}/{WEBHOOK_CAMINHO}")
+
+    async def drenar(self):
+        """Sinaliza o dreno ao balanceador e fecha o listener sem perder updates já aceitos"""
+        self.drenando = True
+        await asyncio.sleep(WEBHOOK_DRENO)
+        self._servidor.stop()
+        # Aguarda as requisições em andamento; o que não foi confirmado o Telegram reenvia
+        await self._servidor.close_all_connections()
+
+
+async def _servir(application):
+    parada = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, parada.set)
+        except NotImplementedError:
+            pass
+
+    # Mesma sequência do run_polling: initialize, post_init, start ... stop, post_stop, shutdown
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        servidor = ServidorWebhook(application, segredo_webhook(application.bot.token))
+        servidor.iniciar()
+        await application.bot.set_webhook(
+            url=f'{WEBHOOK_URL}/{WEBHOOK_CAMINHO}',
+            secret_token=servidor.segredo,
+            max_connections=WEBHOOK_MAX_CONEXOES,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await application.start()
+        print("🌐 Bot em modo webhook")
+
+        await parada.wait()
+        print("Encerrando: drenando o webhook...")
+        await servidor.drenar()
+        # Processa os updates que ainda estão na fila e grava a persistência
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+    finally:
+        # O webhook não é removido: outros workers continuam atendendo a mesma URL
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+def executar_webhook(application):
+    """Executa o bot em modo webhook até receber SIGINT/SIGTERM"""
+    asyncio.run(_servir(application))